@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -11,9 +13,12 @@ login_manager = LoginManager()
 login_manager.login_view = "auth.login"
 
 
-def create_app():
+def create_app(config_overrides: dict | None = None):
     app = Flask(__name__)
     app.config.from_object(get_config())
+    # Ajustes puntuales (p. ej. benchmarks) aplicados antes de inicializar extensiones
+    if config_overrides:
+        app.config.update(config_overrides)
 
     db.init_app(app)
     migrate.init_app(app, db)
@@ -27,5 +32,15 @@ def create_app():
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
 
+    from .services.mirror_sync import register_cli
+    register_cli(app)
+
+    from .services.metrics import init_metrics
+    init_metrics(app)
+
+    # Después de las métricas: su hook corre antes y entra en Server-Timing
+    from .services.compression import init_compression
+    init_compression(app)
+
     return app
 
@@ -1,11 +1,128 @@
-from flask import Blueprint, render_template, jsonify, request, Response
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from flask import Blueprint, current_app, render_template, jsonify, request, Response, send_file, stream_with_context
 from flask_login import login_required
-from ..services.odoo_connector import OdooConnector
-from ..services.kpi_calculator import compute_kpis, top15_clients
+from ..services.conditional import conditional_get, get_body_cache
+from ..services.odoo_connector import DEFAULT_TEAM, OdooConnector
+from ..services.metrics import render as render_metrics, span
+from ..services.odoo_pool import pool_stats
+from ..services.pagination import decode_cursor, encode_cursor, keyset_order
+from ..services.partner_index import get_partner_index, partner_index_stats
+from ..services.odoo_schema import get_schema
+from ..services.mirror_sync import MirrorReader, MirrorSync, mirror_status
+from ..services.dimension_cache import dimension_stats, invalidate_dimensions
+from ..services.query_cache import get_query_cache
+from ..services.receivables_cube import cube_stats, get_cube, month_aligned
+from ..services.report_rows import rows_to_dicts, to_columnar
+from ..services.singleflight import get_single_flight
+from ..services.kpi_calculator import dashboard_columnar, dashboard_from_groups, dashboard_kpis, top15_clients, top15_details
+from ..services.aging import AGING_GROUPS, aging_columns, get_aging_indexes
+from ..services.export_jobs import get_export_manager
+from ..services.exporters import CSV_MIMETYPE, XLSX_MIMETYPE, file_size, iter_csv, iter_file, write_xlsx
 
 
 main_bp = Blueprint("main", __name__, template_folder="templates")
 
+MAX_REPORT_PER_PAGE = 1000
+# Campos de account.move.line por los que se permite ordenar el reporte CxC
+REPORT_ORDER_FIELDS = {'date', 'date_maturity', 'move_name', 'partner_id', 'account_id', 'amount_currency', 'amount_residual_currency', 'id'}
+DEFAULT_REPORT_ORDER = 'date desc, id desc'
+
+
+def _data_source():
+    """Fuente de datos de la petición: Odoo en vivo (por defecto) o la réplica local."""
+    source = request.args.get('source') or current_app.config.get('REPORTS_SOURCE', 'odoo')
+    if source == 'mirror':
+        return MirrorReader()
+    return OdooConnector()
+
+
+def _cube(connector=None):
+    connector = connector or OdooConnector()
+    return get_cube(
+        connector,
+        refresh_seconds=current_app.config.get('CUBE_REFRESH_SECONDS', 60),
+        full_refresh_seconds=current_app.config.get('CUBE_FULL_REFRESH_SECONDS', 3600),
+    )
+
+
+def _json(payload):
+    """jsonify medido como fase 'serialization' (métricas y Server-Timing)."""
+    with span('serialization'):
+        return jsonify(payload)
+
+
+def _keyset_descending(value: str | None) -> bool:
+    """Sentido del orden (date, id) para la paginación por cursor."""
+    if not value:
+        return True
+    normalized = ' '.join(value.replace(',', ' , ').split())
+    if normalized in ('date desc', 'date desc , id desc'):
+        return True
+    if normalized in ('date asc', 'date', 'date asc , id asc'):
+        return False
+    raise ValueError("La paginación por cursor solo admite orden por fecha (date asc|desc)")
+
+
+def _team() -> str | None:
+    """Canal (equipo de ventas) pedido con `team`; `team=all` incluye todos los canales."""
+    team = request.args.get('team') or current_app.config.get('KPI_DEFAULT_TEAM', DEFAULT_TEAM)
+    return None if team.lower() in ('all', '*') else team
+
+
+def _exact_team() -> bool:
+    """`team_match=exact`: el canal debe llamarse exactamente así (por defecto basta con contenerlo)."""
+    return request.args.get('team_match') == 'exact'
+
+
+def _kpi_engine() -> str:
+    return request.args.get('engine') or current_app.config.get('KPI_ENGINE', 'python')
+
+
+def _invoices_version():
+    """Versión de las facturas filtradas (ETag de KPIs y Top 15); el cubo se refresca por su cuenta.
+
+    Incluye la fecha del día: vencido/vigente, días de mora y tramos de aging se
+    calculan contra `date.today()` y cambian a medianoche sin que cambie Odoo.
+    """
+    connector = _data_source()
+    if not isinstance(connector, OdooConnector) or _kpi_engine() == 'cube':
+        return None
+    version = connector.unpaid_invoices_version(start_date=request.args.get('start'), end_date=request.args.get('end'),
+                                                customer=request.args.get('q'), team=_team(),
+                                                exact_team=_exact_team())
+    return f"{version}|{date.today().isoformat()}"
+
+
+def _report_lines_version():
+    connector = _data_source()
+    if not isinstance(connector, OdooConnector):
+        return None
+    return connector.report_lines_version(start_date=request.args.get('start'), end_date=request.args.get('end'),
+                                          customer=request.args.get('q'), account_codes=request.args.get('accounts'))
+
+
+def _report_order(value: str | None) -> str:
+    """Valida `order` ("campo [asc|desc], ...") y añade `id` como desempate estable."""
+    if not value:
+        return DEFAULT_REPORT_ORDER
+    parts = []
+    for chunk in value.split(','):
+        tokens = chunk.split()
+        if not tokens:
+            continue
+        field = tokens[0]
+        direction = tokens[1].lower() if len(tokens) > 1 else 'asc'
+        if field not in REPORT_ORDER_FIELDS or direction not in ('asc', 'desc') or len(tokens) > 2:
+            raise ValueError(f"Orden no permitido: {chunk.strip()}")
+        parts.append(f"{field} {direction}")
+    if not any(p.startswith('id ') for p in parts):
+        parts.append('id desc')
+    return ', '.join(parts)
+
 
 @main_bp.route("/")
 def index():
@@ -36,115 +153,132 @@ def reports_view():
     return render_template("reporte_cta_12_13.html")
 
 
+def _dashboard(connector, engine: str, team, channel: str | None, exact_team: bool = False, **filters):
+    """KPIs de un canal (o lista de canales) con el motor pedido: (payload, facturas leídas o None)."""
+    if engine == 'cube' and not month_aligned(filters.get('start_date'), filters.get('end_date')):
+        # El cubo agrupa por mes de factura: un rango a mitad de mes se agrega en Odoo
+        engine = 'odoo'
+    if engine == 'odoo' and hasattr(connector, 'get_unpaid_invoice_groups'):
+        # Agregación en Odoo: solo viajan filas de read_group
+        groups = connector.get_unpaid_invoice_groups(**filters, channel=channel, team=team, exact_team=exact_team)
+        with span('aggregation'):
+            return dashboard_from_groups(groups), None
+    if engine == 'cube' and isinstance(connector, OdooConnector):
+        # Cubo preagregado en memoria, refrescado por deltas de write_date
+        cube = _cube(connector)
+        filters = cube.resolve_customer(connector, filters)
+        with span('aggregation'):
+            return cube.dashboard(**filters, team=team, channel=channel, exact_team=exact_team), None
+    invoices = connector.get_unpaid_invoices(**filters, team=team, exact_team=exact_team)
+    return _invoices_dashboard(invoices, engine, channel), invoices
+
+
+def _invoices_dashboard(invoices: list, engine: str, channel: str | None) -> dict:
+    with span('aggregation'):
+        if engine == 'columnar':
+            return dashboard_columnar(invoices, channel=channel)
+        # Una sola pasada: KPIs, Top 10, condición, tipo de documento y serie de morosidad
+        return dashboard_kpis(invoices, channel=channel)
+
+
+def _dashboard_filters() -> dict:
+    return dict(start_date=request.args.get('start'), end_date=request.args.get('end'), customer=request.args.get('q'))
+
+
 @main_bp.route("/api/kpis")
 @login_required
+@conditional_get(_invoices_version)
 def api_kpis():
-    start_date = request.args.get('start')
-    end_date = request.args.get('end')
-    customer = request.args.get('q')
-    channel = request.args.get('channel')
     try:
-        connector = OdooConnector()
-        invoices = connector.get_unpaid_invoices(start_date=start_date, end_date=end_date, customer=customer)
-        kpis = compute_kpis(invoices)
-        # Compose extra datasets for dashboard
-        # Top 10 clientes por monto vencido
-        top_clients_vencido = {}
-        cond_map = {"vigente": 0.0, "vencido": 0.0}
-        tipo_doc_map = {}
-        from datetime import date, datetime, timedelta
-        today = date.today()
-        # Para serie mensual del índice de morosidad
-        month_totals = {}
-        month_vencido = {}
-        for inv in invoices:
-            residual = float(inv.get("amount_residual") or 0.0)
-            if residual <= 0:
-                continue
-            # condición
-            due = inv.get("invoice_date_due")
-            is_vencido = False
-            if due:
-                try:
-                    is_vencido = datetime.strptime(due, "%Y-%m-%d").date() < today
-                except Exception:
-                    is_vencido = False
-            cond_map["vencido" if is_vencido else "vigente"] += residual
-            # top clientes (solo vencido)
-            if is_vencido:
-                partner = inv.get("partner_id")
-                name = partner[1] if isinstance(partner, list) and len(partner) >= 2 else str(partner)
-                # Filtrar por canal NACIONAL si se pide
-                sc = inv.get('sales_channel_id')
-                sc_name = sc[1] if isinstance(sc, list) and len(sc) >= 2 else ''
-                if (channel == 'NACIONAL' and sc_name == 'NACIONAL') or (channel is None):
-                    top_clients_vencido[name] = top_clients_vencido.get(name, 0.0) + residual
-            # tipo de documento
-            doc = inv.get("l10n_latam_document_type_id")
-            doc_name = doc[1] if isinstance(doc, list) and len(doc) >= 2 else (inv.get("move_type") or "Desconocido")
-            tipo_doc_map[doc_name] = tipo_doc_map.get(doc_name, 0.0) + residual
-
-            # Serie mensual índice de morosidad
-            inv_date = inv.get("invoice_date")
-            try:
-                month_key = datetime.strptime(inv_date, "%Y-%m-%d").strftime("%Y-%m") if inv_date else None
-            except Exception:
-                month_key = None
-            if month_key:
-                month_totals[month_key] = month_totals.get(month_key, 0.0) + residual
-                # vencido en el mes si fecha de vencimiento <= último día del mes
-                if due:
-                    try:
-                        due_date = datetime.strptime(due, "%Y-%m-%d").date()
-                        # último día del mes
-                        year, month = map(int, month_key.split("-"))
-                        if month == 12:
-                            last_day = date(year, 12, 31)
-                        else:
-                            first_next = date(year, month + 1, 1)
-                            last_day = first_next - timedelta(days=1)
-                        if due_date <= last_day:
-                            month_vencido[month_key] = month_vencido.get(month_key, 0.0) + residual
-                    except Exception:
-                        pass
-
-        # Top 10 sorted
-        top_sorted = sorted(top_clients_vencido.items(), key=lambda x: x[1], reverse=True)[:10]
-        top10_labels = [n for n, _ in top_sorted]
-        top10_values = [round(v, 2) for _, v in top_sorted]
-
-        # Serie ordenada por mes
-        months_sorted = sorted(month_totals.keys())
-        serie_labels = months_sorted
-        serie_values = []
-        for mk in months_sorted:
-            total = month_totals.get(mk, 0.0)
-            venc = month_vencido.get(mk, 0.0)
-            serie_values.append(round((venc / total * 100) if total else 0.0, 2))
-
-        resp = dict(kpis)
-        resp.update({
-            "top10": {"labels": top10_labels, "values": top10_values},
-            "condicion": {"labels": ["Vigente", "Vencido"], "values": [round(cond_map["vigente"],2), round(cond_map["vencido"],2)]},
-            "tipo_documento": {"labels": list(tipo_doc_map.keys()), "values": [round(v,2) for v in tipo_doc_map.values()]},
-            "morosidad_series": {"labels": serie_labels, "values": serie_values}
-        })
-        return jsonify(resp)
+        payload, _ = _dashboard(_data_source(), _kpi_engine(), _team(), request.args.get('channel'), exact_team=_exact_team(),
+                                **_dashboard_filters())
+        return _json(payload)
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
 
 
+def _timed_dashboard(app, connector, engine: str, team, channel: str | None, filters: dict):
+    # Contexto de app propio por hilo: cada uno con su sesión SQLAlchemy (réplica local)
+    with app.app_context():
+        started = time.perf_counter()
+        # Canales por nombre completo: NACIONAL no debe incluir INTERNACIONAL ni duplicar el consolidado
+        payload, invoices = _dashboard(connector, engine, team, channel, exact_team=True, **filters)
+        return payload, invoices, round((time.perf_counter() - started) * 1000, 1)
+
+
+@main_bp.route("/api/kpis/channels")
+@login_required
+def api_kpis_channels():
+    """KPIs de varios canales en paralelo (`teams=INTERNACIONAL,NACIONAL`) más el consolidado.
+
+    Cada canal se consulta en su propio hilo, así que la respuesta tarda
+    aproximadamente lo que el canal más lento. Con los motores `python` y
+    `columnar` el consolidado se calcula sobre las facturas ya leídas; con
+    `odoo` y `cube` se pide en paralelo para la lista completa de canales.
+    """
+    teams = [t.strip() for t in (request.args.get('teams') or ','.join(current_app.config.get('KPI_TEAMS', ('INTERNACIONAL', 'NACIONAL')))).split(',') if t.strip()]
+    if not teams:
+        return jsonify({"error": "Indique al menos un canal en `teams`"}), 400
+    engine = _kpi_engine()
+    channel = request.args.get('channel')
+    filters = _dashboard_filters()
+    app = current_app._get_current_object()
+    connector = _data_source()
+    separate_total = engine in ('odoo', 'cube')
+    workers = min(len(teams) + int(separate_total), current_app.config.get('KPI_FANOUT_WORKERS', 8))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='kpi-fanout') as executor:
+        # Copia del contexto: métricas y request visibles en cada hilo
+        futures = {team: executor.submit(contextvars.copy_context().run, _timed_dashboard, app, connector, engine, team, channel, filters)
+                   for team in teams}
+        total_future = (executor.submit(contextvars.copy_context().run, _timed_dashboard, app, connector, engine, teams, channel, filters)
+                        if separate_total else None)
+        by_team, timings, errors, invoices = {}, {}, {}, []
+        for team, future in futures.items():
+            try:
+                payload, team_invoices, timings[team] = future.result()
+            except Exception as exc:
+                errors[team] = str(exc)
+                continue
+            by_team[team] = payload
+            invoices.extend(team_invoices or [])
+        try:
+            if total_future is not None:
+                consolidated, _, timings['consolidado'] = total_future.result()
+            else:
+                consolidated = _invoices_dashboard(invoices, engine, channel)
+        except Exception as exc:
+            consolidated, errors['consolidado'] = None, str(exc)
+
+    # Sin ningún canal respondido no hay nada que mostrar
+    status = 200 if by_team else 500
+    with span('serialization'):
+        response = jsonify({"teams": teams, "por_canal": by_team, "consolidado": consolidated,
+                            "tiempos_ms": timings, "errores": errors, "incompleto": bool(errors)})
+    return response, status
+
+
 @main_bp.route("/api/reports/top15")
 @login_required
+@conditional_get(_invoices_version)
 def api_top15():
     start_date = request.args.get('start')
     end_date = request.args.get('end')
     customer = request.args.get('q')
     try:
-        connector = OdooConnector()
-        invoices = connector.get_unpaid_invoices(start_date=start_date, end_date=end_date, customer=customer)
-        clientes, montos = top15_clients(invoices)
-        return jsonify({"clientes": clientes, "montos": montos})
+        connector = _data_source()
+        engine = _kpi_engine()
+        if engine == 'cube' and isinstance(connector, OdooConnector) and month_aligned(start_date, end_date):
+            cube = _cube(connector)
+            filters = cube.resolve_customer(connector, {'start_date': start_date, 'end_date': end_date, 'customer': customer})
+            with span('aggregation'):
+                clientes, montos = cube.top_partners(15, **filters, team=_team(), exact_team=_exact_team())
+        else:
+            invoices = connector.get_unpaid_invoices(start_date=start_date, end_date=end_date, customer=customer, team=_team(),
+                                                 exact_team=_exact_team())
+            with span('aggregation'):
+                clientes, montos = top15_clients(invoices)
+        return _json({"clientes": clientes, "montos": montos})
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
 
@@ -170,43 +304,191 @@ def api_odoo_ping_public():
         return jsonify({"ok": False, "error": str(exc)}), 500
 
 
+@main_bp.route("/metrics")
+def metrics():
+    """Métricas en formato de texto Prometheus (sin login; token opcional METRICS_TOKEN)."""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return Response("No autorizado\n", status=401, mimetype='text/plain')
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@main_bp.route("/api/odoo/pool")
+@login_required
+def api_odoo_pool():
+    return jsonify({"pools": pool_stats()})
+
+
+@main_bp.route("/api/odoo/capabilities")
+@login_required
+def api_odoo_capabilities():
+    schema = get_schema()
+    if request.args.get('refresh') in ('1', 'true'):
+        schema.invalidate()
+    try:
+        odoo = OdooConnector()
+        return jsonify({"instance": f"{odoo.url}/{odoo.db}", "models": schema.capabilities(odoo)})
+    except Exception as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 500
+
+
+@main_bp.route("/api/odoo/cache")
+@login_required
+def api_odoo_cache():
+    return jsonify(get_query_cache(current_app.config).stats())
+
+
+@main_bp.route("/api/odoo/cache/invalidate", methods=["POST"])
+@login_required
+def api_odoo_cache_invalidate():
+    model = request.args.get('model') or None
+    removed = get_query_cache(current_app.config).invalidate(model)
+    return jsonify({"ok": True, "model": model, "removed": removed})
+
+
+@main_bp.route("/api/odoo/singleflight")
+@login_required
+def api_odoo_singleflight():
+    return jsonify(get_single_flight().stats())
+
+
+@main_bp.route("/api/odoo/etags")
+@login_required
+def api_odoo_etags():
+    return jsonify(get_body_cache(current_app.config).stats())
+
+
+@main_bp.route("/api/odoo/dimensions")
+@login_required
+def api_odoo_dimensions():
+    return jsonify({"dimensions": dimension_stats()})
+
+
+@main_bp.route("/api/odoo/dimensions/invalidate", methods=["POST"])
+@login_required
+def api_odoo_dimensions_invalidate():
+    model = request.args.get('model') or None
+    removed = invalidate_dimensions(model)
+    return jsonify({"ok": True, "model": model, "removed": removed})
+
+
+@main_bp.route("/api/odoo/partner-index")
+@login_required
+def api_odoo_partner_index():
+    return jsonify({"indexes": partner_index_stats()})
+
+
+@main_bp.route("/api/partners/suggest")
+@login_required
+def api_partners_suggest():
+    """Autocompletado del filtro Cliente (nombre, RUC/VAT o código SAP) desde el índice local."""
+    q = (request.args.get('q') or '').strip()
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    if not q:
+        return jsonify({"query": q, "results": []})
+    try:
+        odoo = OdooConnector()
+        index = get_partner_index((odoo.url, odoo.db), current_app.config)
+        # Mientras el índice se arma en segundo plano no hay sugerencias (`ready` = false)
+        ready = index.ensure(odoo, current_app._get_current_object())
+        return _json({"query": q, "ready": ready, "results": index.suggest(q, limit) if ready else []})
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 500
+
+
+@main_bp.route("/api/cube/status")
+@login_required
+def api_cube_status():
+    return jsonify({"cubes": cube_stats()})
+
+
+@main_bp.route("/api/cube/refresh", methods=["POST"])
+@login_required
+def api_cube_refresh():
+    full = request.args.get('full') in ('1', 'true')
+    try:
+        connector = OdooConnector()
+        cube = _cube(connector)
+        return jsonify({"ok": True, "refresh": cube.refresh(connector, full=full)})
+    except Exception as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 500
+
+
+@main_bp.route("/api/cube/rollup")
+@login_required
+def api_cube_rollup():
+    """Saldos abiertos agrupados por dimensiones del cubo (`by=partner,due_month,...`)."""
+    by = [d.strip() for d in (request.args.get('by') or 'partner').split(',') if d.strip()]
+    filters = {
+        'start_date': request.args.get('start'),
+        'end_date': request.args.get('end'),
+        'customer': request.args.get('q'),
+        'team': request.args.get('team'),
+    }
+    try:
+        connector = OdooConnector()
+        cube = _cube(connector)
+        rows = cube.rollup(by, **cube.resolve_customer(connector, filters))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 500
+    return jsonify({"by": by, "rows": rows})
+
+
+@main_bp.route("/api/mirror/status")
+@login_required
+def api_mirror_status():
+    return jsonify(mirror_status())
+
+
+@main_bp.route("/api/mirror/sync", methods=["POST"])
+@login_required
+def api_mirror_sync():
+    full = request.args.get('full') in ('1', 'true', 'yes')
+    try:
+        stats = MirrorSync().sync(full=full)
+        return jsonify({"ok": True, "stats": stats})
+    except Exception as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 500
+
+
+TOP15_CSV_COLUMNS = [
+    ('cliente', 'Cliente'),
+    ('documento', 'Documento'),
+    ('fecha', 'Fecha'),
+    ('vence', 'Vence'),
+    ('monto', 'Monto'),
+    ('saldo', 'Saldo'),
+    ('origen', 'Origen'),
+]
+
+
+def _csv_bom() -> bool:
+    value = request.args.get('bom')
+    if value is None:
+        return bool(current_app.config.get('CSV_EXCEL_BOM', True))
+    return value in ('1', 'true', 'yes')
+
+
+def _csv_response(chunks, filename: str) -> Response:
+    return Response(stream_with_context(chunks), mimetype=CSV_MIMETYPE,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
 @main_bp.route("/api/reports/top15/details")
 @login_required
 def api_top15_details():
     start_date = request.args.get('start')
     end_date = request.args.get('end')
     customer = request.args.get('q')
-    account_codes = request.args.get('accounts')
     try:
-        connector = OdooConnector()
-        invoices = connector.get_unpaid_invoices(start_date=start_date, end_date=end_date, customer=customer)
-        # Determinar top15 para filtrar
-        clientes, _ = top15_clients(invoices)
-        clientes_set = set(clientes)
-        details = []
-        for inv in invoices:
-            partner = inv.get("partner_id")
-            partner_name = None
-            if isinstance(partner, list) and len(partner) >= 2:
-                partner_name = str(partner[1])
-            elif isinstance(partner, str):
-                partner_name = partner
-            else:
-                partner_name = "(Sin nombre)"
-            if partner_name not in clientes_set:
-                continue
-            details.append({
-                "cliente": partner_name,
-                "documento": inv.get("name"),
-                "fecha": inv.get("invoice_date"),
-                "vence": inv.get("invoice_date_due"),
-                "monto": float(inv.get("amount_total") or 0.0),
-                "saldo": float(inv.get("amount_residual") or 0.0),
-                "origen": inv.get("invoice_origin") or "",
-            })
-        # Ordenar por saldo desc
-        details.sort(key=lambda x: x["saldo"], reverse=True)
-        return jsonify({"rows": details})
+        connector = _data_source()
+        invoices = connector.get_unpaid_invoices(start_date=start_date, end_date=end_date, customer=customer, team=_team(),
+                                                 exact_team=_exact_team())
+        with span('aggregation'):
+            rows = top15_details(invoices)
+        return _json({"rows": rows})
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
 
@@ -218,111 +500,241 @@ def api_top15_details_csv():
     end_date = request.args.get('end')
     customer = request.args.get('q')
     try:
-        connector = OdooConnector()
-        invoices = connector.get_unpaid_invoices(start_date=start_date, end_date=end_date, customer=customer)
-        clientes, _ = top15_clients(invoices)
-        clientes_set = set(clientes)
-        lines = ["Cliente,Documento,Fecha,Vence,Monto,Saldo,Origen"]
-        for inv in invoices:
-            partner = inv.get("partner_id")
-            partner_name = None
-            if isinstance(partner, list) and len(partner) >= 2:
-                partner_name = str(partner[1])
-            elif isinstance(partner, str):
-                partner_name = partner
-            else:
-                partner_name = "(Sin nombre)"
-            if partner_name not in clientes_set:
-                continue
-            monto = float(inv.get("amount_total") or 0.0)
-            saldo = float(inv.get("amount_residual") or 0.0)
-            row = [
-                partner_name.replace(',', ' '),
-                str(inv.get("name") or ''),
-                str(inv.get("invoice_date") or ''),
-                str(inv.get("invoice_date_due") or ''),
-                f"{monto:.2f}",
-                f"{saldo:.2f}",
-                str(inv.get("invoice_origin") or '').replace(',', ' ')
-            ]
-            lines.append(','.join(row))
-        csv_data = '\n'.join(lines)
-        return Response(csv_data, mimetype='text/csv', headers={'Content-Disposition': 'attachment; filename=top15_detalle.csv'})
+        connector = _data_source()
+        invoices = connector.get_unpaid_invoices(start_date=start_date, end_date=end_date, customer=customer, team=_team(),
+                                                 exact_team=_exact_team())
+        details = top15_details(invoices)
+        for d in details:
+            d["monto"] = f"{d['monto']:.2f}"
+            d["saldo"] = f"{d['saldo']:.2f}"
+        chunks = iter_csv(details, TOP15_CSV_COLUMNS, bom=_csv_bom())
+        return _csv_response(chunks, 'top15_detalle.csv')
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 500
+
+
+@main_bp.route('/api/reports/export.csv')
+@login_required
+def api_reports_export_csv():
+    start_date = request.args.get('start')
+    end_date = request.args.get('end')
+    customer = request.args.get('q')
+    account_codes = request.args.get('accounts')
+    try:
+        connector = _data_source()
+        batches = connector.iter_report_lines(start_date=start_date, end_date=end_date, customer=customer,
+                                              account_codes=account_codes, order=DEFAULT_REPORT_ORDER)
+        # El primer lote se pide antes de responder para que los errores de Odoo devuelvan 500
+        first = next(batches, [])
+
+        def rows():
+            yield from first
+            for batch in batches:
+                yield from batch
+
+        return _csv_response(iter_csv(rows(), bom=_csv_bom()), 'cxc_report.csv')
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
 
 
 @main_bp.route('/api/reports/data')
 @login_required
+@conditional_get(_report_lines_version)
 def api_reports_data():
+    """Página del reporte CxC: `page`/`per_page` (offset) o cursor (`paging=cursor`, `cursor=...`)."""
     start_date = request.args.get('start')
     end_date = request.args.get('end')
     customer = request.args.get('q')
     account_codes = request.args.get('accounts')
-    page = int(request.args.get('page', '1'))
-    per_page = int(request.args.get('per_page', '50'))
+    keyset = bool(request.args.get('cursor')) or request.args.get('paging') == 'cursor'
+    try:
+        per_page = max(1, min(int(request.args.get('per_page', '50')), MAX_REPORT_PER_PAGE))
+        if keyset:
+            cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+            descending = cursor.descending if cursor else _keyset_descending(request.args.get('order'))
+        else:
+            page = max(1, int(request.args.get('page', '1')))
+            order = _report_order(request.args.get('order'))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    filters = dict(start_date=start_date, end_date=end_date, customer=customer, account_codes=account_codes)
+    try:
+        connector = _data_source()
+        if keyset:
+            # Una línea extra indica si hay página siguiente; el total es opcional (`total=exact|approx|none`)
+            rows = connector.get_report_lines(**filters, limit=per_page + 1, order=keyset_order(descending), after=cursor)
+            next_cursor = None
+            if len(rows) > per_page:
+                rows = rows[:per_page]
+                next_cursor = encode_cursor(rows[-1].date, rows[-1].line_id, descending)
+            total_mode = request.args.get('total', 'approx')
+            total = None if total_mode == 'none' else connector.count_report_lines(**filters, approximate=total_mode != 'exact')
+            paging = {"total": total, "total_approximate": total_mode == 'approx', "per_page": per_page, "next_cursor": next_cursor}
+        else:
+            # Paginación en Odoo: search_count para el total y search_read solo de la página
+            total = connector.count_report_lines(**filters)
+            rows = connector.get_report_lines(**filters, offset=(page - 1) * per_page, limit=per_page, order=order)
+            paging = {"total": total, "page": page, "per_page": per_page}
+        if request.args.get('format') == 'columnar':
+            # Encabezado + arreglos por columna con diccionario para las de baja cardinalidad
+            with span('serialization'):
+                payload = to_columnar(rows, current_app.config.get('COLUMNAR_MAX_CARDINALITY', 0.5))
+            return _json({**payload, **paging})
+        return _json({"rows": rows_to_dicts(rows), **paging})
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 500
+
+
+def _aging_report():
+    """Antigüedad de saldos desde el índice precalculado de los filtros pedidos."""
+    start_date = request.args.get('start')
+    end_date = request.args.get('end')
+    customer = request.args.get('q')
+    account_codes = request.args.get('accounts')
+    as_of = date.fromisoformat(request.args['as_of']) if request.args.get('as_of') else None
+    by = request.args.get('by', 'partner')
+    if by not in AGING_GROUPS:
+        raise ValueError(f"Agrupación no soportada: {by}")
+    connector = _data_source()
+    key = (type(connector).__name__, getattr(connector, 'url', None), getattr(connector, 'db', None),
+           start_date, end_date, customer, account_codes)
+
+    def build():
+        for batch in connector.iter_report_lines(start_date=start_date, end_date=end_date, customer=customer, account_codes=account_codes):
+            yield from batch
+
+    index = get_aging_indexes(current_app.config).get(key, build)
+    with span('aggregation'):
+        return index.buckets(as_of, by=by)
+
+
+def _page(rows: list, default_per_page: int | None):
+    """Página pedida con `page`/`per_page`; sin `page` ni valor por defecto se devuelve todo."""
+    if request.args.get('page') is None and default_per_page is None:
+        return rows, None, None
+    page = max(1, int(request.args.get('page', '1')))
+    per_page = max(1, min(int(request.args.get('per_page', str(default_per_page or 50))), MAX_REPORT_PER_PAGE))
+    return rows[(page - 1) * per_page:page * per_page], page, per_page
+
+
+@main_bp.route('/api/reports/aging')
+@login_required
+def api_reports_aging():
+    """Saldos por tramo de atraso (`by=partner|account`, `as_of=YYYY-MM-DD`) con paginación."""
+    try:
+        report = _aging_report()
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 500
+    rows, page, per_page = _page(report['rows'], 50)
+    return _json({**report, "rows": rows, "total": len(report['rows']), "page": page, "per_page": per_page})
+
+
+@main_bp.route('/api/reports/aging.csv')
+@login_required
+def api_reports_aging_csv():
+    try:
+        report = _aging_report()
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 500
+    rows, _, _ = _page(report['rows'], None)
+    return _csv_response(iter_csv(rows, aging_columns(report['by']), bom=_csv_bom()), f"aging_{report['by']}_{report['as_of']}.csv")
+
+
+REPORT_SUMMARY_GROUPBY = {'account': 'account_id', 'partner': 'partner_id'}
+
+
+@main_bp.route('/api/reports/summary')
+@login_required
+def api_reports_summary():
+    """Totales del reporte CxC 12/13 por cuenta o por cliente, agregados en Odoo."""
+    by = request.args.get('by', 'account')
+    if by not in REPORT_SUMMARY_GROUPBY:
+        return jsonify({"error": f"Agrupación no soportada: {by}"}), 400
+    field = REPORT_SUMMARY_GROUPBY[by]
     try:
         connector = OdooConnector()
-        rows = connector.get_report_lines(start_date=start_date, end_date=end_date, customer=customer, account_codes=account_codes)
-        total = len(rows)
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        return jsonify({"rows": rows[start_idx:end_idx], "total": total, "page": page, "per_page": per_page})
+        groups = connector.get_report_line_groups(
+            [field], start_date=request.args.get('start'), end_date=request.args.get('end'),
+            customer=request.args.get('q'), account_codes=request.args.get('accounts'),
+        )
+        rows = [
+            {
+                "grupo": g[field][1] if isinstance(g.get(field), list) else "(Sin asignar)",
+                "lineas": g.get("__count") or g.get(f"{field}_count") or 0,
+                "amount_currency": round(float(g.get("amount_currency") or 0.0), 2),
+                "amount_residual_currency": round(float(g.get("amount_residual_currency") or 0.0), 2),
+            }
+            for g in groups
+        ]
+        rows.sort(key=lambda r: r["amount_residual_currency"], reverse=True)
+        return jsonify({"by": by, "rows": rows})
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
 
 
+@main_bp.route('/api/reports/export/jobs', methods=['POST'])
+@login_required
+def api_export_job_submit():
+    payload = request.get_json(silent=True) or {}
+    params = {key: payload.get(key, request.args.get(key)) for key in ('start', 'end', 'q', 'accounts', 'source')}
+    fmt = payload.get('format') or request.args.get('format', 'xlsx')
+    try:
+        job = get_export_manager(current_app._get_current_object()).submit(fmt, params)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(job.to_dict()), 202
+
+
+@main_bp.route('/api/reports/export/jobs')
+@login_required
+def api_export_jobs():
+    manager = get_export_manager(current_app._get_current_object())
+    manager.cleanup()
+    return jsonify({"jobs": [job.to_dict() for job in manager.jobs()]})
+
+
+@main_bp.route('/api/reports/export/jobs/<job_id>')
+@login_required
+def api_export_job_status(job_id):
+    job = get_export_manager(current_app._get_current_object()).get(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo no encontrado o expirado"}), 404
+    return jsonify(job.to_dict())
+
+
+@main_bp.route('/api/reports/export/jobs/<job_id>/download')
+@login_required
+def api_export_job_download(job_id):
+    job = get_export_manager(current_app._get_current_object()).get(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo no encontrado o expirado"}), 404
+    if job.status != 'done' or not job.path:
+        return jsonify({"error": "El archivo aún no está listo", "status": job.status}), 409
+    return send_file(job.path, mimetype=job.mimetype, as_attachment=True, download_name=job.filename)
+
+
 @main_bp.route('/api/reports/export.xlsx')
 @login_required
 def api_reports_export_xlsx():
     start_date = request.args.get('start')
     end_date = request.args.get('end')
     customer = request.args.get('q')
+    account_codes = request.args.get('accounts')
     try:
-        from openpyxl import Workbook
-        from openpyxl.utils import get_column_letter
-        connector = OdooConnector()
-        rows = connector.get_report_lines(start_date=start_date, end_date=end_date, customer=customer)
-        wb = Workbook()
-        ws = wb.active
-        ws.title = 'CxC'
-        # Map de etiquetas legibles
-        columns = [
-            ('date','Fecha (date)'),
-            ('I10nn_latam_document_type_id','Tipo de Documento (l10n_latam_document_type_id)'),
-            ('move_name','Número (move_name)'),
-            ('invoice_origin','Origen (invoice_origin)'),
-            ('account_id/code','Cuenta/Código (account_id/code)'),
-            ('account_id/name','Cuenta/Nombre (account_id/name)'),
-            ('patner_id/cod_client_sap','Socio/Cod. Cliente SAP (partner_id/code_client_sap)'),
-            ('patner_id/vat','Socio/NIF (partner_id/vat)'),
-            ('patner_id','Socio (partner_id)'),
-            ('amount_currency','Importe en moneda (amount_currency)'),
-            ('amount_residual_currency','Importe residual en moneda (amount_residual_currency)'),
-            ('date_maturity','Fecha de vencimiento (date_maturity)'),
-            ('ref','Referencia (ref)'),
-            ('name','Etiqueta (name)'),
-            ('move_id/invoice_user_id','Asiento/Vendedor (move_id/invoice_user_id)'),
-            ('patner_id/state_id','Socio/Provincia (partner_id/state_id)'),
-            ('patner_id/l10n_pe_district','Socio/Distrito (partner_id/l10n_pe_district)'),
-            ('patner_id/contact_adress','Socio/Dirección completa (partner_id/contact_adress)'),
-            ('destiny_adress','Dirección de destino (destiny_adress)'),
-            ('patner_id/country_code','Socio/Código de país (partner_id/country_code)'),
-            ('patner_id/country_id','Socio/País (partner_id/country_id)'),
-            ('move_id/sales_channel_id','Asiento/Canal de venta (move_id/sales_channel_id)'),
-            ('move_id/sales_type_id','Asiento/Tipo de venta (move_id/sales_type_id)')
-        ]
-        ws.append([label for _, label in columns])
-        for r in rows:
-            ws.append([r.get(key, '') for key, _ in columns])
-        # Adjust column widths
-        for i, h in enumerate(headers, start=1):
-            ws.column_dimensions[get_column_letter(i)].width = min(max(12, len(h) + 2), 40)
-        import io
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        return Response(output.read(), mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers={'Content-Disposition': 'attachment; filename=cxc_report.xlsx'})
+        connector = _data_source()
+        batches = connector.iter_report_lines(start_date=start_date, end_date=end_date, customer=customer,
+                                              account_codes=account_codes, order=DEFAULT_REPORT_ORDER)
+        # Libro write-only alimentado por lotes; se envía por bloques desde un archivo temporal
+        output = write_xlsx((row for batch in batches for row in batch),
+                            spool_max_bytes=current_app.config.get('EXPORT_SPOOL_MAX_BYTES', 16 * 1024 * 1024))
+        headers = {
+            'Content-Disposition': 'attachment; filename=cxc_report.xlsx',
+            'Content-Length': str(file_size(output)),
+        }
+        return Response(iter_file(output), mimetype=XLSX_MIMETYPE, headers=headers, direct_passthrough=True)
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
-
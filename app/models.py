@@ -19,3 +19,82 @@ class User(db.Model, UserMixin):
 def load_user(user_id: str):
     return User.query.get(int(user_id))
 
+
+# --- Réplica local de cuentas por cobrar (sincronizada desde Odoo) ---------
+
+class OdooPartner(db.Model):
+    __tablename__ = "odoo_partner"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # id en Odoo
+    name = db.Column(db.String(255), index=True)
+    vat = db.Column(db.String(32), index=True)
+    cod_client_sap = db.Column(db.String(64))
+    state_id = db.Column(db.Integer)
+    state_name = db.Column(db.String(128))
+    l10n_pe_district = db.Column(db.String(128))
+    country_id = db.Column(db.Integer)
+    country_name = db.Column(db.String(128))
+    country_code = db.Column(db.String(8))
+    contact_address = db.Column(db.Text)
+    write_date = db.Column(db.String(19))
+
+
+class OdooMove(db.Model):
+    __tablename__ = "odoo_move"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # id en Odoo
+    name = db.Column(db.String(64))
+    ref = db.Column(db.String(255))
+    move_type = db.Column(db.String(32))
+    state = db.Column(db.String(16))
+    payment_state = db.Column(db.String(32))
+    partner_id = db.Column(db.Integer, index=True)
+    partner_name = db.Column(db.String(255))
+    invoice_date = db.Column(db.Date, index=True)
+    invoice_date_due = db.Column(db.Date, index=True)
+    amount_total = db.Column(db.Float)
+    amount_residual = db.Column(db.Float)
+    currency_id = db.Column(db.Integer)
+    currency_name = db.Column(db.String(16))
+    invoice_origin = db.Column(db.String(255))
+    document_type_id = db.Column(db.Integer)
+    document_type_name = db.Column(db.String(128))
+    sales_channel_id = db.Column(db.Integer)
+    sales_channel_name = db.Column(db.String(128))
+    team_id = db.Column(db.Integer)
+    team_name = db.Column(db.String(128), index=True)
+    invoice_user_id = db.Column(db.Integer)
+    invoice_user_name = db.Column(db.String(128))
+    sales_type_id = db.Column(db.Integer)
+    sales_type_name = db.Column(db.String(128))
+    write_date = db.Column(db.String(19))
+
+
+class OdooMoveLine(db.Model):
+    __tablename__ = "odoo_move_line"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # id en Odoo
+    move_id = db.Column(db.Integer, index=True)
+    move_name = db.Column(db.String(64))
+    date = db.Column(db.Date, index=True)
+    date_maturity = db.Column(db.Date, index=True)
+    ref = db.Column(db.String(255))
+    name = db.Column(db.Text)
+    amount_currency = db.Column(db.Float)
+    amount_residual_currency = db.Column(db.Float)
+    partner_id = db.Column(db.Integer, index=True)
+    partner_name = db.Column(db.String(255))
+    account_id = db.Column(db.Integer)
+    account_code = db.Column(db.String(32), index=True)
+    account_name = db.Column(db.String(255))
+    write_date = db.Column(db.String(19))
+
+
+class OdooSyncState(db.Model):
+    __tablename__ = "odoo_sync_state"
+
+    model = db.Column(db.String(64), primary_key=True)
+    watermark = db.Column(db.String(19))  # write_date máximo sincronizado
+    records = db.Column(db.Integer, default=0)
+    last_full_sync = db.Column(db.DateTime)
+    last_run = db.Column(db.DateTime)
@@ -0,0 +1,164 @@
+"""Antigüedad de saldos (aging) de las líneas por cobrar del reporte CxC 12/13.
+
+``AgingIndex`` guarda las líneas una sola vez en arreglos ordenados por fecha de
+vencimiento. Para cualquier fecha de corte, los límites de cada tramo se ubican
+con búsqueda binaria (``searchsorted``) y los saldos por cliente o por cuenta
+se suman con ``bincount``: no hay otra pasada en Python sobre las líneas.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from .kpi_calculator import _Encoder, _to_datetime64
+
+
+# Tramos: (clave, etiqueta, días de atraso mínimos, máximos); None = sin límite
+AGING_BUCKETS = [
+    ("current", "Vigente", None, 0),
+    ("d1_30", "1-30", 1, 30),
+    ("d31_60", "31-60", 31, 60),
+    ("d61_90", "61-90", 61, 90),
+    ("d91_180", "91-180", 91, 180),
+    ("d180_plus", ">180", 181, None),
+]
+AGING_GROUPS = ("partner", "account")
+
+
+def _account_family(code: str) -> str:
+    # Reportes CxC 12 y 13: se agrupa por los dos primeros dígitos de la cuenta
+    return code[:2] if code else "(Sin cuenta)"
+
+
+class AgingIndex:
+    """Líneas ordenadas por vencimiento con códigos de cliente y de cuenta."""
+
+    def __init__(self, rows: Iterable[Dict]):
+        partners, accounts = _Encoder(), _Encoder()
+        maturity, amounts, partner_codes, account_codes, vats = [], [], [], [], {}
+        for row in rows:
+            partner = row.get("patner_id") or "(Sin nombre)"
+            # Sin vencimiento se usa la fecha contable de la línea
+            maturity.append(row.get("date_maturity") or row.get("date") or None)
+            amounts.append(float(row.get("amount_residual_currency") or 0.0))
+            code = partners(partner)
+            partner_codes.append(code)
+            account_codes.append(accounts(_account_family(row.get("account_id/code") or "")))
+            vats.setdefault(code, row.get("patner_id/vat") or "")
+
+        due = _to_datetime64(maturity)
+        # NaT al final del orden: se tratan como vigentes
+        order = np.argsort(due, kind="stable")
+        self.due = due[order]
+        self.amount = np.array(amounts, dtype=np.float64)[order]
+        self.partner = np.array(partner_codes, dtype=np.int64)[order]
+        self.account = np.array(account_codes, dtype=np.int64)[order]
+        self.partner_labels = partners.labels
+        self.partner_vats = [vats.get(i, "") for i in range(len(partners.labels))]
+        self.account_labels = accounts.labels
+        self.size = len(self.amount)
+        self.undated = int(np.count_nonzero(np.isnat(self.due)))
+        self.built_at = time.time()
+
+    def _bucket_of_lines(self, as_of: date) -> np.ndarray:
+        """Tramo de cada línea: límites ubicados por búsqueda binaria sobre `due`."""
+        dated = self.size - self.undated
+        # Fronteras en orden ascendente de vencimiento: >180, 91-180, ..., 1-30, vigente
+        cutoffs = [np.datetime64(as_of - timedelta(days=low), "D") for _, _, low, _ in reversed(AGING_BUCKETS[1:])]
+        bounds = np.searchsorted(self.due[:dated], cutoffs, side="right")
+        edges = np.concatenate(([0], bounds, [dated]))
+        buckets = np.empty(self.size, dtype=np.int64)
+        last = len(AGING_BUCKETS) - 1
+        for i in range(len(edges) - 1):
+            buckets[edges[i]:edges[i + 1]] = last - i
+        buckets[dated:] = 0
+        return buckets
+
+    def buckets(self, as_of: date | None = None, by: str = "partner") -> Dict:
+        """Matriz grupo x tramo para la fecha de corte, con totales por tramo."""
+        if by not in AGING_GROUPS:
+            raise ValueError(f"Agrupación no soportada: {by}")
+        as_of = as_of or date.today()
+        codes = self.partner if by == "partner" else self.account
+        labels = self.partner_labels if by == "partner" else self.account_labels
+        n_buckets = len(AGING_BUCKETS)
+        bucket = self._bucket_of_lines(as_of)
+        matrix = np.bincount(codes * n_buckets + bucket, weights=self.amount,
+                             minlength=len(labels) * n_buckets).reshape(len(labels), n_buckets)
+        lines = np.bincount(codes, minlength=len(labels))
+        totals = matrix.sum(axis=1)
+        order = np.lexsort((np.arange(len(labels)), -totals))
+
+        rows = []
+        for g in order:
+            row = {"grupo": labels[g], "lineas": int(lines[g])}
+            if by == "partner":
+                row["vat"] = self.partner_vats[g]
+            row.update({key: round(float(matrix[g, i]), 2) for i, (key, _, _, _) in enumerate(AGING_BUCKETS)})
+            row["total"] = round(float(totals[g]), 2)
+            rows.append(row)
+        summary = {key: round(float(matrix[:, i].sum()), 2) for i, (key, _, _, _) in enumerate(AGING_BUCKETS)}
+        summary["total"] = round(float(self.amount.sum()), 2)
+        return {"as_of": as_of.isoformat(), "by": by, "rows": rows, "totales": summary}
+
+
+def aging_columns(by: str = "partner") -> List[Tuple[str, str]]:
+    """Columnas (clave, etiqueta) del CSV de antigüedad."""
+    columns = [("grupo", "Cliente" if by == "partner" else "Cuenta")]
+    if by == "partner":
+        columns.append(("vat", "RUC/NIF"))
+    columns.append(("lineas", "Líneas"))
+    columns += [(key, label) for key, label, _, _ in AGING_BUCKETS]
+    columns.append(("total", "Total"))
+    return columns
+
+
+class AgingIndexCache:
+    """Índices por filtros (fuente, fechas, cliente, cuentas) con vigencia `ttl`."""
+
+    def __init__(self, ttl: float = 300, max_entries: int = 16):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[tuple, AgingIndex] = {}
+        self._lock = threading.Lock()
+        self._build_locks: Dict[tuple, threading.Lock] = {}
+
+    def get(self, key: tuple, build: Callable[[], Iterable[Dict]]) -> AgingIndex:
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        # Un solo hilo construye cada índice; los demás esperan y lo reutilizan
+        with build_lock:
+            index = self._entries.get(key)
+            if index is not None and time.time() - index.built_at < self.ttl:
+                return index
+            index = AgingIndex(build())
+            with self._lock:
+                self._entries[key] = index
+                while len(self._entries) > self.max_entries:
+                    oldest = min(self._entries, key=lambda k: self._entries[k].built_at)
+                    del self._entries[oldest]
+                    self._build_locks.pop(oldest, None)
+            return index
+
+    def invalidate(self) -> int:
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            return removed
+
+
+_indexes: AgingIndexCache | None = None
+_indexes_lock = threading.Lock()
+
+
+def get_aging_indexes(config=None) -> AgingIndexCache:
+    global _indexes
+    with _indexes_lock:
+        if _indexes is None:
+            config = config or {}
+            _indexes = AgingIndexCache(ttl=config.get("AGING_INDEX_TTL", 300))
+        return _indexes
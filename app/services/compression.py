@@ -0,0 +1,69 @@
+"""Compresión gzip/brotli de las respuestas de la app.
+
+Las respuestas JSON/CSV/HTML por encima de ``COMPRESS_MIN_BYTES`` se
+comprimen según ``Accept-Encoding``. Brotli se usa solo si el paquete
+``brotli`` está instalado; si no, gzip. Las respuestas en streaming (exports
+por lotes, descargas de archivos) se dejan tal cual.
+"""
+from __future__ import annotations
+
+import gzip
+
+from flask import request
+
+from .metrics import span
+
+try:  # dependencia opcional
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'text/csv', 'text/html', 'text/plain', 'text/css', 'text/javascript', 'application/javascript',
+}
+
+
+def compress(data: bytes, encoding: str, level: int | None = None) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=5 if level is None else level)
+    # mtime=0: mismo cuerpo comprimido para el mismo contenido
+    return gzip.compress(data, compresslevel=6 if level is None else level, mtime=0)
+
+
+def available_encodings() -> list:
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def init_compression(app) -> None:
+    """Registra el hook que comprime las respuestas (COMPRESS_ENABLED, por defecto True)."""
+    if not app.config.get('COMPRESS_ENABLED', True):
+        return
+    min_bytes = app.config.get('COMPRESS_MIN_BYTES', 1024)
+    gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+    brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 5)
+    encodings = [e for e in available_encodings() if e in app.config.get('COMPRESS_ENCODINGS', ('br', 'gzip'))]
+
+    @app.after_request
+    def _compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        data = response.get_data()
+        if len(data) < min_bytes:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(encodings)
+        if not encoding:
+            return response
+        with span('compression'):
+            body = compress(data, encoding, brotli_quality if encoding == 'br' else gzip_level)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        # ETag fuerte distinto por codificación; conditional.py reconoce el sufijo
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f'{etag}-{encoding}')
+        return response
@@ -0,0 +1,151 @@
+"""ETag y GET condicional a partir de la versión de los datos en Odoo.
+
+La versión de los datos de una consulta es ``max(write_date)`` más el conteo
+de registros de su dominio (un solo ``read_group``). El ETag combina la ruta,
+los parámetros y esa versión: si el cliente ya lo tiene se responde
+``304 Not Modified``; si no, se reutiliza el cuerpo serializado guardado para
+ese ETag y solo sin él se ejecuta la vista.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Dict, Tuple
+
+from flask import Response, current_app, g, has_request_context, request
+
+
+# Sufijos que la compresión añade al ETag de cada codificación (ver compression.py)
+ENCODING_SUFFIXES = ('-gzip', '-br')
+
+
+class BodyCache:
+    """Cuerpos serializados por ETag (LRU acotado en bytes)."""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, etag: str) -> Tuple[bytes, str] | None:
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return entry
+
+    def set(self, etag: str, body: bytes, mimetype: str) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(etag, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+            self._entries[etag] = (body, mimetype)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes and self._entries:
+                _, (old_body, _) = self._entries.popitem(last=False)
+                self._bytes -= len(old_body)
+
+    def count_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+            }
+
+
+_bodies: BodyCache | None = None
+_bodies_lock = threading.Lock()
+
+
+def get_body_cache(config=None) -> BodyCache:
+    global _bodies
+    with _bodies_lock:
+        if _bodies is None:
+            config = config or {}
+            _bodies = BodyCache(max_bytes=config.get('ETAG_BODY_CACHE_BYTES', 32 * 1024 * 1024))
+        return _bodies
+
+
+def fresh_reads_requested() -> bool:
+    """True si el request en curso debe leer Odoo sin pasar por la caché TTL."""
+    return has_request_context() and bool(g.get('odoo_fresh_reads'))
+
+
+def make_etag(version: str) -> str:
+    args = sorted(request.args.items(multi=True))
+    return hashlib.sha1(repr((request.path, args, version)).encode('utf-8')).hexdigest()[:32]
+
+
+def _client_has(etag: str) -> str | None:
+    """ETag (con o sin sufijo de codificación) que el cliente envió en If-None-Match."""
+    for candidate in (etag,) + tuple(etag + suffix for suffix in ENCODING_SUFFIXES):
+        if request.if_none_match.contains(candidate):
+            return candidate
+    return None
+
+
+def conditional_get(version_for: Callable[[], str | None]):
+    """Decora una vista GET con ETag fuerte, 304 y caché de cuerpos.
+
+    `version_for()` devuelve la versión de los datos de la vista o None cuando
+    no aplica (p. ej. réplica local o cubo en memoria): entonces la vista se
+    ejecuta sin cambios.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('ETAG_ENABLED', True) or request.method != 'GET':
+                return view(*args, **kwargs)
+            try:
+                version = version_for()
+            except Exception:
+                # La vista vuelve a consultar Odoo e informa el error
+                version = None
+            if version is None:
+                return view(*args, **kwargs)
+
+            etag = make_etag(version)
+            bodies = get_body_cache(current_app.config)
+            matched = _client_has(etag)
+            if matched:
+                bodies.count_not_modified()
+                response = Response(status=304)
+                response.set_etag(matched)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+
+            cached = bodies.get(etag)
+            if cached is not None:
+                body, mimetype = cached
+                response = Response(body, mimetype=mimetype)
+            else:
+                # Versión nueva o no vista: no se confía en resultados cacheados por TTL
+                g.odoo_fresh_reads = True
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed or response.direct_passthrough:
+                    return response
+                bodies.set(etag, response.get_data(), response.mimetype)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,211 @@
+"""Caché de larga vida para dimensiones casi estáticas de Odoo (partners, cuentas).
+
+Los registros se guardan en memoria por id. Solo se leen de Odoo los ids que
+aún no se han visto; cada ``refresh_seconds`` se traen los registros con
+``write_date`` posterior a la marca de agua y se actualizan los conocidos.
+Los partners pueden persistirse además en la tabla local ``odoo_partner`` para
+arrancar en caliente tras un reinicio.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+from .. import db
+from ..models import OdooPartner
+
+
+PARTNER_FIELDS = ['name', 'vat', 'state_id', 'country_id', 'contact_address', 'write_date']
+PARTNER_OPTIONAL_FIELDS = ['l10n_pe_district', 'cod_client_sap', 'country_code']
+ACCOUNT_FIELDS = ['code', 'name', 'write_date']
+
+
+class DimensionCache:
+    def __init__(self, model: str, fields: list, optional: list | None = None, refresh_seconds: float = 300,
+                 max_records: int = 200000):
+        self.model = model
+        self.fields = list(fields)
+        self.optional = list(optional or [])
+        self.refresh_seconds = refresh_seconds
+        self.max_records = int(max_records)
+        self.records: OrderedDict[int, dict] = OrderedDict()
+        self.watermark = ''
+        self._last_refresh = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'fetched': 0, 'refreshed': 0, 'refreshes': 0, 'evictions': 0}
+
+    # -- lectura -------------------------------------------------------------
+    def _read(self, connector, ids: list) -> list:
+        return connector.read(self.model, ids, connector.available_fields(self.model, self.fields, self.optional))
+
+    def _search_changed(self, connector, watermark: str) -> list:
+        fields = connector.available_fields(self.model, self.fields, self.optional)
+        return connector.search_read(self.model, [['write_date', '>=', watermark]], fields, use_cache=False)
+
+    def _store(self, records: Iterable[dict], only_known: bool = False) -> list:
+        stored = []
+        with self._lock:
+            for rec in records:
+                if only_known and rec['id'] not in self.records:
+                    continue
+                self.records[rec['id']] = rec
+                self.records.move_to_end(rec['id'])
+                stored.append(rec)
+                if rec.get('write_date') and rec['write_date'] > self.watermark:
+                    self.watermark = rec['write_date']
+            while len(self.records) > self.max_records:
+                self.records.popitem(last=False)
+                self._stats['evictions'] += 1
+        return stored
+
+    def refresh(self, connector, force: bool = False) -> int:
+        """Actualiza los registros conocidos modificados desde la marca de agua."""
+        now = time.monotonic()
+        with self._lock:
+            due = force or now - self._last_refresh >= self.refresh_seconds
+            if not due or not self.records or not self.watermark:
+                return 0
+            self._last_refresh = now
+            watermark = self.watermark
+        changed = self._store(self._search_changed(connector, watermark), only_known=True)
+        with self._lock:
+            self._stats['refreshes'] += 1
+            self._stats['refreshed'] += len(changed)
+        self._persist(changed)
+        return len(changed)
+
+    def get_many(self, connector, ids: Iterable[int]) -> Dict[int, dict]:
+        """Mapa id -> registro; solo consulta a Odoo los ids no vistos."""
+        ids = list(ids)
+        self.refresh(connector)
+        with self._lock:
+            missing = []
+            for i in ids:
+                if i in self.records:
+                    # LRU: un acierto pasa al final y se desaloja último
+                    self.records.move_to_end(i)
+                else:
+                    missing.append(i)
+            self._stats['hits'] += len(ids) - len(missing)
+            self._stats['misses'] += len(missing)
+        if missing:
+            fetched = self._store(self._read(connector, missing))
+            with self._lock:
+                self._stats['fetched'] += len(fetched)
+            self._persist(fetched)
+        with self._lock:
+            return {i: self.records[i] for i in ids if i in self.records}
+
+    def invalidate(self) -> int:
+        with self._lock:
+            removed = len(self.records)
+            self.records.clear()
+            self.watermark = ''
+            return removed
+
+    # -- persistencia (opcional) ---------------------------------------------
+    def warm(self) -> int:
+        return 0
+
+    def _persist(self, records: list) -> None:
+        pass
+
+    def stats(self) -> Dict:
+        with self._lock:
+            data = dict(self._stats)
+            data.update({
+                'model': self.model,
+                'records': len(self.records),
+                'watermark': self.watermark or None,
+                'refresh_seconds': self.refresh_seconds,
+            })
+        return data
+
+
+def _m2o(record_id, name) -> list | bool:
+    return [record_id, name] if record_id else False
+
+
+class PartnerDimension(DimensionCache):
+    """Partners con persistencia opcional en la tabla local ``odoo_partner``."""
+
+    def __init__(self, persist: bool = False, **options):
+        super().__init__('res.partner', PARTNER_FIELDS, PARTNER_OPTIONAL_FIELDS, **options)
+        self.persist = persist
+
+    def warm(self) -> int:
+        if not self.persist:
+            return 0
+        records = []
+        for p in db.session.query(OdooPartner).yield_per(5000):
+            records.append({
+                'id': p.id,
+                'name': p.name or False,
+                'vat': p.vat or False,
+                'state_id': _m2o(p.state_id, p.state_name),
+                'l10n_pe_district': p.l10n_pe_district or False,
+                'country_id': _m2o(p.country_id, p.country_name),
+                'contact_address': p.contact_address or False,
+                'cod_client_sap': p.cod_client_sap or False,
+                'country_code': p.country_code or False,
+                'write_date': p.write_date or False,
+            })
+        self._store(records)
+        # Lo cargado desde disco puede estar atrasado: se refresca en la primera lectura
+        self._last_refresh = float('-inf')
+        return len(records)
+
+    def _persist(self, records: list) -> None:
+        if not self.persist or not records:
+            return
+        from .mirror_sync import MirrorSync, _partner_row
+
+        try:
+            MirrorSync._upsert(OdooPartner, [_partner_row(rec) for rec in records])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
+
+_dimensions: Dict[Tuple[str, str, str], DimensionCache] = {}
+_dimensions_lock = threading.Lock()
+
+
+def get_dimension(instance: Tuple[str, str], model: str, config=None) -> DimensionCache:
+    """Dimensión de proceso por instancia Odoo (url, db) y modelo."""
+    key = (instance[0], instance[1], model)
+    with _dimensions_lock:
+        dim = _dimensions.get(key)
+        if dim is not None:
+            return dim
+    config = config or {}
+    options = {
+        'refresh_seconds': config.get('DIMENSION_REFRESH_SECONDS', 300),
+        'max_records': config.get('DIMENSION_MAX_RECORDS', 200000),
+    }
+    if model == 'res.partner':
+        dim = PartnerDimension(persist=bool(config.get('DIMENSION_PERSIST', False)), **options)
+        try:
+            dim.warm()
+        except Exception:
+            db.session.rollback()
+    elif model == 'account.account':
+        dim = DimensionCache(model, ACCOUNT_FIELDS, **options)
+    else:
+        raise ValueError(f"Dimensión no soportada: {model}")
+    with _dimensions_lock:
+        return _dimensions.setdefault(key, dim)
+
+
+def dimension_stats() -> list:
+    with _dimensions_lock:
+        items = list(_dimensions.items())
+    return [{'instance': f"{url}/{dbname}", **dim.stats()} for (url, dbname, _), dim in items]
+
+
+def invalidate_dimensions(model: str | None = None) -> int:
+    with _dimensions_lock:
+        dims = [dim for (_, _, m), dim in _dimensions.items() if model is None or m == model]
+    return sum(dim.invalidate() for dim in dims)
@@ -0,0 +1,222 @@
+"""Cola de trabajos de exportación en segundo plano.
+
+Las exportaciones pesadas (XLSX/CSV del reporte CxC completo) se ejecutan en
+un pool acotado de hilos fuera del request. Cada trabajo informa su progreso
+(filas leídas/escritas) y deja el archivo en disco hasta que vence la retención.
+Los trabajos idénticos que siguen pendientes o en curso se reutilizan.
+
+El estado de los trabajos vive en la memoria de cada proceso: con varios
+workers (gunicorn) la consulta de progreso o la descarga puede llegar a otro
+proceso y responder 404. Los archivos de ``EXPORT_DIR`` que dejó otro proceso
+(o uno anterior) se borran igual al vencer la retención.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from .exporters import iter_csv, write_xlsx
+from .mirror_sync import MirrorReader
+from .odoo_connector import OdooConnector
+
+
+EXPORT_FORMATS = {
+    'xlsx': ('cxc_report.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('cxc_report.csv', 'text/csv; charset=utf-8'),
+}
+JOB_PARAMS = ('start', 'end', 'q', 'accounts', 'source')
+# Archivos que escriben los trabajos: <id hex>.<formato>
+JOB_FILE_PATTERN = re.compile(r'^[0-9a-f]{32}\.(?:%s)$' % '|'.join(EXPORT_FORMATS))
+# Barrido del directorio como mucho cada tantos segundos
+SWEEP_INTERVAL_SECONDS = 60
+
+
+class ExportJob:
+    def __init__(self, key: str, fmt: str, params: Dict):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.format = fmt
+        self.params = params
+        self.status = 'pending'
+        self.rows_total: int | None = None
+        self.rows_fetched = 0
+        self.rows_written = 0
+        self.path: str | None = None
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+
+    @property
+    def filename(self) -> str:
+        return EXPORT_FORMATS[self.format][0]
+
+    @property
+    def mimetype(self) -> str:
+        return EXPORT_FORMATS[self.format][1]
+
+    def to_dict(self) -> Dict:
+        progress = None
+        if self.rows_total:
+            progress = round(min(self.rows_written / self.rows_total, 1.0) * 100, 1)
+        elif self.status == 'done':
+            progress = 100.0
+        return {
+            'id': self.id,
+            'format': self.format,
+            'params': self.params,
+            'status': self.status,
+            'rows_total': self.rows_total,
+            'rows_fetched': self.rows_fetched,
+            'rows_written': self.rows_written,
+            'progress': progress,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class ExportJobManager:
+    def __init__(self, app, max_workers: int = 2, directory: str | None = None, retention_seconds: float = 3600):
+        self.app = app
+        self.directory = directory or os.path.join(app.instance_path, 'exports')
+        self.retention_seconds = retention_seconds
+        os.makedirs(self.directory, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix='export-job')
+        self._jobs: Dict[str, ExportJob] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.sweep()
+
+    @staticmethod
+    def job_key(fmt: str, params: Dict) -> str:
+        return json.dumps({'format': fmt, **{k: params.get(k) or None for k in JOB_PARAMS}}, sort_keys=True)
+
+    def submit(self, fmt: str, params: Dict) -> ExportJob:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Formato de exportación no soportado: {fmt}")
+        params = {k: params.get(k) for k in JOB_PARAMS if params.get(k)}
+        key = self.job_key(fmt, params)
+        self.cleanup()
+        with self._lock:
+            # Deduplicación: un trabajo idéntico aún pendiente o en curso se reutiliza
+            for job in self._jobs.values():
+                if job.key == key and job.status in ('pending', 'running'):
+                    return job
+            job = ExportJob(key, fmt, params)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> ExportJob | None:
+        self.cleanup()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list:
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+    def cleanup(self) -> int:
+        """Elimina trabajos terminados (y sus archivos) más antiguos que la retención."""
+        limit = time.time() - self.retention_seconds
+        with self._lock:
+            expired = [j for j in self._jobs.values() if j.finished_at and j.finished_at < limit]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            if job.path and os.path.exists(job.path):
+                try:
+                    os.remove(job.path)
+                except OSError:
+                    pass
+        if time.monotonic() - self._last_sweep >= SWEEP_INTERVAL_SECONDS:
+            self.sweep()
+        return len(expired)
+
+    def sweep(self) -> int:
+        """Borra archivos de trabajos en `directory` modificados antes de la retención.
+
+        Cubre los que dejó otro worker o un proceso anterior, cuyos trabajos no
+        están en `_jobs`; un trabajo en curso sigue escribiendo y no vence.
+        """
+        self._last_sweep = time.monotonic()
+        limit = time.time() - self.retention_seconds
+        removed = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return 0
+        for entry in entries:
+            if not JOB_FILE_PATTERN.match(entry.name):
+                continue
+            try:
+                if entry.is_file() and entry.stat().st_mtime < limit:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def _rows(self, job: ExportJob, batches):
+        for batch in batches:
+            job.rows_fetched += len(batch)
+            for row in batch:
+                yield row
+                job.rows_written += 1
+
+    def _run(self, job: ExportJob) -> None:
+        job.status = 'running'
+        job.started_at = time.time()
+        path = os.path.join(self.directory, f"{job.id}.{job.format}")
+        try:
+            with self.app.app_context():
+                source = MirrorReader() if job.params.get('source') == 'mirror' else OdooConnector()
+                filters = {
+                    'start_date': job.params.get('start'),
+                    'end_date': job.params.get('end'),
+                    'customer': job.params.get('q'),
+                    'account_codes': job.params.get('accounts'),
+                }
+                job.rows_total = source.count_report_lines(**filters)
+                batches = source.iter_report_lines(order='date desc, id desc', **filters)
+                rows = self._rows(job, batches)
+                with open(path, 'wb') as fh:
+                    if job.format == 'xlsx':
+                        write_xlsx(rows, output=fh)
+                    else:
+                        for chunk in iter_csv(rows, bom=bool(self.app.config.get('CSV_EXCEL_BOM', True))):
+                            fh.write(chunk)
+            job.path = path
+            job.status = 'done'
+        except Exception as exc:
+            job.status = 'error'
+            job.error = str(exc)
+            if os.path.exists(path):
+                os.remove(path)
+        finally:
+            job.finished_at = time.time()
+
+
+_manager: ExportJobManager | None = None
+_manager_lock = threading.Lock()
+
+
+def get_export_manager(app) -> ExportJobManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ExportJobManager(
+                app,
+                max_workers=app.config.get('EXPORT_WORKERS', 2),
+                directory=app.config.get('EXPORT_DIR'),
+                retention_seconds=app.config.get('EXPORT_RETENTION_SECONDS', 3600),
+            )
+        return _manager
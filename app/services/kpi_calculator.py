@@ -1,7 +1,13 @@
 from __future__ import annotations
 
+import calendar
+import heapq
+from abc import ABC, abstractmethod
 from datetime import date, datetime
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
 
 
 def _parse_date(value: str | None) -> date | None:
@@ -46,27 +52,523 @@ def compute_kpis(invoices: List[Dict]) -> Dict[str, float]:
     }
 
 
+def _partner_name(partner) -> str:
+    if isinstance(partner, list) and len(partner) >= 2:
+        return str(partner[1])
+    if isinstance(partner, str):
+        return partner
+    return "(Sin nombre)"
+
+
+def _m2o_label(value, default: str = "") -> str:
+    return value[1] if isinstance(value, list) and len(value) >= 2 else default
+
+
+# --- Pipeline de agregación en una sola pasada ------------------------------
+# Cada factura se normaliza una vez (fechas parseadas con caché, saldo, nombres)
+# y se entrega a todos los acumuladores registrados.
+
+_cached_date = lru_cache(maxsize=8192)(_parse_date)
+
+
+class MonthBoundaries:
+    """Tabla precalculada 'YYYY-MM' -> último día del mes."""
+
+    def __init__(self):
+        self._last_day: Dict[str, date] = {}
+
+    def last_day(self, month_key: str) -> date:
+        last = self._last_day.get(month_key)
+        if last is None:
+            year, month = map(int, month_key.split("-"))
+            last = date(year, month, calendar.monthrange(year, month)[1])
+            self._last_day[month_key] = last
+        return last
+
+
+class InvoiceRow:
+    """Campos de una factura ya normalizados para los acumuladores."""
+
+    __slots__ = ("raw", "residual", "due", "invoice_date", "month_key", "partner", "doc_type", "channel", "overdue", "overdue_days")
+
+    def __init__(self, inv: Dict, today: date):
+        self.raw = inv
+        self.residual = float(inv.get("amount_residual") or 0.0)
+        self.due = _cached_date(inv.get("invoice_date_due"))
+        self.invoice_date = _cached_date(inv.get("invoice_date"))
+        self.month_key = self.invoice_date.strftime("%Y-%m") if self.invoice_date else None
+        self.partner = _partner_name(inv.get("partner_id"))
+        self.doc_type = _m2o_label(inv.get("l10n_latam_document_type_id"), inv.get("move_type") or "Desconocido")
+        self.channel = _m2o_label(inv.get("sales_channel_id"))
+        self.overdue = bool(self.due and self.due < today)
+        self.overdue_days = (today - self.due).days if self.overdue else 0
+
+
+class Accumulator(ABC):
+    """Acumulador del pipeline: recibe cada fila que cumple `where` y produce un resultado."""
+
+    def __init__(self, where: Callable[[InvoiceRow], bool] | None = None):
+        self.where = where
+
+    def accepts(self, row: InvoiceRow) -> bool:
+        return self.where is None or self.where(row)
+
+    @abstractmethod
+    def add(self, row: InvoiceRow) -> None:
+        """Incorpora una fila aceptada."""
+
+    @abstractmethod
+    def result(self):
+        """Resultado tras recorrer todas las filas."""
+
+
+class SumAccumulator(Accumulator):
+    def __init__(self, value: Callable[[InvoiceRow], float], where=None):
+        super().__init__(where)
+        self.value = value
+        self.total = 0.0
+
+    def add(self, row):
+        self.total += self.value(row)
+
+    def result(self) -> float:
+        return self.total
+
+
+class CountAccumulator(Accumulator):
+    def __init__(self, where=None):
+        super().__init__(where)
+        self.count = 0
+
+    def add(self, row):
+        self.count += 1
+
+    def result(self) -> int:
+        return self.count
+
+
+class GroupSumAccumulator(Accumulator):
+    """Suma por clave; conserva el orden de primera aparición."""
+
+    def __init__(self, key: Callable[[InvoiceRow], str], value: Callable[[InvoiceRow], float], where=None):
+        super().__init__(where)
+        self.key = key
+        self.value = value
+        self.groups: Dict[str, float] = {}
+
+    def add(self, row):
+        k = self.key(row)
+        self.groups[k] = self.groups.get(k, 0.0) + self.value(row)
+
+    def result(self) -> Dict[str, float]:
+        return self.groups
+
+
+class TopNAccumulator(GroupSumAccumulator):
+    """Top N grupos por suma (heapq); a igualdad gana el que apareció primero."""
+
+    def __init__(self, key, value, n: int, where=None):
+        super().__init__(key, value, where)
+        self.n = n
+
+    def result(self) -> List[Tuple[str, float]]:
+        indexed = ((total, -seq, name) for seq, (name, total) in enumerate(self.groups.items()))
+        return [(name, total) for total, _, name in heapq.nlargest(self.n, indexed)]
+
+
+class GroupCollectAccumulator(Accumulator):
+    """Guarda las facturas originales agrupadas por clave."""
+
+    def __init__(self, key: Callable[[InvoiceRow], str], where=None):
+        super().__init__(where)
+        self.key = key
+        self.groups: Dict[str, List[Dict]] = {}
+
+    def add(self, row):
+        self.groups.setdefault(self.key(row), []).append(row.raw)
+
+    def result(self) -> Dict[str, List[Dict]]:
+        return self.groups
+
+
+class MonthlyDelinquencyAccumulator(Accumulator):
+    """Índice de morosidad por mes de factura: saldo vencido a fin de mes / saldo total."""
+
+    def __init__(self, boundaries: MonthBoundaries, where=None):
+        super().__init__(where)
+        self.boundaries = boundaries
+        self.totals: Dict[str, float] = {}
+        self.vencido: Dict[str, float] = {}
+
+    def add(self, row):
+        if not row.month_key:
+            return
+        self.totals[row.month_key] = self.totals.get(row.month_key, 0.0) + row.residual
+        if row.due and row.due <= self.boundaries.last_day(row.month_key):
+            self.vencido[row.month_key] = self.vencido.get(row.month_key, 0.0) + row.residual
+
+    def result(self) -> Tuple[List[str], List[float]]:
+        labels = sorted(self.totals)
+        values = []
+        for mk in labels:
+            total = self.totals[mk]
+            values.append(round((self.vencido.get(mk, 0.0) / total * 100) if total else 0.0, 2))
+        return labels, values
+
+
+class AggregationPipeline:
+    """Recorre las facturas una sola vez alimentando los acumuladores registrados."""
+
+    def __init__(self, today: date | None = None):
+        self.today = today or date.today()
+        self.boundaries = MonthBoundaries()
+        self.accumulators: Dict[str, Accumulator] = {}
+
+    def register(self, name: str, accumulator: Accumulator) -> "AggregationPipeline":
+        self.accumulators[name] = accumulator
+        return self
+
+    def run(self, invoices: Iterable[Dict]) -> Dict:
+        accumulators = list(self.accumulators.values())
+        for inv in invoices:
+            row = InvoiceRow(inv, self.today)
+            for acc in accumulators:
+                if acc.accepts(row):
+                    acc.add(row)
+        return {name: acc.result() for name, acc in self.accumulators.items()}
+
+
+def _positive(row: InvoiceRow) -> bool:
+    return row.residual > 0
+
+
+def _overdue(row: InvoiceRow) -> bool:
+    return row.residual > 0 and row.overdue
+
+
+def _residual(row: InvoiceRow) -> float:
+    return row.residual
+
+
+def _partner(row: InvoiceRow) -> str:
+    return row.partner
+
+
 def top15_clients(invoices: List[Dict]) -> Tuple[List[str], List[float]]:
-    by_partner: Dict[str, float] = {}
-    for inv in invoices:
-        residual = float(inv.get("amount_residual") or 0.0)
-        if residual <= 0:
-            continue
-        partner = inv.get("partner_id")
-        # partner_id can be [id, name] per xmlrpc search_read
-        partner_name = None
-        if isinstance(partner, list) and len(partner) >= 2:
-            partner_name = str(partner[1])
-        elif isinstance(partner, str):
-            partner_name = partner
+    result = AggregationPipeline().register("top", TopNAccumulator(_partner, _residual, 15, where=_positive)).run(invoices)
+    clientes = [name for name, _ in result["top"]]
+    montos = [round(amount, 2) for _, amount in result["top"]]
+    return clientes, montos
+
+
+def top15_details(invoices: List[Dict]) -> List[Dict]:
+    """Facturas de los clientes del Top 15 (por saldo desc), en una sola pasada."""
+    result = (
+        AggregationPipeline()
+        .register("top", TopNAccumulator(_partner, _residual, 15, where=_positive))
+        .register("by_partner", GroupCollectAccumulator(_partner))
+        .run(invoices)
+    )
+    details = []
+    for name, _ in result["top"]:
+        for inv in result["by_partner"].get(name, []):
+            details.append({
+                "cliente": name,
+                "documento": inv.get("name"),
+                "fecha": inv.get("invoice_date"),
+                "vence": inv.get("invoice_date_due"),
+                "monto": float(inv.get("amount_total") or 0.0),
+                "saldo": float(inv.get("amount_residual") or 0.0),
+                "origen": inv.get("invoice_origin") or "",
+            })
+    details.sort(key=lambda x: x["saldo"], reverse=True)
+    return details
+
+
+def dashboard_pipeline(channel: str | None = None, today: date | None = None) -> AggregationPipeline:
+    """Acumuladores de /api/kpis: KPIs, Top 10 vencido, condición, tipo de documento y morosidad."""
+    pipeline = AggregationPipeline(today)
+
+    def top_where(row: InvoiceRow) -> bool:
+        # Filtrar por canal NACIONAL si se pide
+        return _overdue(row) and (channel is None or (channel == "NACIONAL" and row.channel == "NACIONAL"))
+
+    return (
+        pipeline
+        .register("total_facturas", CountAccumulator())
+        .register("vencido", SumAccumulator(_residual, where=_overdue))
+        .register("vigente", SumAccumulator(_residual, where=lambda r: r.residual > 0 and not r.overdue))
+        .register("dias_vencido", SumAccumulator(lambda r: r.overdue_days, where=_overdue))
+        .register("facturas_vencidas", CountAccumulator(where=_overdue))
+        .register("top10", TopNAccumulator(_partner, _residual, 10, where=top_where))
+        .register("tipo_documento", GroupSumAccumulator(lambda r: r.doc_type, _residual, where=_positive))
+        .register("morosidad", MonthlyDelinquencyAccumulator(pipeline.boundaries, where=_positive))
+    )
+
+
+def dashboard_kpis(invoices: List[Dict], channel: str | None = None, today: date | None = None) -> Dict:
+    """Respuesta completa de /api/kpis en una sola pasada sobre las facturas."""
+    r = dashboard_pipeline(channel, today).run(invoices)
+    overdue_count = r["facturas_vencidas"]
+    avg_overdue_days = (r["dias_vencido"] / overdue_count) if overdue_count else 0.0
+    serie_labels, serie_values = r["morosidad"]
+    return {
+        "total_facturas": r["total_facturas"],
+        "monto_vencido": round(r["vencido"], 2),
+        "monto_vigente": round(r["vigente"], 2),
+        "promedio_dias_morosidad": round(avg_overdue_days, 2),
+        "top10": {"labels": [n for n, _ in r["top10"]], "values": [round(v, 2) for _, v in r["top10"]]},
+        "condicion": {"labels": ["Vigente", "Vencido"], "values": [round(r["vigente"], 2), round(r["vencido"], 2)]},
+        "tipo_documento": {"labels": list(r["tipo_documento"].keys()), "values": [round(v, 2) for v in r["tipo_documento"].values()]},
+        "morosidad_series": {"labels": serie_labels, "values": serie_values},
+    }
+
+
+# --- Agregados resueltos en Odoo (read_group) -------------------------------
+# `OdooConnector.get_unpaid_invoice_groups` devuelve filas de grupo en lugar de
+# facturas; estas funciones producen las mismas respuestas a partir de ellas.
+
+def _group_start(group: Dict, field: str) -> date | None:
+    """Inicio del rango de fechas de un grupo `campo:granularidad`, leído de `__domain`.
+
+    La etiqueta del grupo depende del idioma del usuario; el dominio no.
+    """
+    for leaf in group.get("__domain") or []:
+        if isinstance(leaf, (list, tuple)) and len(leaf) == 3 and leaf[0] == field and leaf[1] == ">=":
+            return _cached_date(str(leaf[2])[:10])
+    return None
+
+
+def _group_sums(groups: List[Dict], field: str, default: str = "") -> Dict[str, float]:
+    """Suma de `amount_residual` por etiqueta del many2one agrupado (en orden de llegada)."""
+    sums: Dict[str, float] = {}
+    for g in groups:
+        value = g.get(field)
+        # Los many2one llegan como [id, nombre]; un selection (p. ej. `move_type`), como texto
+        label = value if isinstance(value, str) and value else _m2o_label(value, default)
+        sums[label] = sums.get(label, 0.0) + float(g.get("amount_residual") or 0.0)
+    return sums
+
+
+def _top_from_sums(sums: Dict[str, float], n: int) -> Tuple[List[str], List[float]]:
+    ranked = heapq.nlargest(n, ((total, -seq, name) for seq, (name, total) in enumerate(sums.items())))
+    return [name for _, _, name in ranked], [round(total, 2) for total, _, _ in ranked]
+
+
+def compute_kpis_from_groups(groups: Dict) -> Dict[str, float]:
+    today = groups.get("today") or date.today()
+    overdue_amount = 0.0
+    not_due_amount = 0.0
+    total_overdue_days = 0
+    overdue_count = 0
+    for g in groups["by_due_day"]:
+        residual = float(g.get("amount_residual") or 0.0)
+        due_date = _group_start(g, "invoice_date_due")
+        if due_date and due_date < today:
+            count = int(g.get("__count") or g.get("invoice_date_due_count") or 0)
+            overdue_amount += residual
+            total_overdue_days += (today - due_date).days * count
+            overdue_count += count
         else:
-            partner_name = "(Sin nombre)"
-        by_partner[partner_name] = by_partner.get(partner_name, 0.0) + residual
+            not_due_amount += residual
+    avg_overdue_days = (total_overdue_days / overdue_count) if overdue_count else 0.0
+    return {
+        "total_facturas": groups["total_facturas"],
+        "monto_vencido": round(overdue_amount, 2),
+        "monto_vigente": round(not_due_amount, 2),
+        "promedio_dias_morosidad": round(avg_overdue_days, 2),
+    }
 
-    # Sort and take top 15
-    sorted_items = sorted(by_partner.items(), key=lambda x: x[1], reverse=True)[:15]
-    clientes = [name for name, _ in sorted_items]
-    montos = [round(amount, 2) for _, amount in sorted_items]
-    return clientes, montos
 
+def dashboard_from_groups(groups: Dict) -> Dict:
+    """Respuesta completa de /api/kpis a partir de filas de `read_group`."""
+    resp: Dict = dict(compute_kpis_from_groups(groups))
+    top_labels, top_values = _top_from_sums(_group_sums(groups["overdue_by_partner"], "partner_id", "(Sin nombre)"), 10)
+    tipo_doc = _group_sums(groups["by_doc_type"], groups.get("doc_type_field", "l10n_latam_document_type_id"), "out_invoice")
+
+    month_totals: Dict[str, float] = {}
+    month_vencido: Dict[str, float] = {}
+    for g in groups["by_month"]:
+        inv_month = _group_start(g, "invoice_date")
+        if not inv_month:
+            continue
+        key = inv_month.strftime("%Y-%m")
+        residual = float(g.get("amount_residual") or 0.0)
+        month_totals[key] = month_totals.get(key, 0.0) + residual
+        # Vencido en el mes si el mes de vencimiento no es posterior al de la factura
+        due_month = _group_start(g, "invoice_date_due")
+        if due_month and due_month <= inv_month:
+            month_vencido[key] = month_vencido.get(key, 0.0) + residual
+    serie_labels = sorted(month_totals)
+    serie_values = [
+        round((month_vencido.get(mk, 0.0) / month_totals[mk] * 100) if month_totals[mk] else 0.0, 2)
+        for mk in serie_labels
+    ]
+    resp.update({
+        "top10": {"labels": top_labels, "values": top_values},
+        "condicion": {"labels": ["Vigente", "Vencido"], "values": [resp["monto_vigente"], resp["monto_vencido"]]},
+        "tipo_documento": {"labels": list(tipo_doc.keys()), "values": [round(v, 2) for v in tipo_doc.values()]},
+        "morosidad_series": {"labels": serie_labels, "values": serie_values},
+    })
+    return resp
+
+
+# --- Motor columnar (NumPy) -------------------------------------------------
+# Las funciones de arriba son la implementación de referencia; este motor
+# convierte las facturas una sola vez a arreglos y calcula con operaciones
+# vectorizadas. Ambos caminos deben producir los mismos resultados.
+
+def _to_datetime64(values: List[str | None]) -> np.ndarray:
+    raw = [v[:10] if v else "NaT" for v in values]
+    try:
+        return np.array(raw, dtype="datetime64[D]")
+    except ValueError:
+        # Algún valor no es ISO: se parsea uno a uno como en la referencia
+        parsed = [_parse_date(v) for v in values]
+        return np.array([d.isoformat() if d else "NaT" for d in parsed], dtype="datetime64[D]")
+
+
+class _Encoder:
+    """Asigna códigos enteros consecutivos por orden de primera aparición."""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.labels: List[str] = []
+
+    def __call__(self, label: str) -> int:
+        code = self.codes.get(label)
+        if code is None:
+            code = len(self.labels)
+            self.codes[label] = code
+            self.labels.append(label)
+        return code
+
+
+class InvoiceColumns:
+    """Facturas en formato columnar: fechas datetime64, saldos float y códigos enteros."""
+
+    def __init__(self, invoices: List[Dict]):
+        partners, docs, channels = _Encoder(), _Encoder(), _Encoder()
+        n = len(invoices)
+        residual = np.empty(n, dtype=np.float64)
+        partner = np.empty(n, dtype=np.int64)
+        doc = np.empty(n, dtype=np.int64)
+        channel = np.empty(n, dtype=np.int64)
+        due, inv_dates = [], []
+        for i, inv in enumerate(invoices):
+            residual[i] = float(inv.get("amount_residual") or 0.0)
+            partner[i] = partners(_partner_name(inv.get("partner_id")))
+            doc[i] = docs(_m2o_label(inv.get("l10n_latam_document_type_id"), inv.get("move_type") or "Desconocido"))
+            channel[i] = channels(_m2o_label(inv.get("sales_channel_id")))
+            due.append(inv.get("invoice_date_due"))
+            inv_dates.append(inv.get("invoice_date"))
+
+        self.size = n
+        self.residual = residual
+        self.due = _to_datetime64(due)
+        self.invoice_date = _to_datetime64(inv_dates)
+        self.partner = partner
+        self.partner_labels = partners.labels
+        self.doc = doc
+        self.doc_labels = docs.labels
+        self.channel = channel
+        self.channel_labels = channels.labels
+
+    @classmethod
+    def from_invoices(cls, invoices: List[Dict]) -> "InvoiceColumns":
+        return cls(invoices)
+
+
+def _today64(today: date | None) -> np.datetime64:
+    return np.datetime64(today or date.today(), "D")
+
+
+def _ranked_groups(codes: np.ndarray, weights: np.ndarray, mask: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Grupos presentes en `mask` ordenados por suma desc y, a igualdad, por primera aparición."""
+    sums = np.bincount(codes[mask], weights=weights[mask], minlength=n_groups)
+    positions = np.flatnonzero(mask)
+    first = np.full(n_groups, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first, codes[positions], positions)
+    present = np.flatnonzero(first != np.iinfo(np.int64).max)
+    order = np.lexsort((first[present], -sums[present]))
+    return present[order], sums
+
+
+def compute_kpis_columnar(cols: InvoiceColumns, today: date | None = None) -> Dict[str, float]:
+    today64 = _today64(today)
+    positive = cols.residual > 0
+    overdue = positive & (cols.due < today64)  # NaT nunca es < today
+    not_due = positive & ~overdue
+    overdue_days = (today64 - cols.due[overdue]).astype(np.int64)
+    overdue_count = int(np.count_nonzero(overdue_days > 0))
+    avg_overdue_days = (float(overdue_days[overdue_days > 0].sum()) / overdue_count) if overdue_count else 0.0
+    return {
+        "total_facturas": cols.size,
+        "monto_vencido": round(float(cols.residual[overdue].sum()), 2),
+        "monto_vigente": round(float(cols.residual[not_due].sum()), 2),
+        "promedio_dias_morosidad": round(avg_overdue_days, 2),
+    }
+
+
+def top_n_columnar(cols: InvoiceColumns, n: int = 15, mask: np.ndarray | None = None) -> Tuple[List[str], List[float]]:
+    positive = cols.residual > 0
+    if mask is not None:
+        positive &= mask
+    groups, sums = _ranked_groups(cols.partner, cols.residual, positive, len(cols.partner_labels))
+    groups = groups[:n]
+    return [cols.partner_labels[g] for g in groups], [round(float(sums[g]), 2) for g in groups]
+
+
+def top15_clients_columnar(invoices: List[Dict]) -> Tuple[List[str], List[float]]:
+    return top_n_columnar(InvoiceColumns(invoices), 15)
+
+
+def monthly_delinquency_columnar(cols: InvoiceColumns) -> Tuple[List[str], List[float]]:
+    """Índice de morosidad por mes de factura: saldo con vencimiento <= fin de mes / saldo total."""
+    valid = (cols.residual > 0) & ~np.isnat(cols.invoice_date)
+    months = cols.invoice_date[valid].astype("datetime64[M]")
+    if months.size == 0:
+        return [], []
+    residual = cols.residual[valid]
+    month_end = (months + 1).astype("datetime64[D]") - np.timedelta64(1, "D")
+    vencido = cols.due[valid] <= month_end
+    keys, inverse = np.unique(months, return_inverse=True)
+    totals = np.bincount(inverse, weights=residual, minlength=keys.size)
+    venc = np.bincount(inverse[vencido], weights=residual[vencido], minlength=keys.size)
+    labels = [str(k) for k in keys]
+    values = [round((float(v) / float(t) * 100) if t else 0.0, 2) for v, t in zip(venc, totals)]
+    return labels, values
+
+
+def dashboard_columnar(invoices: List[Dict], channel: str | None = None, today: date | None = None) -> Dict:
+    """Respuesta completa de /api/kpis calculada sobre el formato columnar."""
+    cols = InvoiceColumns(invoices)
+    today64 = _today64(today)
+    positive = cols.residual > 0
+    overdue = positive & (cols.due < today64)
+
+    resp: Dict = dict(compute_kpis_columnar(cols, today))
+
+    # Top 10 clientes por monto vencido (filtro opcional de canal NACIONAL)
+    top_mask = overdue
+    if channel is not None:
+        nacional = cols.channel_labels.index("NACIONAL") if channel == "NACIONAL" and "NACIONAL" in cols.channel_labels else -1
+        top_mask = overdue & (cols.channel == nacional)
+    top_labels, top_values = top_n_columnar(cols, 10, top_mask)
+
+    # Tipo de documento, en orden de primera aparición
+    sums = np.bincount(cols.doc[positive], weights=cols.residual[positive], minlength=len(cols.doc_labels))
+    positions = np.flatnonzero(positive)
+    _, first = np.unique(cols.doc[positions], return_index=True)
+    doc_codes = cols.doc[positions[np.sort(first)]]
 
+    serie_labels, serie_values = monthly_delinquency_columnar(cols)
+    vigente = float(cols.residual[positive & ~overdue].sum())
+    vencido = float(cols.residual[overdue].sum())
+    resp.update({
+        "top10": {"labels": top_labels, "values": top_values},
+        "condicion": {"labels": ["Vigente", "Vencido"], "values": [round(vigente, 2), round(vencido, 2)]},
+        "tipo_documento": {"labels": [cols.doc_labels[c] for c in doc_codes], "values": [round(float(sums[c]), 2) for c in doc_codes]},
+        "morosidad_series": {"labels": serie_labels, "values": serie_values},
+    })
+    return resp
@@ -0,0 +1,219 @@
+"""Instrumentación: llamadas a Odoo, fases de cada request y endpoint Prometheus.
+
+Cada ``execute_kw`` registra modelo, método, duración, tiempo de parseo de la
+respuesta (XML-RPC o JSON-RPC), bytes de respuesta y cantidad de registros.
+Las rutas marcan sus fases con ``span('aggregation')`` /
+``span('serialization')``. Todo se acumula en
+histogramas de proceso (formato de texto Prometheus en ``/metrics``) y, por
+request, en la cabecera ``Server-Timing``.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Tuple
+
+from flask import g, request
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2)
+RECORDS_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Tuple = DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # etiquetas -> [conteo por bucket (+Inf al final), suma, conteo]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                extra = 'le="%s"' % le
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, extra)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+ODOO_CALL_SECONDS = Histogram('odoo_rpc_duration_seconds', 'Duración de cada execute_kw contra Odoo.', ('model', 'method'))
+ODOO_PARSE_SECONDS = Histogram('odoo_rpc_parse_seconds', 'Lectura y parseo (XML-RPC o JSON-RPC) de la respuesta de Odoo.', ('model', 'method'))
+ODOO_RESPONSE_BYTES = Histogram('odoo_rpc_response_bytes', 'Tamaño de la respuesta de Odoo.', ('model', 'method'), BYTES_BUCKETS)
+ODOO_RECORDS = Histogram('odoo_rpc_records', 'Registros devueltos por llamada.', ('model', 'method'), RECORDS_BUCKETS)
+ODOO_ERRORS = Counter('odoo_rpc_errors_total', 'Llamadas a Odoo que terminaron en error.', ('model', 'method'))
+PHASE_SECONDS = Histogram('app_phase_duration_seconds', 'Duración de las fases de cada endpoint.', ('endpoint', 'phase'))
+HTTP_SECONDS = Histogram('http_request_duration_seconds', 'Duración total de los requests HTTP.', ('endpoint', 'method', 'status'))
+METRICS = (ODOO_CALL_SECONDS, ODOO_PARSE_SECONDS, ODOO_RESPONSE_BYTES, ODOO_RECORDS, ODOO_ERRORS, PHASE_SECONDS, HTTP_SECONDS)
+
+
+class RequestMetrics:
+    """Acumulado del request en curso (compartido con los hilos que lanza)."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        self.odoo_calls = 0
+        self.odoo_seconds = 0.0
+        self.parse_seconds = 0.0
+        self.odoo_bytes = 0
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def add_rpc(self, seconds: float, parse_seconds: float, nbytes: int) -> None:
+        with self._lock:
+            self.odoo_calls += 1
+            self.odoo_seconds += seconds
+            self.parse_seconds += parse_seconds
+            self.odoo_bytes += nbytes
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.started
+        parts = []
+        if self.odoo_calls:
+            parts.append(f'odoo;dur={self.odoo_seconds * 1000:.1f};desc="{self.odoo_calls} llamadas, {self.odoo_bytes} bytes"')
+            parts.append(f'parse;dur={self.parse_seconds * 1000:.1f};desc="parseo de respuestas Odoo"')
+        for name, seconds in self.spans.items():
+            parts.append(f'{name};dur={seconds * 1000:.1f}')
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+_current: ContextVar[RequestMetrics | None] = ContextVar('request_metrics', default=None)
+
+
+def current() -> RequestMetrics | None:
+    return _current.get()
+
+
+def _count_records(result) -> int:
+    # Listas de registros/ids o dicts (fields_get); los escalares (search_count) no cuentan
+    return len(result) if isinstance(result, (list, dict)) else 0
+
+
+def observe_rpc(model: str, method: str, seconds: float, info: Dict | None = None, result=None, error: bool = False) -> None:
+    info = info or {}
+    parse_seconds = float(info.get('parse_seconds') or 0.0)
+    nbytes = int(info.get('bytes') or 0)
+    ODOO_CALL_SECONDS.observe(seconds, model=model, method=method)
+    if error:
+        ODOO_ERRORS.inc(model=model, method=method)
+    else:
+        ODOO_PARSE_SECONDS.observe(parse_seconds, model=model, method=method)
+        ODOO_RESPONSE_BYTES.observe(nbytes, model=model, method=method)
+        ODOO_RECORDS.observe(_count_records(result), model=model, method=method)
+    collector = current()
+    if collector is not None:
+        collector.add_rpc(seconds, parse_seconds, nbytes)
+
+
+@contextmanager
+def span(name: str):
+    """Mide una fase del request (p. ej. 'aggregation', 'serialization')."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        collector = current()
+        PHASE_SECONDS.observe(seconds, endpoint=collector.endpoint if collector else '', phase=name)
+        if collector is not None:
+            collector.add_span(name, seconds)
+
+
+def render() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def init_metrics(app) -> None:
+    """Registra los hooks que abren/cierran la medición de cada request."""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    @app.before_request
+    def _start_request_metrics():
+        g.request_metrics_token = _current.set(RequestMetrics(request.endpoint or request.path))
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        collector = current()
+        if collector is None:
+            return response
+        HTTP_SECONDS.observe(time.perf_counter() - collector.started, endpoint=collector.endpoint,
+                             method=request.method, status=str(response.status_code))
+        if app.config.get('SERVER_TIMING_ENABLED', True):
+            response.headers['Server-Timing'] = collector.server_timing()
+        return response
+
+    @app.teardown_request
+    def _reset_request_metrics(exc=None):
+        token = g.pop('request_metrics_token', None)
+        if token is not None:
+            try:
+                _current.reset(token)
+            except ValueError:
+                # Token creado en otro contexto: basta con limpiar el actual
+                _current.set(None)
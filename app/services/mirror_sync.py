@@ -0,0 +1,496 @@
+"""Réplica local de cuentas por cobrar abiertas (account.move / account.move.line).
+
+``MirrorSync`` hace una carga inicial completa y después trae solo los registros
+con ``write_date`` posterior a la última marca de agua guardada en
+``OdooSyncState``. ``MirrorReader`` expone la misma interfaz de lectura que
+``OdooConnector`` (facturas impagas y líneas del reporte CxC) sobre la base
+local, de modo que las rutas pueden elegir la fuente sin cambiar su lógica.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timezone
+
+import click
+from sqlalchemy import and_, delete, insert, or_, update
+
+from .. import db
+from ..models import OdooMove, OdooMoveLine, OdooPartner, OdooSyncState
+from .odoo_connector import DEFAULT_TEAM, OdooConnector, build_report_rows
+from .pagination import Cursor
+
+
+MOVE_FIELDS = [
+    'name', 'ref', 'move_type', 'state', 'payment_state', 'partner_id', 'invoice_date', 'invoice_date_due',
+    'amount_total', 'amount_residual', 'currency_id', 'invoice_origin',
+    'team_id', 'invoice_user_id', 'write_date',
+]
+MOVE_OPTIONAL_FIELDS = ['l10n_latam_document_type_id', 'sales_channel_id', 'sales_type_id']
+LINE_FIELDS = [
+    'date', 'move_name', 'ref', 'name', 'date_maturity', 'amount_currency', 'amount_residual_currency',
+    'partner_id', 'account_id', 'move_id', 'reconciled', 'parent_state', 'write_date',
+]
+PARTNER_FIELDS = ['name', 'vat', 'state_id', 'country_id', 'contact_address', 'write_date']
+PARTNER_OPTIONAL_FIELDS = ['l10n_pe_district', 'cod_client_sap', 'country_code']
+ACCOUNT_FIELDS = ['code', 'name', 'write_date']
+
+# Universo replicado: facturas de cliente abiertas y líneas por cobrar sin conciliar
+OPEN_INVOICE_DOMAIN = [
+    ['move_type', '=', 'out_invoice'],
+    ['state', '=', 'posted'],
+    ['payment_state', 'in', ['not_paid', 'partial']],
+]
+OPEN_LINE_DOMAIN = [
+    ['reconciled', '=', False],
+    ['parent_state', '=', 'posted'],
+    ['account_id.account_type', '=', 'asset_receivable'],
+]
+
+WRITE_BATCH = 1000
+
+
+def _m2o(value) -> tuple:
+    if isinstance(value, list) and len(value) >= 2:
+        return value[0], value[1]
+    return None, None
+
+
+def _to_date(value) -> date | None:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    except Exception:
+        return None
+
+
+def _text(value) -> str | None:
+    return value if value not in (False, None) else None
+
+
+def _is_open_invoice(rec: dict) -> bool:
+    return (rec.get('move_type') == 'out_invoice' and rec.get('state') == 'posted'
+            and rec.get('payment_state') in ('not_paid', 'partial'))
+
+
+def _is_open_line(rec: dict) -> bool:
+    return not rec.get('reconciled') and rec.get('parent_state') == 'posted'
+
+
+def _move_row(rec: dict) -> dict:
+    partner_id, partner_name = _m2o(rec.get('partner_id'))
+    currency_id, currency_name = _m2o(rec.get('currency_id'))
+    doc_id, doc_name = _m2o(rec.get('l10n_latam_document_type_id'))
+    channel_id, channel_name = _m2o(rec.get('sales_channel_id'))
+    team_id, team_name = _m2o(rec.get('team_id'))
+    user_id, user_name = _m2o(rec.get('invoice_user_id'))
+    sales_type_id, sales_type_name = _m2o(rec.get('sales_type_id'))
+    return {
+        'id': rec['id'],
+        'name': _text(rec.get('name')),
+        'ref': _text(rec.get('ref')),
+        'move_type': _text(rec.get('move_type')),
+        'state': _text(rec.get('state')),
+        'payment_state': _text(rec.get('payment_state')),
+        'partner_id': partner_id,
+        'partner_name': partner_name,
+        'invoice_date': _to_date(rec.get('invoice_date')),
+        'invoice_date_due': _to_date(rec.get('invoice_date_due')),
+        'amount_total': float(rec.get('amount_total') or 0.0),
+        'amount_residual': float(rec.get('amount_residual') or 0.0),
+        'currency_id': currency_id,
+        'currency_name': currency_name,
+        'invoice_origin': _text(rec.get('invoice_origin')),
+        'document_type_id': doc_id,
+        'document_type_name': doc_name,
+        'sales_channel_id': channel_id,
+        'sales_channel_name': channel_name,
+        'team_id': team_id,
+        'team_name': team_name,
+        'invoice_user_id': user_id,
+        'invoice_user_name': user_name,
+        'sales_type_id': sales_type_id,
+        'sales_type_name': sales_type_name,
+        'write_date': _text(rec.get('write_date')),
+    }
+
+
+def _line_row(rec: dict, accounts: dict) -> dict:
+    partner_id, partner_name = _m2o(rec.get('partner_id'))
+    account_id, account_display = _m2o(rec.get('account_id'))
+    move_id, _ = _m2o(rec.get('move_id'))
+    account = accounts.get(account_id) or {}
+    return {
+        'id': rec['id'],
+        'move_id': move_id,
+        'move_name': _text(rec.get('move_name')),
+        'date': _to_date(rec.get('date')),
+        'date_maturity': _to_date(rec.get('date_maturity')),
+        'ref': _text(rec.get('ref')),
+        'name': _text(rec.get('name')),
+        'amount_currency': float(rec.get('amount_currency') or 0.0),
+        'amount_residual_currency': float(rec.get('amount_residual_currency') or 0.0),
+        'partner_id': partner_id,
+        'partner_name': partner_name,
+        'account_id': account_id,
+        'account_code': _text(account.get('code')),
+        'account_name': _text(account.get('name')) or account_display,
+        'write_date': _text(rec.get('write_date')),
+    }
+
+
+def _partner_row(rec: dict) -> dict:
+    state_id, state_name = _m2o(rec.get('state_id'))
+    country_id, country_name = _m2o(rec.get('country_id'))
+    return {
+        'id': rec['id'],
+        'name': _text(rec.get('name')),
+        'vat': _text(rec.get('vat')),
+        'cod_client_sap': _text(rec.get('cod_client_sap')),
+        'state_id': state_id,
+        'state_name': state_name,
+        'l10n_pe_district': _text(rec.get('l10n_pe_district')),
+        'country_id': country_id,
+        'country_name': country_name,
+        'country_code': _text(rec.get('country_code')),
+        'contact_address': _text(rec.get('contact_address')),
+        'write_date': _text(rec.get('write_date')),
+    }
+
+
+class MirrorSync:
+    def __init__(self, connector: OdooConnector | None = None):
+        self.connector = connector or OdooConnector()
+        self.stats: dict = {}
+
+    # -- lectura desde Odoo --------------------------------------------------
+    # Los campos opcionales (personalizados) solo se piden si existen en la base
+    def _fetch(self, model: str, domain: list, fields: list, optional: list | None = None) -> list:
+        return self.connector.search_read_chunked(model, domain, self.connector.available_fields(model, fields, optional))
+
+    def _read(self, model: str, ids: list, fields: list, optional: list | None = None) -> list:
+        if not ids:
+            return []
+        return self.connector.read(model, ids, self.connector.available_fields(model, fields, optional))
+
+    # -- escritura local -----------------------------------------------------
+    @staticmethod
+    def _upsert(model, rows: list) -> None:
+        for i in range(0, len(rows), WRITE_BATCH):
+            batch = rows[i:i + WRITE_BATCH]
+            db.session.execute(delete(model).where(model.id.in_([r['id'] for r in batch])))
+            db.session.execute(insert(model), batch)
+
+    @staticmethod
+    def _delete(model, ids: list) -> None:
+        for i in range(0, len(ids), WRITE_BATCH):
+            db.session.execute(delete(model).where(model.id.in_(ids[i:i + WRITE_BATCH])))
+
+    @staticmethod
+    def _state(model: str) -> OdooSyncState:
+        state = db.session.get(OdooSyncState, model)
+        if state is None:
+            state = OdooSyncState(model=model, records=0)
+            db.session.add(state)
+        return state
+
+    def _mark(self, model: str, records: list, full: bool, total: int) -> None:
+        state = self._state(model)
+        watermarks = [r['write_date'] for r in records if r.get('write_date')]
+        if watermarks:
+            state.watermark = max([state.watermark or ''] + watermarks)
+        state.records = total
+        # UTC sin tzinfo: la columna es DateTime sin zona horaria
+        state.last_run = datetime.now(timezone.utc).replace(tzinfo=None)
+        if full:
+            state.last_full_sync = state.last_run
+        self.stats[model] = len(records)
+
+    def _accounts(self, account_ids: set) -> dict:
+        recs = self._read('account.account', sorted(account_ids), ACCOUNT_FIELDS)
+        return {a['id']: a for a in recs}
+
+    # -- sincronización ------------------------------------------------------
+    def sync(self, full: bool = False) -> dict:
+        if full or db.session.get(OdooSyncState, 'account.move.line') is None:
+            return self.full_load()
+        return self.incremental()
+
+    def full_load(self) -> dict:
+        self.stats = {'mode': 'full'}
+        lines = self._fetch('account.move.line', OPEN_LINE_DOMAIN, LINE_FIELDS)
+        moves = self._fetch('account.move', OPEN_INVOICE_DOMAIN, MOVE_FIELDS, MOVE_OPTIONAL_FIELDS)
+        # Asientos de las líneas que no son facturas abiertas (notas, asientos manuales...)
+        known_moves = {m['id'] for m in moves}
+        extra_move_ids = sorted({l['move_id'][0] for l in lines if isinstance(l.get('move_id'), list)} - known_moves)
+        moves += self._read('account.move', extra_move_ids, MOVE_FIELDS, MOVE_OPTIONAL_FIELDS)
+        partner_ids = {m['partner_id'][0] for m in moves if isinstance(m.get('partner_id'), list)}
+        partner_ids |= {l['partner_id'][0] for l in lines if isinstance(l.get('partner_id'), list)}
+        partners = self._read('res.partner', sorted(partner_ids), PARTNER_FIELDS, PARTNER_OPTIONAL_FIELDS)
+        accounts = self._accounts({l['account_id'][0] for l in lines if isinstance(l.get('account_id'), list)})
+
+        for model in (OdooMoveLine, OdooMove, OdooPartner):
+            db.session.execute(delete(model))
+        self._upsert(OdooPartner, [_partner_row(p) for p in partners])
+        self._upsert(OdooMove, [_move_row(m) for m in moves])
+        self._upsert(OdooMoveLine, [_line_row(l, accounts) for l in lines])
+        self._mark('account.move.line', lines, True, len(lines))
+        self._mark('account.move', moves, True, len(moves))
+        self._mark('res.partner', partners, True, len(partners))
+        self._mark('account.account', list(accounts.values()), True, len(accounts))
+        db.session.commit()
+        return self.stats
+
+    def incremental(self) -> dict:
+        self.stats = {'mode': 'incremental'}
+        line_state = self._state('account.move.line')
+        move_state = self._state('account.move')
+        partner_state = self._state('res.partner')
+        account_state = self._state('account.account')
+
+        # Líneas: '>=' porque write_date tiene resolución de segundos; el upsert es idempotente
+        line_domain = [['account_id.account_type', '=', 'asset_receivable']]
+        if line_state.watermark:
+            line_domain.append(['write_date', '>=', line_state.watermark])
+        changed_lines = self._fetch('account.move.line', line_domain, LINE_FIELDS)
+        open_lines = [l for l in changed_lines if _is_open_line(l)]
+        closed_line_ids = [l['id'] for l in changed_lines if not _is_open_line(l)]
+
+        move_domain = [['line_ids.account_id.account_type', '=', 'asset_receivable']]
+        if move_state.watermark:
+            move_domain.append(['write_date', '>=', move_state.watermark])
+        changed_moves = self._fetch('account.move', move_domain, MOVE_FIELDS, MOVE_OPTIONAL_FIELDS)
+        known_moves = {m['id'] for m in changed_moves}
+        line_move_ids = {l['move_id'][0] for l in open_lines if isinstance(l.get('move_id'), list)} - known_moves
+        if line_move_ids:
+            present = {mid for (mid,) in db.session.query(OdooMove.id).filter(OdooMove.id.in_(line_move_ids))}
+            changed_moves += self._read('account.move', sorted(line_move_ids - present), MOVE_FIELDS, MOVE_OPTIONAL_FIELDS)
+
+        accounts = self._accounts({l['account_id'][0] for l in open_lines if isinstance(l.get('account_id'), list)})
+
+        self._delete(OdooMoveLine, closed_line_ids)
+        self._upsert(OdooMoveLine, [_line_row(l, accounts) for l in open_lines])
+        self._upsert(OdooMove, [_move_row(m) for m in changed_moves])
+        # Asientos que ya no son facturas abiertas ni tienen líneas replicadas
+        stale_moves = [m['id'] for m in changed_moves if not _is_open_invoice(m)]
+        if stale_moves:
+            with_lines = {mid for (mid,) in db.session.query(OdooMoveLine.move_id).filter(OdooMoveLine.move_id.in_(stale_moves))}
+            self._delete(OdooMove, [mid for mid in stale_moves if mid not in with_lines])
+
+        # Partners: nuevos ids referenciados y cambios en los ya replicados
+        referenced = {m['partner_id'][0] for m in changed_moves if isinstance(m.get('partner_id'), list)}
+        referenced |= {l['partner_id'][0] for l in open_lines if isinstance(l.get('partner_id'), list)}
+        known_partners = {pid for (pid,) in db.session.query(OdooPartner.id)}
+        partners = self._read('res.partner', sorted(referenced - known_partners), PARTNER_FIELDS, PARTNER_OPTIONAL_FIELDS)
+        if known_partners and partner_state.watermark:
+            partners += self._fetch('res.partner', [['id', 'in', sorted(known_partners)], ['write_date', '>=', partner_state.watermark]],
+                                    PARTNER_FIELDS, PARTNER_OPTIONAL_FIELDS)
+        self._upsert(OdooPartner, [_partner_row(p) for p in partners])
+
+        # Cuentas: código/nombre desnormalizados en las líneas
+        if account_state.watermark:
+            account_ids = sorted({aid for (aid,) in db.session.query(OdooMoveLine.account_id).distinct() if aid})
+            changed_accounts = self._fetch('account.account', [['id', 'in', account_ids], ['write_date', '>=', account_state.watermark]], ACCOUNT_FIELDS) if account_ids else []
+            for acc in changed_accounts:
+                db.session.execute(
+                    update(OdooMoveLine).where(OdooMoveLine.account_id == acc['id'])
+                    .values(account_code=_text(acc.get('code')), account_name=_text(acc.get('name')))
+                )
+        else:
+            changed_accounts = list(accounts.values())
+
+        self._mark('account.move.line', changed_lines, False, db.session.query(OdooMoveLine).count())
+        self._mark('account.move', changed_moves, False, db.session.query(OdooMove).count())
+        self._mark('res.partner', partners, False, db.session.query(OdooPartner).count())
+        self._mark('account.account', changed_accounts, False, len(changed_accounts))
+        self.stats['closed_lines'] = len(closed_line_ids)
+        db.session.commit()
+        return self.stats
+
+
+def mirror_status() -> dict:
+    states = db.session.query(OdooSyncState).all()
+    return {
+        s.model: {
+            'watermark': s.watermark,
+            'records': s.records,
+            'last_full_sync': s.last_full_sync.isoformat() if s.last_full_sync else None,
+            'last_run': s.last_run.isoformat() if s.last_run else None,
+        }
+        for s in states
+    }
+
+
+# --- Lectura --------------------------------------------------------------
+
+def _pair(id_value, name) -> list | bool:
+    return [id_value, name] if id_value else False
+
+
+def _iso(value: date | None) -> str | bool:
+    return value.isoformat() if value else False
+
+
+# Mapeo de los campos de orden aceptados por /api/reports/data a columnas locales
+ORDER_COLUMNS = {
+    'date': OdooMoveLine.date,
+    'date_maturity': OdooMoveLine.date_maturity,
+    'move_name': OdooMoveLine.move_name,
+    'partner_id': OdooMoveLine.partner_name,
+    'account_id': OdooMoveLine.account_code,
+    'amount_currency': OdooMoveLine.amount_currency,
+    'amount_residual_currency': OdooMoveLine.amount_residual_currency,
+    'id': OdooMoveLine.id,
+}
+
+
+class MirrorReader:
+    """Misma interfaz de lectura que ``OdooConnector`` sobre la réplica local."""
+
+    def ping(self) -> bool:
+        return True
+
+    def get_unpaid_invoices(self, limit: int = 0, start_date: str | None = None, end_date: str | None = None, customer: str | None = None, team: str | list | None = DEFAULT_TEAM, exact_team: bool = False):
+        query = OdooMove.query.filter(
+            OdooMove.move_type == 'out_invoice',
+            OdooMove.state == 'posted',
+            OdooMove.payment_state.in_(['not_paid', 'partial']),
+        )
+        if team:
+            # Como el conector: el nombre del canal lo contiene o, con `exact_team`, es igual ('=ilike')
+            names = [team] if isinstance(team, str) else list(team)
+            query = query.filter(or_(*[OdooMove.team_name.ilike(name if exact_team else f"%{name}%") for name in names]))
+        if start_date:
+            query = query.filter(OdooMove.invoice_date >= _to_date(start_date))
+        if end_date:
+            query = query.filter(OdooMove.invoice_date <= _to_date(end_date))
+        if customer:
+            query = query.filter(OdooMove.partner_name.ilike(f"%{customer}%"))
+        query = query.order_by(OdooMove.id)
+        if limit:
+            query = query.limit(limit)
+        return [
+            {
+                'id': m.id,
+                'name': m.name or False,
+                'partner_id': _pair(m.partner_id, m.partner_name),
+                'invoice_date': _iso(m.invoice_date),
+                'invoice_date_due': _iso(m.invoice_date_due),
+                'amount_total': m.amount_total or 0.0,
+                'amount_residual': m.amount_residual or 0.0,
+                'currency_id': _pair(m.currency_id, m.currency_name),
+                'invoice_origin': m.invoice_origin or False,
+                'l10n_latam_document_type_id': _pair(m.document_type_id, m.document_type_name),
+                'move_type': m.move_type,
+                'sales_channel_id': _pair(m.sales_channel_id, m.sales_channel_name),
+                'team_id': _pair(m.team_id, m.team_name),
+            }
+            for m in query
+        ]
+
+    def _report_query(self, start_date=None, end_date=None, customer=None, account_codes=None):
+        query = OdooMoveLine.query
+        if start_date:
+            query = query.filter(OdooMoveLine.date >= _to_date(start_date))
+        if end_date:
+            query = query.filter(OdooMoveLine.date <= _to_date(end_date))
+        if customer:
+            query = query.filter(OdooMoveLine.partner_name.ilike(f"%{customer}%"))
+        if account_codes:
+            codes = [c.strip() for c in account_codes.split(',') if c.strip()]
+        else:
+            codes = ['1212', '122', '1312', '132']
+        if codes:
+            query = query.filter(or_(*[OdooMoveLine.account_code.like(f"{c}%") for c in codes]))
+        return query
+
+    def count_report_lines(self, start_date: str | None = None, end_date: str | None = None, customer: str | None = None, account_codes: str | None = None, approximate: bool = False) -> int:
+        # En la réplica local el conteo exacto es barato: `approximate` se ignora
+        return self._report_query(start_date, end_date, customer, account_codes).count()
+
+    def get_report_lines(self, start_date: str | None = None, end_date: str | None = None, customer: str | None = None, limit: int = 0, account_codes: str | None = None, offset: int = 0, order: str | None = None, after: Cursor | None = None):
+        query = self._report_query(start_date, end_date, customer, account_codes)
+        if after is not None:
+            # Keyset sobre (date, id), igual que en Odoo
+            line_date = _to_date(after.date)
+            if after.descending:
+                query = query.filter(or_(OdooMoveLine.date < line_date, and_(OdooMoveLine.date == line_date, OdooMoveLine.id < after.id)))
+            else:
+                query = query.filter(or_(OdooMoveLine.date > line_date, and_(OdooMoveLine.date == line_date, OdooMoveLine.id > after.id)))
+            order, offset = after.order, 0
+        clauses = []
+        for chunk in (order or 'date desc, id desc').split(','):
+            field, _, direction = chunk.strip().partition(' ')
+            column = ORDER_COLUMNS.get(field)
+            if column is not None:
+                clauses.append(column.desc() if direction.strip().lower() == 'desc' else column.asc())
+        query = query.order_by(*clauses)
+        if offset:
+            query = query.offset(offset)
+        if limit:
+            query = query.limit(limit)
+        records = query.all()
+
+        lines = [
+            {
+                'id': l.id,
+                'date': _iso(l.date),
+                'move_name': l.move_name or False,
+                'ref': l.ref or False,
+                'name': l.name or False,
+                'date_maturity': _iso(l.date_maturity),
+                'amount_currency': l.amount_currency or 0.0,
+                'amount_residual_currency': l.amount_residual_currency or 0.0,
+                'partner_id': _pair(l.partner_id, l.partner_name),
+                'account_id': _pair(l.account_id, l.account_name),
+                'move_id': _pair(l.move_id, l.move_name),
+            }
+            for l in records
+        ]
+        account_map = {l.account_id: {'id': l.account_id, 'code': l.account_code, 'name': l.account_name} for l in records if l.account_id}
+        partner_ids = {l.partner_id for l in records if l.partner_id}
+        move_ids = {l.move_id for l in records if l.move_id}
+        partner_map = {}
+        for p in OdooPartner.query.filter(OdooPartner.id.in_(partner_ids)) if partner_ids else []:
+            partner_map[p.id] = {
+                'id': p.id,
+                'vat': p.vat or False,
+                'state_id': _pair(p.state_id, p.state_name),
+                'l10n_pe_district': p.l10n_pe_district or False,
+                'country_id': _pair(p.country_id, p.country_name),
+                'contact_address': p.contact_address or False,
+                'cod_client_sap': p.cod_client_sap or False,
+                'country_code': p.country_code or False,
+            }
+        move_map = {}
+        for m in OdooMove.query.filter(OdooMove.id.in_(move_ids)) if move_ids else []:
+            move_map[m.id] = {
+                'id': m.id,
+                'invoice_origin': m.invoice_origin or False,
+                'invoice_user_id': _pair(m.invoice_user_id, m.invoice_user_name),
+                'team_id': _pair(m.team_id, m.team_name),
+                'l10n_latam_document_type_id': _pair(m.document_type_id, m.document_type_name),
+                'sales_type_id': _pair(m.sales_type_id, m.sales_type_name),
+                'payment_state': m.payment_state or False,
+            }
+        return build_report_rows(lines, partner_map, account_map, move_map)
+
+    def iter_report_lines(self, start_date: str | None = None, end_date: str | None = None, customer: str | None = None, account_codes: str | None = None, order: str | None = None, chunk_size: int = 2000):
+        offset = 0
+        while True:
+            rows = self.get_report_lines(start_date=start_date, end_date=end_date, customer=customer, account_codes=account_codes,
+                                         limit=chunk_size, offset=offset, order=order)
+            if not rows:
+                break
+            yield rows
+            offset += len(rows)
+            if len(rows) < chunk_size:
+                break
+
+
+def register_cli(app) -> None:
+    @app.cli.command("mirror-sync")
+    @click.option("--full", is_flag=True, help="Recarga completa en lugar de incremental.")
+    def mirror_sync_command(full: bool):
+        """Sincroniza la réplica local de cuentas por cobrar desde Odoo."""
+        stats = MirrorSync().sync(full=full)
+        click.echo(stats)
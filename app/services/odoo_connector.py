@@ -1,6 +1,27 @@
-import xmlrpc.client
+import contextvars
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date
+from typing import Iterator
+
 from flask import current_app
 
+from .conditional import fresh_reads_requested
+from .dimension_cache import get_dimension
+from .metrics import observe_rpc
+from .odoo_pool import get_pool
+from .odoo_schema import get_schema
+from .pagination import Cursor, keyset_domain
+from .partner_index import get_partner_index
+from .query_cache import get_query_cache, make_key
+from .report_rows import ReportRow
+from .singleflight import coalesced
+
+
+# Canal (equipo de ventas, team_id) de los dashboards cuando no se indica otro
+DEFAULT_TEAM = 'INTERNACIONAL'
+
 
 class OdooConnector:
     def __init__(self):
@@ -8,59 +29,269 @@ class OdooConnector:
         self.db = current_app.config.get("ODOO_DB")
         self.username = current_app.config.get("ODOO_USERNAME")
         self.password = current_app.config.get("ODOO_PASSWORD")
+        self.pool_size = current_app.config.get("ODOO_POOL_SIZE", 8)
+        self.timeout = current_app.config.get("ODOO_TIMEOUT", 120)
+        self.pool_timeout = current_app.config.get("ODOO_POOL_TIMEOUT", 30)
+        # 'xmlrpc' (por defecto) o 'jsonrpc': mismo API, distinto formato en el cable
+        self.transport = current_app.config.get("ODOO_TRANSPORT", "xmlrpc")
+        # Lectura por lotes: tamaño de lote y concurrencia máxima (acotada por el pool)
+        self.chunk_size = int(current_app.config.get("ODOO_CHUNK_SIZE", 2000))
+        self.max_workers = max(1, min(int(current_app.config.get("ODOO_MAX_WORKERS", 4)), int(self.pool_size)))
+        self.cache = get_query_cache(current_app.config) if current_app.config.get("ODOO_CACHE_ENABLED", True) else None
+        # Llamadas idénticas concurrentes comparten una sola consulta a Odoo
+        self.singleflight = bool(current_app.config.get("ODOO_SINGLEFLIGHT_ENABLED", True))
+        # Filtro de cliente resuelto a ids con el índice local de partners
+        self.partner_index = bool(current_app.config.get("PARTNER_INDEX_ENABLED", True))
         self.uid = None
-        self.models = None
+        self.pool = None
 
     def connect(self):
         if not all([self.url, self.db, self.username, self.password]):
             raise ValueError("Config Odoo incompleta")
-        common = xmlrpc.client.ServerProxy(f"{self.url}/xmlrpc/2/common")
-        self.uid = common.authenticate(self.db, self.username, self.password, {})
-        if not self.uid:
-            raise ValueError("Autenticación Odoo fallida")
-        self.models = xmlrpc.client.ServerProxy(f"{self.url}/xmlrpc/2/object")
+        # Pool compartido por proceso: reutiliza uid y conexiones keep-alive
+        self.pool = get_pool(
+            self.url, self.db, self.username, self.password,
+            max_size=self.pool_size, timeout=self.timeout, acquire_timeout=self.pool_timeout,
+            transport=self.transport,
+        )
+        self.uid = self.pool.authenticate()
         return True
 
     def ping(self) -> bool:
-        if self.models is None:
+        if self.pool is None:
             self.connect()
         return True
 
-    def search_read(self, model: str, domain: list, fields: list, limit: int = 0):
-        if self.models is None:
+    def execute_kw(self, model: str, method: str, args: list, kwargs: dict | None = None):
+        if self.pool is None:
             self.connect()
-        return self.models.execute_kw(
-            self.db,
-            self.uid,
-            self.password,
-            model,
-            'search_read',
-            [domain],
-            {'fields': fields, 'limit': limit}
-        )
+        info: dict = {}
+        started = time.perf_counter()
+        try:
+            result = self.pool.execute_kw(model, method, args, kwargs or {}, info=info)
+        except Exception:
+            observe_rpc(model, method, time.perf_counter() - started, info, error=True)
+            raise
+        observe_rpc(model, method, time.perf_counter() - started, info, result)
+        return result
+
+    def available_fields(self, model: str, fields: list, optional: list | None = None) -> list:
+        """`fields` más los campos de `optional` que existen en esta base (vía `fields_get` cacheado)."""
+        if not optional:
+            return list(fields)
+        return list(fields) + get_schema().available(self, model, optional)
+
+    def search_read(self, model: str, domain: list, fields: list, limit: int = 0, offset: int = 0, order: str | None = None, use_cache: bool = True):
+        key = None
+        if use_cache and self.cache is not None:
+            key = make_key((self.url, self.db), model, domain, fields, limit=limit, offset=offset, order=order)
+            # Tras un cambio de versión (GET condicional) se relee Odoo y se renueva la entrada
+            hit, cached = (False, None) if fresh_reads_requested() else self.cache.get(key)
+            if hit:
+                # Lista nueva: los registros cacheados se comparten y no deben mutarse
+                return list(cached)
+        kwargs = {'fields': fields, 'limit': limit}
+        if offset:
+            kwargs['offset'] = offset
+        if order:
+            kwargs['order'] = order
+        records = self.execute_kw(model, 'search_read', [domain], kwargs)
+        if key is not None:
+            self.cache.set(key, records, model)
+            records = list(records)
+        return records
+
+    def search_count(self, model: str, domain: list) -> int:
+        return self.execute_kw(model, 'search_count', [domain])
+
+    def search(self, model: str, domain: list, limit: int = 0, offset: int = 0, order: str | None = None) -> list:
+        kwargs = {'limit': limit}
+        if offset:
+            kwargs['offset'] = offset
+        if order:
+            kwargs['order'] = order
+        return self.execute_kw(model, 'search', [domain], kwargs)
+
+    def iter_read_chunked(self, model: str, ids: list, fields: list, chunk_size: int | None = None, max_workers: int | None = None, ordered: bool = True) -> Iterator[list]:
+        """Lee `ids` en lotes repartidos en un pool de hilos y entrega cada lote al llegar.
+
+        Con ``ordered=True`` los lotes se entregan en el orden de `ids`; si no, en
+        orden de llegada. Nunca hay más de ``2 * max_workers`` lotes en vuelo.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        max_workers = max_workers or self.max_workers
+        chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+        if not chunks:
+            return
+        if len(chunks) == 1 or max_workers == 1:
+            for chunk in chunks:
+                yield self.execute_kw(model, 'read', [chunk], {'fields': fields})
+            return
+        if self.pool is None:
+            self.connect()
+
+        pending_chunks = iter(chunks)
+        in_flight: deque = deque()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='odoo-read') as executor:
+            def submit_next() -> bool:
+                chunk = next(pending_chunks, None)
+                if chunk is None:
+                    return False
+                # Copia del contexto: las llamadas de los hilos cuentan en las métricas del request
+                in_flight.append(executor.submit(contextvars.copy_context().run, self.execute_kw, model, 'read', [chunk], {'fields': fields}))
+                return True
+
+            try:
+                for _ in range(max_workers * 2):
+                    if not submit_next():
+                        break
+                while in_flight:
+                    if ordered:
+                        future = in_flight.popleft()
+                    else:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        future = done.pop()
+                        in_flight.remove(future)
+                    records = future.result()
+                    submit_next()
+                    yield records
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+    def read(self, model: str, ids: list, fields: list) -> list:
+        records: list = []
+        for batch in self.iter_read_chunked(model, ids, fields):
+            records.extend(batch)
+        return records
+
+    def iter_search_read_chunked(self, model: str, domain: list, fields: list, limit: int = 0, order: str | None = None, chunk_size: int | None = None, max_workers: int | None = None, ordered: bool = True) -> Iterator[list]:
+        """`search` de ids y luego `read` por lotes en paralelo (ver `iter_read_chunked`)."""
+        ids = self.search(model, domain, limit=limit, order=order)
+        yield from self.iter_read_chunked(model, ids, fields, chunk_size=chunk_size, max_workers=max_workers, ordered=ordered)
+
+    def search_read_chunked(self, model: str, domain: list, fields: list, limit: int = 0, order: str | None = None) -> list:
+        records: list = []
+        for batch in self.iter_search_read_chunked(model, domain, fields, limit=limit, order=order):
+            records.extend(batch)
+        return records
 
-    def get_unpaid_invoices(self, limit: int = 0, start_date: str | None = None, end_date: str | None = None, customer: str | None = None):
+    def read_group(self, model: str, domain: list, fields: list, groupby: list, lazy: bool = False, orderby: str | None = None, limit: int | None = None) -> list:
+        kwargs = {'lazy': lazy}
+        if orderby:
+            kwargs['orderby'] = orderby
+        if limit:
+            kwargs['limit'] = limit
+        return self.execute_kw(model, 'read_group', [domain, fields, groupby], kwargs)
+
+    def data_version(self, model: str, domain: list) -> str:
+        """Versión barata de los datos de `domain`: max(write_date) y conteo en un solo read_group."""
+        groups = self.read_group(model, domain, ['write_date:max'], [], lazy=False)
+        group = groups[0] if groups else {}
+        return f"{group.get('write_date') or ''}|{group.get('__count', 0)}"
+
+    @coalesced
+    def unpaid_invoices_version(self, start_date: str | None = None, end_date: str | None = None, customer: str | None = None, team: str | list | None = DEFAULT_TEAM, exact_team: bool = False) -> str:
+        return self.data_version('account.move', self._unpaid_invoices_domain(start_date=start_date, end_date=end_date, customer=customer, team=team, exact_team=exact_team))
+
+    @coalesced
+    def report_lines_version(self, start_date: str | None = None, end_date: str | None = None, customer: str | None = None, account_codes: str | None = None) -> str:
+        domain = self._report_lines_domain(start_date=start_date, end_date=end_date, customer=customer, account_codes=account_codes)
+        return self.data_version('account.move.line', domain)
+
+    def customer_leaf(self, customer: str) -> list:
+        """Filtro por cliente: `partner_id in ids` del índice local o, si no aplica, `ilike` en Odoo.
+
+        El índice se arma en segundo plano; hasta que esté listo se usa `ilike`.
+        """
+        if self.partner_index:
+            try:
+                index = get_partner_index((self.url, self.db), current_app.config)
+                ids = index.resolve(customer) if index.ensure(self, current_app._get_current_object()) else None
+            except Exception:
+                # Sin índice (p. ej. error al leer res.partner) se mantiene el filtro original
+                ids = None
+            if ids is not None:
+                return ['partner_id', 'in', ids]
+        return ['partner_id', 'ilike', customer]
+
+    def _unpaid_invoices_domain(self, start_date: str | None = None, end_date: str | None = None, customer: str | None = None, team: str | list | None = DEFAULT_TEAM, exact_team: bool = False) -> list:
         domain = [
             ['move_type', '=', 'out_invoice'],
             ['state', '=', 'posted'],
             ['payment_state', 'in', ['not_paid', 'partial']],
-            ['team_id.name', 'ilike', 'INTERNACIONAL']  # Filtro para canal INTERNACIONAL
         ]
+        if team:
+            # Canal = equipo de ventas; por defecto el nombre lo contiene ('ilike'). Con `exact_team`
+            # se compara el nombre completo ('=ilike': NACIONAL no incluye INTERNACIONAL).
+            # Con una lista de canales se arma un OR en notación prefija
+            names = [team] if isinstance(team, str) else list(team)
+            operator = '=ilike' if exact_team else 'ilike'
+            domain += ['|'] * (len(names) - 1) + [['team_id.name', operator, name] for name in names]
         if start_date:
             domain.append(['invoice_date', '>=', start_date])
         if end_date:
             domain.append(['invoice_date', '<=', end_date])
         if customer:
-            domain.append(['partner_id', 'ilike', customer])
+            domain.append(self.customer_leaf(customer))
+        return domain
+
+    @coalesced
+    def get_unpaid_invoices(self, limit: int = 0, start_date: str | None = None, end_date: str | None = None, customer: str | None = None, team: str | list | None = DEFAULT_TEAM, exact_team: bool = False):
+        domain = self._unpaid_invoices_domain(start_date=start_date, end_date=end_date, customer=customer, team=team, exact_team=exact_team)
         fields = [
             'name', 'partner_id', 'invoice_date', 'invoice_date_due',
             'amount_total', 'amount_residual', 'currency_id', 'invoice_origin',
-            'l10n_latam_document_type_id', 'move_type', 'sales_channel_id', 'team_id'
+            'move_type', 'team_id'
         ]
+        fields = self.available_fields('account.move', fields, ['l10n_latam_document_type_id', 'sales_channel_id'])
         return self.search_read('account.move', domain, fields, limit=limit)
 
-    def get_report_lines(self, start_date: str | None = None, end_date: str | None = None, customer: str | None = None, limit: int = 0, account_codes: str | None = None):
-        # Query account.move.line focused on receivable lines (with fallbacks)
+    @coalesced
+    def get_unpaid_invoice_groups(self, start_date: str | None = None, end_date: str | None = None, customer: str | None = None, channel: str | None = None, today: date | None = None, team: str | list | None = DEFAULT_TEAM, exact_team: bool = False) -> dict:
+        """Agregados de facturas impagas resueltos en Odoo con `read_group`.
+
+        Solo viajan filas de grupo: por día de vencimiento (vencido/vigente y días de
+        mora), por partner (Top vencido), por tipo de documento y por mes de factura x
+        mes de vencimiento (serie de morosidad).
+        """
+        today = today or date.today()
+        domain = self._unpaid_invoices_domain(start_date=start_date, end_date=end_date, customer=customer, team=team, exact_team=exact_team)
+        positive = domain + [['amount_residual', '>', 0]]
+        overdue = positive + [['invoice_date_due', '<', today.isoformat()]]
+        amount = ['amount_residual:sum']
+
+        # Campos de localización/módulos opcionales: solo si existen en esta base
+        optional = self.available_fields('account.move', [], ['l10n_latam_document_type_id', 'sales_channel_id'])
+        # Sin tipo de documento LATAM se agrupa por `move_type`, como hacen los otros motores
+        doc_type_field = 'l10n_latam_document_type_id' if 'l10n_latam_document_type_id' in optional else 'move_type'
+
+        groups = {
+            'today': today,
+            'total_facturas': self.search_count('account.move', domain),
+            'by_due_day': self.read_group('account.move', positive, amount, ['invoice_date_due:day']),
+            'doc_type_field': doc_type_field,
+            'by_doc_type': self.read_group('account.move', positive, amount, [doc_type_field]),
+            'by_month': self.read_group('account.move', positive, amount, ['invoice_date:month', 'invoice_date_due:month']),
+        }
+        # Top vencido: filtro opcional de canal NACIONAL (otros canales, o una base sin
+        # `sales_channel_id`, no devuelven Top)
+        if channel is None:
+            groups['overdue_by_partner'] = self.read_group('account.move', overdue, amount, ['partner_id'])
+        elif channel == 'NACIONAL' and 'sales_channel_id' in optional:
+            groups['overdue_by_partner'] = self.read_group('account.move', overdue + [['sales_channel_id.name', '=', 'NACIONAL']], amount, ['partner_id'])
+        else:
+            groups['overdue_by_partner'] = []
+        return groups
+
+    @coalesced
+    def get_report_line_groups(self, groupby: list, start_date: str | None = None, end_date: str | None = None, customer: str | None = None, account_codes: str | None = None) -> list:
+        """Totales del reporte CxC 12/13 agrupados en Odoo (p. ej. por cuenta o partner)."""
+        domain = self._report_lines_domain(start_date=start_date, end_date=end_date, customer=customer, account_codes=account_codes)
+        return self.read_group('account.move.line', domain, ['amount_currency:sum', 'amount_residual_currency:sum'], groupby)
+
+    def _report_lines_domain(self, start_date: str | None = None, end_date: str | None = None, customer: str | None = None, account_codes: str | None = None) -> list:
+        # Query account.move.line focused on receivable lines
         # SIN FILTRO DE CANAL - Para reportes CxC 12 y 13 necesitamos TODOS los canales
         base_domain = [
             ['reconciled', '=', False],
@@ -71,8 +302,41 @@ class OdooConnector:
         if end_date:
             base_domain.append(['date', '<=', end_date])
         if customer:
-            base_domain.append(['partner_id', 'ilike', customer])
+            base_domain.append(self.customer_leaf(customer))
 
+        # Filtros de negocio (Odoo 16):
+        # (account_id.code like '12%' OR like '13%')
+        # AND NOT contiene '10', '123', '133'
+        # AND tipo de cuenta por cobrar
+        # Si vienen códigos por parámetro, usarlos; si no, los predeterminados para CxC 12 y 13
+        if account_codes:
+            codes = [c.strip() for c in account_codes.split(',') if c.strip()]
+        else:
+            codes = ['1212', '122', '1312', '132']
+
+        # Construir OR en notación prefija de Odoo: ['|', '|', cond1, cond2, cond3]
+        code_clauses = [[ 'account_id.code', 'like', f"{c}%" ] for c in codes]
+        account_code_tokens: list = ['|'] * (len(code_clauses) - 1) + code_clauses
+
+        # Dominio final
+        return base_domain + account_code_tokens + [['account_id.account_type', '=', 'asset_receivable']]
+
+    @coalesced
+    def count_report_lines(self, start_date: str | None = None, end_date: str | None = None, customer: str | None = None, account_codes: str | None = None, approximate: bool = False) -> int:
+        """Total de líneas; con `approximate` se reutiliza el último conteo cacheado (TTL del modelo)."""
+        domain = self._report_lines_domain(start_date=start_date, end_date=end_date, customer=customer, account_codes=account_codes)
+        if not approximate or self.cache is None:
+            return self.search_count('account.move.line', domain)
+        key = make_key((self.url, self.db), 'account.move.line', domain, ['__count__'])
+        hit, total = self.cache.get(key)
+        if not hit:
+            total = self.search_count('account.move.line', domain)
+            self.cache.set(key, total, 'account.move.line')
+        return total
+
+    @coalesced
+    def get_report_lines(self, start_date: str | None = None, end_date: str | None = None, customer: str | None = None, limit: int = 0, account_codes: str | None = None, offset: int = 0, order: str | None = None, after: Cursor | None = None):
+        """Líneas del reporte; con `after` (cursor) la página sigue a esa línea en orden (date, id)."""
         fields = [
             'date',
             'move_name',
@@ -85,28 +349,31 @@ class OdooConnector:
             'account_id',
             'move_id',
         ]
-        # Filtros de negocio (Odoo 16):
-        # (account_id.code like '12%' OR like '13%')
-        # AND NOT contiene '10', '123', '133'
-        # AND tipo de cuenta por cobrar
-        # Si vienen códigos por parámetro, usarlos; si no, los predeterminados para CxC 12 y 13
-        if account_codes:
-            codes = [c.strip() for c in account_codes.split(',') if c.strip()]
+        final_domain = self._report_lines_domain(start_date=start_date, end_date=end_date, customer=customer, account_codes=account_codes)
+        if after is not None:
+            # Keyset: condición de dominio (AND implícito) en lugar de offset
+            final_domain = keyset_domain(after) + final_domain
+            order, offset = after.order, 0
+        if limit or offset:
+            # offset/limit/order se resuelven en Odoo: solo viaja la página pedida
+            lines = self.search_read('account.move.line', final_domain, fields, limit=limit, offset=offset, order=order)
         else:
-            codes = ['1212', '122', '1312', '132']
+            # Extracción completa: ids primero y lectura por lotes en paralelo
+            lines = self.search_read_chunked('account.move.line', final_domain, fields, order=order)
+        return self._enrich_report_lines(lines)
 
-        # Construir OR plano de Odoo: ['|', cond1, '|', cond2, cond3]
-        code_clauses = [[ 'account_id.code', 'like', f"{c}%" ] for c in codes]
-        account_code_tokens: list = []
-        for i, clause in enumerate(code_clauses):
-            if i > 0:
-                account_code_tokens.append('|')
-            account_code_tokens.append(clause)
-
-        # Dominio final
-        final_domain = base_domain + account_code_tokens + [['account_id.account_type', '=', 'asset_receivable']]
-        lines = self.search_read('account.move.line', final_domain, fields, limit=limit)
+    def iter_report_lines(self, start_date: str | None = None, end_date: str | None = None, customer: str | None = None, account_codes: str | None = None, order: str | None = None) -> Iterator[list]:
+        """Reporte completo por lotes: cada lote de líneas llega ya enriquecido."""
+        fields = [
+            'date', 'move_name', 'ref', 'name', 'date_maturity', 'amount_currency',
+            'amount_residual_currency', 'partner_id', 'account_id', 'move_id',
+        ]
+        domain = self._report_lines_domain(start_date=start_date, end_date=end_date, customer=customer, account_codes=account_codes)
+        for lines in self.iter_search_read_chunked('account.move.line', domain, fields, order=order):
+            yield self._enrich_report_lines(lines)
 
+    def _enrich_report_lines(self, lines: list) -> list:
+        # Las lecturas relacionadas se limitan a los ids presentes en `lines`
         # Collect related ids to batch read partners, accounts, moves
         partner_ids = sorted({l['partner_id'][0] for l in lines if isinstance(l.get('partner_id'), list)})
         account_ids = sorted({l['account_id'][0] for l in lines if isinstance(l.get('account_id'), list)})
@@ -116,85 +383,104 @@ class OdooConnector:
         account_map = {}
         move_map = {}
 
+        # Partners y cuentas casi no cambian: se resuelven desde la caché de dimensiones
         if partner_ids:
-            partner_map = {}
-            # Campos completos para partners (clientes) según especificaciones
-            partner_fields_full = ['vat', 'state_id', 'l10n_pe_district', 'country_id', 'contact_address', 'cod_client_sap', 'country_code']
-            try:
-                partner_recs = self.models.execute_kw(self.db, self.uid, self.password, 'res.partner', 'read', [partner_ids], {'fields': partner_fields_full})
-            except Exception as e:
-                print(f"⚠️ Error extrayendo todos los campos del partner, usando campos básicos: {e}")
-                # Fallback without custom fields
-                partner_recs = self.models.execute_kw(self.db, self.uid, self.password, 'res.partner', 'read', [partner_ids], {'fields': ['vat', 'state_id', 'l10n_pe_district', 'country_id', 'contact_address']})
-            partner_map = {p['id']: p for p in partner_recs}
-
+            partner_map = get_dimension((self.url, self.db), 'res.partner', current_app.config).get_many(self, partner_ids)
         if account_ids:
-            acc_fields = ['code', 'name']
-            acc_recs = self.models.execute_kw(self.db, self.uid, self.password, 'account.account', 'read', [account_ids], {'fields': acc_fields})
-            account_map = {a['id']: a for a in acc_recs}
+            account_map = get_dimension((self.url, self.db), 'account.account', current_app.config).get_many(self, account_ids)
 
         if move_ids:
-            move_map = {}
-            # Intentar obtener todos los campos necesarios para CxC 12 y 13 (todos los canales)
-            move_fields_base = ['invoice_origin', 'invoice_user_id', 'team_id', 'l10n_latam_document_type_id', 'name', 'ref', 'state']
-            move_fields_optional = ['sales_type_id', 'amount_total', 'invoice_date', 'invoice_date_due', 'currency_id', 'move_type', 'payment_state']
-            
-            try:
-                # Intentar con todos los campos
-                all_move_fields = move_fields_base + move_fields_optional
-                move_recs = self.models.execute_kw(self.db, self.uid, self.password, 'account.move', 'read', [move_ids], {'fields': all_move_fields})
-                print(f"✅ Extraídos todos los campos del move: {len(all_move_fields)} campos")
-            except Exception as e:
-                print(f"⚠️ Error extrayendo campos opcionales del move: {e}")
-                try:
-                    # Fallback sin campos opcionales
-                    move_recs = self.models.execute_kw(self.db, self.uid, self.password, 'account.move', 'read', [move_ids], {'fields': move_fields_base})
-                    print(f"✅ Extraídos campos básicos del move: {len(move_fields_base)} campos")
-                except Exception as e2:
-                    print(f"❌ Error crítico extrayendo campos del move: {e2}")
-                    move_recs = self.models.execute_kw(self.db, self.uid, self.password, 'account.move', 'read', [move_ids], {'fields': ['invoice_origin', 'invoice_user_id', 'team_id']})
+            # Campos necesarios para CxC 12 y 13 (todos los canales); los de localización
+            # o personalizados solo se piden si existen en esta base
+            move_fields_base = ['invoice_origin', 'invoice_user_id', 'team_id']
+            move_fields_optional = ['l10n_latam_document_type_id', 'name', 'ref', 'state', 'sales_type_id', 'amount_total',
+                                    'invoice_date', 'invoice_date_due', 'currency_id', 'move_type', 'payment_state']
+            move_recs = self.read('account.move', move_ids, self.available_fields('account.move', move_fields_base, move_fields_optional))
             move_map = {m['id']: m for m in move_recs}
 
-        # Build rows per requested schema
-        rows = []
-        for l in lines:
-            partner = partner_map.get(l['partner_id'][0]) if isinstance(l.get('partner_id'), list) else {}
-            account = account_map.get(l['account_id'][0]) if isinstance(l.get('account_id'), list) else {}
-            move = move_map.get(l['move_id'][0]) if isinstance(l.get('move_id'), list) else {}
-
-            def m2o_name(val):
-                if isinstance(val, list) and len(val) >= 2:
-                    return val[1]
-                return ''
-
-            rows.append({
-                # Campos exactos según especificaciones del usuario
-                'date': l.get('date'),
-                'I10nn_latam_document_type_id': m2o_name(move.get('l10n_latam_document_type_id')),
-                'move_name': l.get('move_name'),
-                'invoice_origin': move.get('invoice_origin') or '',
-                'account_id/code': account.get('code') or '',
-                'account_id/name': account.get('name') or m2o_name(l.get('account_id')),
-                'patner_id/cod_client_sap': partner.get('cod_client_sap') or '',
-                'patner_id/vat': partner.get('vat') or '',
-                'patner_id': m2o_name(l.get('partner_id')),
-                'amount_currency': l.get('amount_currency') or 0.0,
-                'amount_residual_currency': l.get('amount_residual_currency') or 0.0,
-                'date_maturity': l.get('date_maturity'),
-                'ref': l.get('ref') or '',
-                'name': l.get('name') or '',
-                'move_id/invoice_user_id': m2o_name(move.get('invoice_user_id')),
-                'patner_id/state_id': m2o_name(partner.get('state_id')),
-                'patner_id/l10n_pe_district': partner.get('l10n_pe_district') or '',
-                'patner_id/contact_adress': partner.get('contact_address') or '',
-                'patner_id/country_code': partner.get('country_code') or '',
-                'patner_id/country_id': m2o_name(partner.get('country_id')),
+        return build_report_rows(lines, partner_map, account_map, move_map)
+
+
+def _m2o_name(value) -> str:
+    if isinstance(value, list) and len(value) >= 2:
+        return value[1]
+    return ''
+
+
+def _m2o_id(value):
+    return value[0] if isinstance(value, list) else None
+
+
+def _shared(intern, value):
+    # Solo textos: los campos personalizados pueden venir como many2one (listas)
+    return intern(value, value) if value.__class__ is str else value
+
+
+def build_report_rows(lines: list, partner_map: dict, account_map: dict, move_map: dict) -> list:
+    """Arma las filas del reporte CxC a partir de líneas y mapas id -> registro.
+
+    Las filas son ``ReportRow`` (ver ``report_rows.py``) y reemplazan a cada
+    línea cruda en la misma lista, de modo que las líneas de Odoo se liberan a
+    medida que se convierten. Los campos derivados de partner, cuenta y asiento
+    se calculan una vez por registro relacionado y se comparten entre filas.
+    """
+    strings: dict = {}
+    intern = strings.setdefault  # intern(valor, valor): mismo objeto para textos iguales
+    partner_cols: dict = {}
+    account_cols: dict = {}
+    move_cols: dict = {}
+
+    for i, l in enumerate(lines):
+        partner_id = _m2o_id(l.get('partner_id'))
+        partner = partner_cols.get(partner_id)
+        if partner is None:
+            p = partner_map.get(partner_id) or {}
+            partner = partner_cols[partner_id] = tuple(_shared(intern, v) for v in (
+                p.get('cod_client_sap') or '',
+                p.get('vat') or '',
+                _m2o_name(p.get('state_id')),
+                p.get('l10n_pe_district') or '',
+                p.get('contact_address') or '',
+                p.get('country_code') or '',
+                _m2o_name(p.get('country_id')),
+            ))
+        account_id = _m2o_id(l.get('account_id'))
+        account = account_cols.get(account_id)
+        if account is None:
+            a = account_map.get(account_id) or {}
+            account = account_cols[account_id] = tuple(_shared(intern, v) for v in (
+                a.get('code') or '',
+                a.get('name') or _m2o_name(l.get('account_id')),
+            ))
+        move_id = _m2o_id(l.get('move_id'))
+        move = move_cols.get(move_id)
+        if move is None:
+            m = move_map.get(move_id) or {}
+            move = move_cols[move_id] = tuple(_shared(intern, v) for v in (
+                _m2o_name(m.get('l10n_latam_document_type_id')),
+                m.get('invoice_origin') or '',
+                _m2o_name(m.get('invoice_user_id')),
                 # CORRECCIÓN: team_id es el campo correcto para sales_channel_id en Odoo
-                'move_id/sales_channel_id': m2o_name(move.get('team_id')),
-                'move_id/sales_type_id': m2o_name(move.get('sales_type_id')),
-                # NUEVO: Estado de pago (payment_state)
-                'move_id/payment_state': move.get('payment_state') or '',
-            })
+                _m2o_name(m.get('team_id')),
+                _m2o_name(m.get('sales_type_id')),
+                # Estado de pago (payment_state)
+                m.get('payment_state') or '',
+            ))
 
-        return rows
+        partner_name = _m2o_name(l.get('partner_id'))
+        move_name = l.get('move_name')
+        date_value = l.get('date')
+        maturity = l.get('date_maturity')
+        ref = l.get('ref') or ''
+        lines[i] = ReportRow(
+            intern(date_value, date_value), move[0], intern(move_name, move_name), move[1],
+            account[0], account[1],
+            partner[0], partner[1], intern(partner_name, partner_name),
+            l.get('amount_currency') or 0.0, l.get('amount_residual_currency') or 0.0,
+            intern(maturity, maturity), intern(ref, ref), l.get('name') or '',
+            move[2], partner[2], partner[3], partner[4], partner[5], partner[6],
+            move[3], move[4], move[5],
+            l.get('id'),
+        )
 
+    return lines
@@ -0,0 +1,441 @@
+"""Pool de sesiones hacia Odoo compartido por todo el proceso.
+
+Cada ``OdooConnector`` pide prestado un cliente a este pool en lugar de abrir
+un ``ServerProxy`` nuevo: el ``uid`` se autentica una sola vez por juego de
+credenciales y las conexiones HTTP(S) se mantienen vivas entre peticiones.
+
+El transporte se elige por pool (``ODOO_TRANSPORT``): ``xmlrpc`` (``/xmlrpc/2``)
+o ``jsonrpc`` (``/jsonrpc``, más compacto y rápido de parsear). Ambos exponen
+los mismos proxies ``common``/``models`` y los errores de Odoo llegan siempre
+como ``xmlrpc.client.Fault``.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import http.client
+import itertools
+import json
+import queue
+import threading
+import time
+import xmlrpc.client
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+
+# Fragmentos de faultString con los que Odoo indica credenciales/uid inválidos
+SESSION_ERROR_MARKERS = ("AccessDenied", "Access Denied", "SessionExpired", "Session expired")
+
+# Errores de red tras los que la conexión queda inservible y se descarta
+CONNECTION_ERRORS = (http.client.HTTPException, ConnectionError, OSError)
+
+# Conexión keep-alive que el servidor cerró mientras estaba ociosa: la petición no
+# llegó a procesarse y se puede repetir. Un timeout no entra: Odoo pudo haberla
+# ejecutado y repetirla duplicaría el trabajo (o una escritura)
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class _CountingResponse:
+    """Envuelve la respuesta HTTP contando los bytes leídos."""
+
+    def __init__(self, response):
+        self._response = response
+        self.bytes = 0
+
+    def getheader(self, name, default=None):
+        return self._response.getheader(name, default)
+
+    def read(self, *args):
+        data = self._response.read(*args)
+        self.bytes += len(data)
+        return data
+
+
+class _KeepAliveMixin:
+    """Transport con timeout configurable que reutiliza la conexión HTTP/1.1.
+
+    Tras cada llamada deja en ``last_response_bytes`` y ``last_parse_seconds``
+    el tamaño de la respuesta y el tiempo de lectura + unmarshalling del XML.
+    """
+
+    def __init__(self, *args, timeout: float | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timeout = timeout
+        self.last_response_bytes = 0
+        self.last_parse_seconds = 0.0
+
+    def make_connection(self, host):
+        conn = super().make_connection(host)
+        if self.timeout is not None:
+            conn.timeout = self.timeout
+        return conn
+
+    def parse_response(self, response):
+        started = time.perf_counter()
+        counted = _CountingResponse(response)
+        try:
+            return super().parse_response(counted)
+        finally:
+            self.last_response_bytes = counted.bytes
+            self.last_parse_seconds = time.perf_counter() - started
+
+
+class KeepAliveTransport(_KeepAliveMixin, xmlrpc.client.Transport):
+    pass
+
+
+class KeepAliveSafeTransport(_KeepAliveMixin, xmlrpc.client.SafeTransport):
+    pass
+
+
+class JsonRpcTransport:
+    """Llamadas a ``/jsonrpc`` sobre una conexión HTTP/1.1 persistente.
+
+    Igual que los transports XML-RPC, pide la respuesta comprimida con gzip y
+    deja en ``last_response_bytes`` y ``last_parse_seconds`` el tamaño recibido
+    y el tiempo de lectura + descompresión + ``json.loads``. Un error de Odoo
+    se levanta como ``xmlrpc.client.Fault``.
+    """
+
+    # Mismo nombre que en xmlrpc.client.Transport
+    accept_gzip_encoding = True
+
+    def __init__(self, url: str, timeout: float | None = None):
+        parts = urlsplit(url)
+        self.https = parts.scheme == "https"
+        self.host = parts.netloc
+        self.path = parts.path.rstrip("/") + "/jsonrpc"
+        self.timeout = timeout
+        self.last_response_bytes = 0
+        self.last_parse_seconds = 0.0
+        self._connection = None
+        self._ids = itertools.count(1)
+
+    def _connect(self):
+        if self._connection is None:
+            connection_cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._connection = connection_cls(self.host, timeout=self.timeout)
+        return self._connection
+
+    def call(self, service: str, method: str, *args):
+        body = json.dumps({
+            "jsonrpc": "2.0",
+            "method": "call",
+            "params": {"service": service, "method": method, "args": list(args)},
+            "id": next(self._ids),
+        }, separators=(",", ":")).encode("utf-8")
+        connection = self._connect()
+        try:
+            headers = {"Content-Type": "application/json", "Accept": "application/json"}
+            if self.accept_gzip_encoding:
+                headers["Accept-Encoding"] = "gzip"
+            connection.request("POST", self.path, body, headers)
+            response = connection.getresponse()
+            started = time.perf_counter()
+            data = response.read()
+            if response.status != 200:
+                raise xmlrpc.client.ProtocolError(self.host + self.path, response.status, response.reason, response.msg)
+            received = len(data)
+            if response.getheader("Content-Encoding", "") == "gzip":
+                data = gzip.decompress(data)
+            payload = json.loads(data)
+            self.last_response_bytes = received
+            self.last_parse_seconds = time.perf_counter() - started
+        except Exception:
+            # Respuesta a medio leer o conexión caída: la próxima llamada abre otra
+            self.close()
+            raise
+        error = payload.get("error")
+        if error:
+            details = error.get("data") or {}
+            message = details.get("debug") or details.get("message") or error.get("message") or ""
+            raise xmlrpc.client.Fault(error.get("code", 1), f"{details.get('name', '')}: {message}")
+        return payload.get("result")
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class _JsonRpcService:
+    """Proxy de un servicio JSON-RPC (``common``/``object``) con la interfaz de ``ServerProxy``."""
+
+    def __init__(self, transport: JsonRpcTransport, service: str):
+        self._transport = transport
+        self._service = service
+
+    def __getattr__(self, method: str):
+        def call(*args):
+            return self._transport.call(self._service, method, *args)
+        return call
+
+
+class _PooledClient(ABC):
+    """Par de proxies (common/object) que comparten un mismo transport."""
+
+    def __init__(self, url: str, timeout: float | None):
+        self.transport = self._make_transport(url, timeout)
+        self.common, self.models = self._make_proxies(url)
+        self.created_at = time.monotonic()
+        self.calls = 0
+
+    @abstractmethod
+    def _make_transport(self, url: str, timeout: float | None):
+        """Transport del cliente (con `close()`, `last_response_bytes` y `last_parse_seconds`)."""
+
+    @abstractmethod
+    def _make_proxies(self, url: str):
+        """Proxies `(common, models)` sobre `self.transport`."""
+
+    def close(self) -> None:
+        try:
+            self.transport.close()
+        except Exception:
+            pass
+
+
+class XmlRpcClient(_PooledClient):
+    def _make_transport(self, url: str, timeout: float | None):
+        transport_cls = KeepAliveSafeTransport if url.startswith("https") else KeepAliveTransport
+        return transport_cls(timeout=timeout)
+
+    def _make_proxies(self, url: str):
+        return (
+            xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/common", transport=self.transport, allow_none=True),
+            xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/object", transport=self.transport, allow_none=True),
+        )
+
+
+class JsonRpcClient(_PooledClient):
+    def _make_transport(self, url: str, timeout: float | None):
+        return JsonRpcTransport(url, timeout=timeout)
+
+    def _make_proxies(self, url: str):
+        return _JsonRpcService(self.transport, "common"), _JsonRpcService(self.transport, "object")
+
+
+# Valores admitidos de ODOO_TRANSPORT
+TRANSPORTS = {
+    "xmlrpc": XmlRpcClient,
+    "jsonrpc": JsonRpcClient,
+}
+
+
+def is_session_error(exc: Exception) -> bool:
+    if not isinstance(exc, xmlrpc.client.Fault):
+        return False
+    text = str(exc.faultString or "")
+    return any(marker in text for marker in SESSION_ERROR_MARKERS)
+
+
+class OdooSessionPool:
+    """Pool acotado y thread-safe de clientes Odoo para un juego de credenciales."""
+
+    def __init__(self, url: str, db: str, username: str, password: str,
+                 max_size: int = 8, timeout: float | None = 120, acquire_timeout: float = 30,
+                 transport: str = "xmlrpc"):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Transporte Odoo no soportado: {transport} (opciones: {', '.join(TRANSPORTS)})")
+        self.url = url.rstrip("/")
+        self.transport = transport
+        self._client_cls = TRANSPORTS[transport]
+        self.db = db
+        self.username = username
+        self.password = password
+        self.max_size = max(1, int(max_size))
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+
+        self._idle: queue.LifoQueue[_PooledClient] = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._auth_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._uid: int | None = None
+        self._created = 0
+        self._in_use = 0
+        self._stats = {
+            "acquired": 0,
+            "reused": 0,
+            "created": 0,
+            "discarded": 0,
+            "wait_timeouts": 0,
+            "authentications": 0,
+            "reauthentications": 0,
+            "retries": 0,
+            "calls": 0,
+        }
+
+    # -- gestión de clientes -------------------------------------------------
+    def _acquire(self) -> _PooledClient:
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._stats["wait_timeouts"] += 1
+            raise TimeoutError(f"Pool de conexiones Odoo agotado ({self.max_size} en uso)")
+        try:
+            client = self._idle.get_nowait()
+            reused = True
+        except queue.Empty:
+            client = self._client_cls(self.url, self.timeout)
+            reused = False
+        with self._lock:
+            self._stats["acquired"] += 1
+            self._in_use += 1
+            if reused:
+                self._stats["reused"] += 1
+            else:
+                self._created += 1
+                self._stats["created"] += 1
+        return client
+
+    def _release(self, client: _PooledClient, discard: bool = False) -> None:
+        with self._lock:
+            self._in_use -= 1
+            if discard:
+                self._created -= 1
+                self._stats["discarded"] += 1
+        if discard:
+            client.close()
+        else:
+            self._idle.put(client)
+        self._slots.release()
+
+    @contextmanager
+    def client(self):
+        client = self._acquire()
+        discard = False
+        try:
+            yield client
+        except CONNECTION_ERRORS:
+            discard = True
+            raise
+        finally:
+            self._release(client, discard=discard)
+
+    # -- autenticación -------------------------------------------------------
+    def _authenticate(self, client: _PooledClient, force: bool = False) -> int:
+        with self._auth_lock:
+            if self._uid is not None and not force:
+                return self._uid
+            uid = client.common.authenticate(self.db, self.username, self.password, {})
+            if not uid:
+                self._uid = None
+                raise ValueError("Autenticación Odoo fallida")
+            with self._lock:
+                self._stats["authentications"] += 1
+                if force:
+                    self._stats["reauthentications"] += 1
+            self._uid = uid
+            return uid
+
+    def authenticate(self) -> int:
+        if self._uid is not None:
+            return self._uid
+        with self.client() as client:
+            return self._authenticate(client)
+
+    def invalidate(self) -> None:
+        """Olvida el uid cacheado y cierra las conexiones ociosas."""
+        with self._auth_lock:
+            self._uid = None
+        while True:
+            try:
+                client = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+                self._stats["discarded"] += 1
+            client.close()
+
+    # -- llamadas ------------------------------------------------------------
+    def execute_kw(self, model: str, method: str, args: list, kwargs: dict | None = None, info: dict | None = None):
+        """Ejecuta `method` en Odoo; si se pasa `info`, se completa con bytes y tiempo de parseo."""
+        kwargs = kwargs or {}
+        reauthenticated = False
+        retried = False
+        while True:
+            client = self._acquire()
+            discard = False
+            try:
+                uid = self._authenticate(client)
+                client.calls += 1
+                with self._lock:
+                    self._stats["calls"] += 1
+                result = client.models.execute_kw(self.db, uid, self.password, model, method, args, kwargs)
+                if info is not None:
+                    info["bytes"] = client.transport.last_response_bytes
+                    info["parse_seconds"] = client.transport.last_parse_seconds
+                return result
+            except xmlrpc.client.Fault as exc:
+                if reauthenticated or not is_session_error(exc):
+                    raise
+                # uid caducado o credenciales rotadas: re-autenticar una sola vez
+                reauthenticated = True
+                self._authenticate(client, force=True)
+            except CONNECTION_ERRORS as exc:
+                # Conexión keep-alive cerrada por el servidor: abrir otra y reintentar una vez
+                discard = True
+                if retried or not isinstance(exc, STALE_CONNECTION_ERRORS):
+                    raise
+                retried = True
+                with self._lock:
+                    self._stats["retries"] += 1
+            finally:
+                self._release(client, discard=discard)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            data = dict(self._stats)
+            data.update({
+                "url": self.url,
+                "transport": self.transport,
+                "db": self.db,
+                "username": self.username,
+                "authenticated": self._uid is not None,
+                "max_size": self.max_size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+            })
+        return data
+
+    def close(self) -> None:
+        self.invalidate()
+
+
+_pools: Dict[Tuple[str, str, str, str, str], OdooSessionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(url: str, db: str, username: str, password: str, transport: str = "xmlrpc") -> Tuple[str, str, str, str, str]:
+    # No se guarda la contraseña en claro como parte de la clave
+    digest = hashlib.sha256(password.encode("utf-8")).hexdigest()
+    return (url.rstrip("/"), db, username, digest, transport)
+
+
+def get_pool(url: str, db: str, username: str, password: str, **options) -> OdooSessionPool:
+    key = _pool_key(url, db, username, password, options.get("transport", "xmlrpc"))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = OdooSessionPool(url, db, username, password, **options)
+            _pools[key] = pool
+        return pool
+
+
+def pool_stats() -> list:
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [p.stats() for p in pools]
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for p in pools:
+        p.close()
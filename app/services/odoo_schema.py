@@ -0,0 +1,70 @@
+"""Capacidades de esquema por base Odoo, detectadas con ``fields_get``.
+
+Cada modelo se consulta una sola vez por instancia (url, db) y la lista de
+campos queda en memoria. Los lectores piden sus campos opcionales (campos
+personalizados o de localización) y reciben solo los que existen, en vez de
+intentar la lectura completa y reintentar con menos campos al fallar.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Dict, Tuple
+
+
+# Campos personalizados / de localización que usa la aplicación y pueden faltar
+TRACKED_FIELDS = {
+    'res.partner': ['cod_client_sap', 'country_code', 'l10n_pe_district', 'state_id', 'contact_address'],
+    'account.move': ['l10n_latam_document_type_id', 'sales_channel_id', 'sales_type_id', 'invoice_user_id', 'team_id', 'payment_state'],
+    'account.move.line': ['parent_state', 'amount_residual_currency'],
+}
+
+
+class SchemaCache:
+    def __init__(self):
+        self._fields: Dict[Tuple[str, str, str], Dict[str, dict]] = {}
+        self._locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def fields(self, connector, model: str) -> Dict[str, dict]:
+        """Definición de campos de `model` (nombre -> tipo/etiqueta), consultada una vez."""
+        key = (connector.url, connector.db, model)
+        cached = self._fields.get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            model_lock = self._locks.setdefault(key, threading.Lock())
+        with model_lock:
+            cached = self._fields.get(key)
+            if cached is None:
+                cached = connector.execute_kw(model, 'fields_get', [], {'attributes': ['type', 'string']})
+                self._fields[key] = cached
+        return cached
+
+    def available(self, connector, model: str, fields: list) -> list:
+        """Filtra `fields` dejando solo los que existen en la base (conserva el orden)."""
+        known = self.fields(connector, model)
+        return [f for f in fields if f in known]
+
+    def invalidate(self) -> int:
+        with self._lock:
+            removed = len(self._fields)
+            self._fields.clear()
+        return removed
+
+    def capabilities(self, connector) -> Dict[str, dict]:
+        data = {}
+        for model, tracked in TRACKED_FIELDS.items():
+            known = self.fields(connector, model)
+            data[model] = {
+                'fields': len(known),
+                'available': [f for f in tracked if f in known],
+                'missing': [f for f in tracked if f not in known],
+            }
+        return data
+
+
+_schema = SchemaCache()
+
+
+def get_schema() -> SchemaCache:
+    return _schema
@@ -0,0 +1,54 @@
+"""Paginación por cursor (keyset) del reporte CxC 12/13 sobre (date, id).
+
+El cursor es opaco para el cliente: JSON en base64 url-safe con la fecha e id
+de la última línea entregada y el sentido del orden. La página siguiente se
+pide con una condición de dominio (``date < d or (date = d and id < i)``), no
+con ``offset``: el costo no crece con la profundidad y las líneas conciliadas
+entre cargas no desplazan los resultados.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import date
+from typing import NamedTuple
+
+
+class Cursor(NamedTuple):
+    date: str
+    id: int
+    descending: bool = True
+
+    @property
+    def order(self) -> str:
+        return keyset_order(self.descending)
+
+
+def keyset_order(descending: bool = True) -> str:
+    direction = 'desc' if descending else 'asc'
+    return f'date {direction}, id {direction}'
+
+
+def encode_cursor(line_date, line_id: int, descending: bool = True) -> str:
+    raw = json.dumps([str(line_date), int(line_id), 'd' if descending else 'a'], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> Cursor:
+    """Cursor recibido del cliente; ValueError si no es uno emitido por la API."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        line_date, line_id, direction = json.loads(raw)
+        date.fromisoformat(line_date)
+        if direction not in ('a', 'd') or not isinstance(line_id, int):
+            raise ValueError
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise ValueError("Cursor de paginación inválido")
+    return Cursor(line_date, line_id, direction == 'd')
+
+
+def keyset_domain(cursor: Cursor) -> list:
+    """Condición Odoo para las líneas posteriores al cursor en el orden (date, id)."""
+    op = '<' if cursor.descending else '>'
+    return ['|', ['date', op, cursor.date], '&', ['date', '=', cursor.date], ['id', op, cursor.id]]
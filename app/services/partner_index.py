@@ -0,0 +1,283 @@
+"""Índice local de partners para el filtro de cliente (``q``) y el autocompletado.
+
+Se arma con todos los ``res.partner`` con los mismos campos que mira el
+``ilike`` de Odoo 16 sobre un many2one (``_name_search``: nombre completo,
+email, referencia y VAT) más ``cod_client_sap``; se actualiza cada
+``refresh_seconds`` con los modificados desde la marca de agua de
+``write_date`` y se rearma completo cada ``rebuild_seconds``. El armado corre
+en un hilo aparte: mientras no esté listo el conector sigue con ``ilike``.
+
+- ``resolve(texto)``: ids de los partners cuyo nombre, email, referencia, VAT o
+  código SAP contiene el texto (como ``ilike``), vía índice de trigramas. El
+  conector los envía a Odoo como ``['partner_id', 'in', ids]`` en lugar de un
+  ``ilike`` que obliga a un join sin índice en cada búsqueda.
+- ``suggest(texto)``: autocompletado; claves que empiezan por el texto
+  (búsqueda binaria sobre claves ordenadas) y, desde 3 caracteres, las que lo
+  contienen.
+
+Un partner modificado solo agrega sus trigramas y claves nuevos; los que ya no
+le corresponden quedan hasta el próximo rearmado y se descartan al verificar
+cada candidato contra su texto actual.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, List, Tuple
+
+
+PARTNER_INDEX_FIELDS = ['name', 'vat', 'write_date']
+# display_name/complete_name incluyen la empresa padre ("Empresa, Contacto"), como el ilike de Odoo
+PARTNER_INDEX_OPTIONAL_FIELDS = ['display_name', 'complete_name', 'email', 'ref', 'cod_client_sap']
+# Incluye archivados: el `ilike` sobre un many2one los encuentra (active_test=False)
+# y pueden seguir teniendo facturas abiertas
+PARTNER_INDEX_DOMAIN = [['active', 'in', [True, False]]]
+
+# Los campos se unen con un separador que no aparece en lo que escribe el usuario:
+# un texto nunca coincide "cruzando" de nombre a VAT
+_SEPARATOR = '\x00'
+_GRAM = 3
+# Odoo compara el VAT con el texto sin estos caracteres (res.partner._name_search)
+_VAT_STRIP = re.compile(r'[^a-zA-Z0-9\-\.]+')
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text) -> str:
+    return text.strip().casefold() if isinstance(text, str) else ''
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + _GRAM] for i in range(len(text) - _GRAM + 1)}
+
+
+def _text(value) -> str:
+    return value if isinstance(value, str) else ''
+
+
+class PartnerIndex:
+    def __init__(self, refresh_seconds: float = 300, rebuild_seconds: float = 6 * 3600, max_ids: int = 1000):
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        # Más ids que esto no compensa frente al ilike en Odoo
+        self.max_ids = int(max_ids)
+        self.watermark = ''
+        self.built_at: float | None = None
+        # id -> (nombre, vat, código SAP) para mostrar
+        self._entries: Dict[int, Tuple[str, str, str]] = {}
+        # id -> 'nombre\0vat\0sap\0email\0ref' en minúsculas, contra el que se verifica cada candidato
+        self._texts: Dict[int, str] = {}
+        # id -> VAT en minúsculas (el texto buscado se compara sin separadores)
+        self._vats: Dict[int, str] = {}
+        # trigrama -> ids que lo contienen (array de int32: los ids de Odoo son int4)
+        self._grams: Dict[str, array] = {}
+        # (clave en minúsculas, id) ordenadas: prefijos de nombre, VAT y código SAP
+        self._keys: List[Tuple[str, int]] = []
+        self._last_refresh = time.monotonic()
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._building = False
+        self._stats = {'builds': 0, 'refreshes': 0, 'refreshed': 0, 'resolved': 0, 'fallbacks': 0, 'suggestions': 0}
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at is not None
+
+    # -- armado ----------------------------------------------------------------
+    def _fields(self, connector) -> list:
+        return connector.available_fields('res.partner', PARTNER_INDEX_FIELDS, PARTNER_INDEX_OPTIONAL_FIELDS)
+
+    def _add(self, rec: dict, keep_sorted: bool = True) -> None:
+        partner_id = rec['id']
+        name = _text(rec.get('display_name')) or _text(rec.get('complete_name')) or _text(rec.get('name'))
+        entry = (name, _text(rec.get('vat')), _text(rec.get('cod_client_sap')))
+        keys = [normalize(value) for value in entry + (_text(rec.get('email')), _text(rec.get('ref')))]
+        text = _SEPARATOR.join(keys)
+        previous = self._texts.get(partner_id)
+        self._entries[partner_id] = entry
+        self._texts[partner_id] = text
+        self._vats[partner_id] = keys[1]
+        if previous != text:
+            known = _trigrams(previous) if previous else set()
+            for gram in _trigrams(text) - known:
+                ids = self._grams.get(gram)
+                if ids is None:
+                    ids = self._grams[gram] = array('i')
+                ids.append(partner_id)
+            known_keys = set(previous.split(_SEPARATOR)) if previous else set()
+            for key in keys:
+                if key and key not in known_keys:
+                    if keep_sorted:
+                        insort(self._keys, (key, partner_id))
+                    else:
+                        self._keys.append((key, partner_id))
+        if rec.get('write_date') and rec['write_date'] > self.watermark:
+            self.watermark = rec['write_date']
+
+    def build(self, connector) -> int:
+        """Lee todos los partners de Odoo y rearma el índice."""
+        records = connector.search_read_chunked('res.partner', PARTNER_INDEX_DOMAIN, self._fields(connector))
+        index = PartnerIndex(self.refresh_seconds, self.rebuild_seconds, self.max_ids)
+        for rec in records:
+            index._add(rec, keep_sorted=False)
+        index._keys.sort()
+        with self._lock:
+            self._entries, self._texts, self._vats, self._grams = index._entries, index._texts, index._vats, index._grams
+            self._keys, self.watermark = index._keys, index.watermark
+            self.built_at = self._last_refresh = time.monotonic()
+            self._stats['builds'] += 1
+        return len(records)
+
+    def refresh(self, connector, force: bool = False) -> int:
+        """Reindexa los partners modificados desde la marca de agua."""
+        now = time.monotonic()
+        with self._lock:
+            due = force or now - self._last_refresh >= self.refresh_seconds
+            if not self.ready or not due or not self.watermark:
+                return 0
+            self._last_refresh = now
+            watermark = self.watermark
+        domain = PARTNER_INDEX_DOMAIN + [['write_date', '>=', watermark]]
+        changed = connector.search_read('res.partner', domain, self._fields(connector), use_cache=False)
+        with self._lock:
+            for rec in changed:
+                self._add(rec)
+            self._stats['refreshes'] += 1
+            self._stats['refreshed'] += len(changed)
+        return len(changed)
+
+    def _build_in_background(self, app, connector) -> None:
+        try:
+            with app.app_context():
+                self.build(connector)
+        except Exception:
+            logger.exception("No se pudo armar el índice de partners")
+        finally:
+            with self._build_lock:
+                self._building = False
+
+    def ensure(self, connector, app) -> bool:
+        """Arma el índice en segundo plano en el primer uso o al vencer `rebuild_seconds`; si no, lo refresca si toca.
+
+        No bloquea: devuelve si el índice está listo. Mientras se rearma se sigue
+        usando el anterior.
+        """
+        if self.built_at is None or time.monotonic() - self.built_at >= self.rebuild_seconds:
+            with self._build_lock:
+                start = not self._building
+                self._building = True
+            if start:
+                threading.Thread(target=self._build_in_background, args=(app, connector),
+                                 name='partner-index', daemon=True).start()
+        if self.ready:
+            self.refresh(connector)
+        return self.ready
+
+    # -- búsquedas -------------------------------------------------------------
+    def _matching(self, query: str, limit: int | None = None, texts: Dict[int, str] | None = None) -> List[int]:
+        # Se recorren los ids del trigrama más raro y se verifica el texto actual de cada uno
+        texts = self._texts if texts is None else texts
+        postings = [self._grams.get(gram) for gram in _trigrams(query)]
+        if not postings or any(ids is None for ids in postings):
+            return []
+        matches, seen = [], set()
+        for partner_id in min(postings, key=len):
+            if partner_id not in seen and query in texts[partner_id]:
+                seen.add(partner_id)
+                matches.append(partner_id)
+                if limit is not None and len(matches) >= limit:
+                    break
+        return matches
+
+    def resolve(self, text: str) -> List[int] | None:
+        """Ids de partners que contienen `text`, o None si conviene dejar el `ilike` a Odoo.
+
+        None cuando el texto es muy corto, trae comodines de ``ilike`` (``%``, ``_``),
+        no coincide con ningún partner del índice (el ``ilike`` de Odoo también
+        busca en campos no indexados) o coincide con más de ``max_ids``.
+        """
+        query = normalize(text)
+        if len(query) < _GRAM or '%' in query or '_' in query:
+            with self._lock:
+                self._stats['fallbacks'] += 1
+            return None
+        # El VAT se compara con el texto sin espacios ni otros separadores, como en Odoo
+        vat_query = normalize(_VAT_STRIP.sub('', text))
+        with self._lock:
+            ids = set(self._matching(query, limit=self.max_ids + 1))
+            if vat_query != query and len(vat_query) >= _GRAM and len(ids) <= self.max_ids:
+                ids.update(self._matching(vat_query, limit=self.max_ids + 1, texts=self._vats))
+            if not ids or len(ids) > self.max_ids:
+                self._stats['fallbacks'] += 1
+                return None
+            self._stats['resolved'] += 1
+        return sorted(ids)
+
+    def suggest(self, text: str, limit: int = 10) -> List[Dict]:
+        """Partners para el autocompletado: primero por prefijo, luego por contenido."""
+        query = normalize(text)
+        if not query:
+            return []
+        found: List[int] = []
+        with self._lock:
+            self._stats['suggestions'] += 1
+            position = bisect_left(self._keys, (query,))
+            while position < len(self._keys) and len(found) < limit:
+                key, partner_id = self._keys[position]
+                if not key.startswith(query):
+                    break
+                # Las claves previas a una modificación siguen hasta el rearmado: se verifican
+                if partner_id not in found and key in self._texts[partner_id].split(_SEPARATOR):
+                    found.append(partner_id)
+                position += 1
+            if len(found) < limit and len(query) >= _GRAM:
+                for partner_id in self._matching(query, limit=limit * 2):
+                    if partner_id not in found:
+                        found.append(partner_id)
+                        if len(found) >= limit:
+                            break
+            entries = [(partner_id, self._entries[partner_id]) for partner_id in found]
+        return [{'id': partner_id, 'name': name, 'vat': vat, 'cod_client_sap': sap} for partner_id, (name, vat, sap) in entries]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            data = dict(self._stats)
+            data.update({
+                'ready': self.ready,
+                'partners': len(self._entries),
+                'trigrams': len(self._grams),
+                'keys': len(self._keys),
+                'watermark': self.watermark or None,
+                'refresh_seconds': self.refresh_seconds,
+                'rebuild_seconds': self.rebuild_seconds,
+                'max_ids': self.max_ids,
+            })
+        return data
+
+
+_indexes: Dict[Tuple[str, str], PartnerIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_partner_index(instance: Tuple[str, str], config=None) -> PartnerIndex:
+    """Índice de proceso por instancia Odoo (url, db)."""
+    config = config or {}
+    with _indexes_lock:
+        index = _indexes.get(instance)
+        if index is None:
+            index = _indexes[instance] = PartnerIndex(
+                refresh_seconds=config.get('PARTNER_INDEX_REFRESH_SECONDS', 300),
+                rebuild_seconds=config.get('PARTNER_INDEX_REBUILD_SECONDS', 6 * 3600),
+                max_ids=config.get('PARTNER_INDEX_MAX_IDS', 1000),
+            )
+        return index
+
+
+def partner_index_stats() -> list:
+    with _indexes_lock:
+        items = list(_indexes.items())
+    return [{'instance': f"{url}/{dbname}", **index.stats()} for (url, dbname), index in items]
@@ -0,0 +1,172 @@
+"""Caché TTL + LRU para resultados de ``search_read`` contra Odoo.
+
+Las claves combinan instancia Odoo, modelo, dominio normalizado, campos y
+paginación. Cada modelo tiene su propio TTL y el tamaño total se acota por una
+estimación de memoria: al superarla se expulsan las entradas menos usadas.
+"""
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+
+DEFAULT_TTLS = {
+    'account.move': 60,
+    'account.move.line': 60,
+    'res.partner': 900,
+    'account.account': 3600,
+}
+
+DOMAIN_OPERATORS = ('|', '&', '!')
+
+
+def freeze(value: Any) -> Hashable:
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    return value
+
+
+def normalize_domain(domain: list | None) -> tuple:
+    """Dominio inmutable; si solo hay ANDs implícitos, las hojas se ordenan."""
+    frozen = tuple(freeze(leaf) for leaf in (domain or []))
+    if any(token in DOMAIN_OPERATORS for token in frozen):
+        return frozen
+    return tuple(sorted(frozen, key=repr))
+
+
+def make_key(instance: Tuple[str, str], model: str, domain: list, fields: list | None, limit: int = 0,
+             offset: int = 0, order: str | None = None) -> tuple:
+    return (
+        instance,
+        model,
+        normalize_domain(domain),
+        tuple(sorted(fields or [])),
+        int(limit or 0),
+        int(offset or 0),
+        (order or '').strip(),
+    )
+
+
+def estimate_size(records: Any, sample: int = 50) -> int:
+    """Estimación barata del tamaño en bytes a partir de una muestra de registros."""
+    if not isinstance(records, list) or not records:
+        return sys.getsizeof(records)
+    step = max(1, len(records) // sample)
+    sampled = records[::step][:sample]
+    total = 0
+    for rec in sampled:
+        total += sys.getsizeof(rec)
+        if isinstance(rec, dict):
+            for k, v in rec.items():
+                total += sys.getsizeof(k) + sys.getsizeof(v)
+                if isinstance(v, (list, tuple)):
+                    total += sum(sys.getsizeof(x) for x in v)
+    return sys.getsizeof(records) + int(total / len(sampled) * len(records))
+
+
+class _Entry:
+    __slots__ = ('value', 'model', 'expires_at', 'size')
+
+    def __init__(self, value: Any, model: str, expires_at: float, size: int):
+        self.value = value
+        self.model = model
+        self.expires_at = expires_at
+        self.size = size
+
+
+class QueryCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, default_ttl: float = 60, ttls: Dict[str, float] | None = None):
+        self.max_bytes = int(max_bytes)
+        self.default_ttl = default_ttl
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0, 'sets': 0, 'skipped': 0}
+
+    def ttl_for(self, model: str) -> float:
+        return self.ttls.get(model, self.default_ttl)
+
+    def get(self, key: tuple) -> Tuple[bool, Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return False, None
+            if entry.expires_at <= now:
+                self._drop(key)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return True, entry.value
+
+    def set(self, key: tuple, value: Any, model: str) -> None:
+        ttl = self.ttl_for(model)
+        size = estimate_size(value)
+        with self._lock:
+            if ttl <= 0 or size > self.max_bytes:
+                self._stats['skipped'] += 1
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(value, model, time.monotonic() + ttl, size)
+            self._bytes += size
+            self._stats['sets'] += 1
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats['evictions'] += 1
+
+    def _drop(self, key: tuple) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def invalidate(self, model: str | None = None) -> int:
+        """Elimina todas las entradas (o solo las de `model`) y devuelve cuántas."""
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if model is None or e.model == model]
+            for k in keys:
+                self._drop(k)
+            self._stats['invalidations'] += len(keys)
+            return len(keys)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            data = dict(self._stats)
+            lookups = data['hits'] + data['misses']
+            data.update({
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hit_ratio': round(data['hits'] / lookups, 4) if lookups else 0.0,
+                'ttls': dict(self.ttls),
+                'default_ttl': self.default_ttl,
+            })
+        return data
+
+
+_cache: QueryCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache(config=None) -> QueryCache:
+    """Caché de proceso; se configura con la config de Flask en el primer uso."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = config or {}
+            _cache = QueryCache(
+                max_bytes=config.get('ODOO_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+                default_ttl=config.get('ODOO_CACHE_TTL', 60),
+                ttls=config.get('ODOO_CACHE_TTLS'),
+            )
+        return _cache
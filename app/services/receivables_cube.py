@@ -0,0 +1,466 @@
+"""Cubo en memoria de saldos abiertos de facturas de cliente.
+
+Cada celda agrupa las facturas impagas que comparten partner, mes de factura,
+mes de vencimiento, cuenta por cobrar, equipo de ventas, canal de venta y
+tipo de documento. Las dimensiones de texto se guardan como códigos enteros y
+los meses como ``datetime64[M]`` en arreglos NumPy contiguos; las medidas son
+saldo positivo, facturas con saldo, facturas totales y la suma de los días de
+vencimiento (para el promedio de días de mora).
+
+La única precisión diaria que necesitan los KPIs es vencido/vigente: el mes de
+vencimiento se parte en la fecha de corte (``as_of``, el día de la carga
+completa) y la celda guarda si está vencida. Al cambiar el día el cubo se
+recarga completo. Por la misma razón los filtros de fecha de factura solo se
+responden desde el cubo si abarcan meses completos (ver ``month_aligned``).
+
+El cubo se carga completo una vez y luego se refresca solo con las facturas
+cuyo ``write_date`` supera la marca de agua: la contribución anterior de cada
+factura se resta y se suma la nueva (o nada, si dejó de estar abierta). Las
+consultas (KPIs, Top N, serie de morosidad, rollups filtrados) son cortes
+vectorizados sobre las celdas.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+from flask import current_app
+
+from .dimension_cache import get_dimension
+from .kpi_calculator import _Encoder, _m2o_label, _partner_name, _ranked_groups, _to_datetime64
+from .odoo_connector import DEFAULT_TEAM
+
+
+OPEN_PAYMENT_STATES = ('not_paid', 'partial')
+CUBE_MOVE_FIELDS = ['partner_id', 'invoice_date', 'invoice_date_due', 'amount_residual', 'move_type', 'team_id',
+                    'state', 'payment_state', 'write_date']
+CUBE_MOVE_OPTIONAL_FIELDS = ['l10n_latam_document_type_id', 'sales_channel_id']
+OPEN_INVOICE_DOMAIN = [
+    ['move_type', '=', 'out_invoice'],
+    ['state', '=', 'posted'],
+    ['payment_state', 'in', list(OPEN_PAYMENT_STATES)],
+]
+# Dimensiones disponibles para rollups: nombre -> atributo de códigos
+ROLLUP_DIMENSIONS = ('partner', 'invoice_month', 'due_month', 'account', 'team', 'channel', 'doc_type')
+
+
+# Columnas de las celdas: nombre -> (dtype, valor inicial)
+CELL_COLUMNS = {
+    'partner': (np.int32, 0),
+    # id del partner en Odoo (int4): el filtro de cliente se resuelve a ids
+    'partner_id': (np.int32, 0),
+    'account': (np.int32, 0),
+    'team': (np.int32, 0),
+    'channel': (np.int32, 0),
+    'doc_type': (np.int32, 0),
+    'invoice_month': ('datetime64[M]', np.datetime64('NaT')),
+    'due_month': ('datetime64[M]', np.datetime64('NaT')),
+    'overdue': (np.bool_, False),
+    'residual': (np.float64, 0),
+    'positive': (np.int64, 0),
+    'count': (np.int64, 0),
+    'due_days': (np.int64, 0),
+    # Posición de carga de la primera factura de la celda (orden de primera aparición)
+    'first': (np.int64, np.iinfo(np.int64).max),
+}
+
+
+def month_aligned(start_date: str | None = None, end_date: str | None = None) -> bool:
+    """True si el rango de fechas de factura abarca meses completos (o no hay rango).
+
+    El cubo agrupa por mes de factura: un corte a mitad de mes no se puede
+    responder desde las celdas y debe resolverlo otro motor.
+    """
+    try:
+        if start_date and date.fromisoformat(start_date[:10]).day != 1:
+            return False
+        if end_date and (date.fromisoformat(end_date[:10]) + timedelta(days=1)).day != 1:
+            return False
+    except ValueError:
+        return False
+    return True
+
+
+def _is_open(rec: Dict) -> bool:
+    return (rec.get('move_type') == 'out_invoice' and rec.get('state') == 'posted'
+            and rec.get('payment_state') in OPEN_PAYMENT_STATES)
+
+
+class ReceivablesCube:
+    def __init__(self, capacity: int = 1024):
+        self._encoders = {name: _Encoder() for name in ('partner', 'account', 'team', 'channel', 'doc_type')}
+        self._cells: Dict[tuple, int] = {}
+        self._size = 0
+        self._allocate(capacity)
+        # id de factura -> (celda, saldo aportado, aporta como factura con saldo, día de vencimiento, posición)
+        self._members: Dict[int, Tuple[int, float, bool, int, int]] = {}
+        self._next_position = 0
+        # texto del filtro de cliente -> ids de partner con facturas abiertas (hasta el próximo refresco)
+        self._customers: Dict[str, np.ndarray] = {}
+        # Fecha de corte de vencido/vigente: el día de la última carga completa
+        self.as_of = date.today()
+        self.watermark = ''
+        self.loaded_at: float | None = None
+        self.refreshed_at: float | None = None
+        self.last_refresh: Dict = {}
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.RLock()
+
+    # -- almacenamiento ------------------------------------------------------
+    def _allocate(self, capacity: int) -> None:
+        for name, (dtype, fill) in CELL_COLUMNS.items():
+            setattr(self, name, np.full(capacity, fill, dtype=dtype))
+
+    def _grow(self) -> None:
+        capacity = max(1024, len(self.residual) * 2)
+        for name, (dtype, fill) in CELL_COLUMNS.items():
+            old = getattr(self, name)
+            new = np.full(capacity, fill, dtype=dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _cell(self, key: tuple, partner_id: int, invoice_month: np.datetime64, due_month: np.datetime64, overdue: bool) -> int:
+        cell = self._cells.get(key)
+        if cell is None:
+            if self._size == len(self.residual):
+                self._grow()
+            cell = self._size
+            self._size += 1
+            self._cells[key] = cell
+            self.partner[cell], self.account[cell], self.team[cell], self.channel[cell], self.doc_type[cell] = key[:5]
+            self.partner_id[cell] = partner_id
+            self.invoice_month[cell] = invoice_month
+            self.due_month[cell] = due_month
+            self.overdue[cell] = overdue
+        return cell
+
+    def _remove(self, move_id: int) -> None:
+        member = self._members.pop(move_id, None)
+        if member is None:
+            return
+        cell, residual, positive, due_days, _ = member
+        self.count[cell] -= 1
+        if positive:
+            self.residual[cell] -= residual
+            self.positive[cell] -= 1
+            self.due_days[cell] -= due_days
+
+    def _add(self, rec: Dict, account_code: str, invoice_date: np.datetime64, due: np.datetime64, position: int) -> None:
+        invoice_month = invoice_date.astype('datetime64[M]')
+        due_month = due.astype('datetime64[M]')
+        # Vencido a la fecha de corte; sin vencimiento cuenta como vigente (NaT < x es False)
+        overdue = bool(due < np.datetime64(self.as_of, 'D'))
+        partner = rec.get('partner_id')
+        partner_id = partner[0] if isinstance(partner, list) and partner else 0
+        key = (
+            self._encoders['partner'](_partner_name(rec.get('partner_id'))),
+            self._encoders['account'](account_code),
+            self._encoders['team'](_m2o_label(rec.get('team_id'))),
+            self._encoders['channel'](_m2o_label(rec.get('sales_channel_id'))),
+            self._encoders['doc_type'](_m2o_label(rec.get('l10n_latam_document_type_id'), rec.get('move_type') or 'Desconocido')),
+            str(invoice_month),
+            str(due_month),
+            overdue,
+            partner_id,
+        )
+        cell = self._cell(key, partner_id, invoice_month, due_month, overdue)
+        residual = float(rec.get('amount_residual') or 0.0)
+        positive = residual > 0
+        due_days = int(due.astype(np.int64)) if positive and not np.isnat(due) else 0
+        self.count[cell] += 1
+        self.first[cell] = min(self.first[cell], position)
+        if positive:
+            self.residual[cell] += residual
+            self.positive[cell] += 1
+            self.due_days[cell] += due_days
+        self._members[rec['id']] = (cell, residual, positive, due_days, position)
+
+    def apply(self, records: List[Dict], account_codes: Dict[int, str]) -> Tuple[int, int]:
+        """Aplica facturas nuevas o modificadas; devuelve (agregadas, retiradas)."""
+        added = removed = 0
+        # Fechas convertidas en bloque: una sola llamada a NumPy por columna
+        invoice_dates = _to_datetime64([r.get('invoice_date') or None for r in records])
+        due_dates = _to_datetime64([r.get('invoice_date_due') or None for r in records])
+        with self._lock:
+            self._customers = {}
+            for i, rec in enumerate(records):
+                member = self._members.get(rec['id'])
+                was_member = member is not None
+                self._remove(rec['id'])
+                if _is_open(rec):
+                    # Las facturas modificadas conservan su posición de la carga; las nuevas van al final
+                    if was_member:
+                        position = member[4]
+                    else:
+                        position = self._next_position
+                        self._next_position += 1
+                    self._add(rec, account_codes.get(rec['id'], ''), invoice_dates[i], due_dates[i], position)
+                    added += 1
+                elif was_member:
+                    removed += 1
+                if rec.get('write_date') and rec['write_date'] > self.watermark:
+                    self.watermark = rec['write_date']
+        return added, removed
+
+    def reset(self) -> None:
+        with self._lock:
+            self._encoders = {name: _Encoder() for name in self._encoders}
+            self._cells = {}
+            self._members = {}
+            self._customers = {}
+            self._next_position = 0
+            self._size = 0
+            self._allocate(1024)
+            self.as_of = date.today()
+            self.watermark = ''
+
+    # -- refresco desde Odoo -------------------------------------------------
+    def _account_codes(self, connector, domain: list) -> Dict[int, str]:
+        """Código de la cuenta por cobrar de cada factura (primera línea receivable)."""
+        lines = connector.search_read_chunked('account.move.line', domain + [['account_id.account_type', '=', 'asset_receivable']],
+                                              ['move_id', 'account_id'])
+        account_ids = {l['account_id'][0] for l in lines if isinstance(l.get('account_id'), list)}
+        accounts = get_dimension((connector.url, connector.db), 'account.account', current_app.config).get_many(connector, account_ids)
+        codes: Dict[int, str] = {}
+        for line in lines:
+            if isinstance(line.get('move_id'), list) and isinstance(line.get('account_id'), list):
+                codes.setdefault(line['move_id'][0], (accounts.get(line['account_id'][0]) or {}).get('code') or '')
+        return codes
+
+    def refresh(self, connector, full: bool = False) -> Dict:
+        with self._refresh_lock:
+            started = time.monotonic()
+            fields = connector.available_fields('account.move', CUBE_MOVE_FIELDS, CUBE_MOVE_OPTIONAL_FIELDS)
+            # Un día nuevo cambia qué celdas están vencidas: se recarga completo
+            full = full or self.loaded_at is None or not self.watermark or self.as_of != date.today()
+            if full:
+                records = connector.search_read_chunked('account.move', OPEN_INVOICE_DOMAIN, fields)
+                codes = self._account_codes(connector, [['move_id.' + f, op, v] for f, op, v in OPEN_INVOICE_DOMAIN])
+            else:
+                # Sin filtro de estado: también llegan las facturas pagadas o anuladas que deben salir del cubo
+                records = connector.search_read_chunked('account.move', [['move_type', '=', 'out_invoice'], ['write_date', '>=', self.watermark]], fields)
+                open_ids = [r['id'] for r in records if _is_open(r)]
+                codes = self._account_codes(connector, [['move_id', 'in', open_ids]]) if open_ids else {}
+            with self._lock:
+                if full:
+                    self.reset()
+                added, removed = self.apply(records, codes)
+                now = time.time()
+                if full:
+                    self.loaded_at = now
+                self.refreshed_at = now
+                self.last_refresh = {
+                    'mode': 'full' if full else 'incremental',
+                    'records': len(records),
+                    'added': added,
+                    'removed': removed,
+                    'seconds': round(time.monotonic() - started, 3),
+                }
+            return dict(self.last_refresh)
+
+    def ensure_fresh(self, connector, refresh_seconds: float = 60, full_refresh_seconds: float = 3600) -> None:
+        """Carga completa si nunca se cargó, cambió el día o venció `full_refresh_seconds`; si no, delta cada `refresh_seconds`."""
+        with self._refresh_lock:
+            now = time.time()
+            if self.loaded_at is None or now - self.loaded_at >= full_refresh_seconds or self.as_of != date.today():
+                self.refresh(connector, full=True)
+            elif now - (self.refreshed_at or 0) >= refresh_seconds:
+                self.refresh(connector)
+
+    # -- consultas -----------------------------------------------------------
+    def _codes_matching(self, dimension: str, text, exact: bool = False) -> np.ndarray | None:
+        """Códigos cuyo texto contiene `text` (como `ilike`) o, con `exact`, es igual (como `=ilike`).
+
+        También se acepta una lista de textos (cualquiera de ellos).
+        """
+        if not text:
+            return None
+        labels = self._encoders[dimension].labels
+        needles = [t.casefold() for t in ([text] if isinstance(text, str) else text)]
+        if exact:
+            return np.array([i for i, label in enumerate(labels) if label.casefold() in needles], dtype=np.int32)
+        return np.array([i for i, label in enumerate(labels) if any(n in label.casefold() for n in needles)], dtype=np.int32)
+
+    def resolve_customer(self, connector, filters: Dict) -> Dict:
+        """`filters` con el texto `customer` traducido a `partner_ids` tal como filtra el conector.
+
+        El texto se resuelve con el mismo criterio que `get_unpaid_invoices`
+        (índice de partners o ``ilike`` de Odoo, ver `customer_leaf`) en un
+        ``read_group`` por partner sobre las facturas abiertas; el resultado se
+        reutiliza hasta el próximo refresco del cubo.
+        """
+        filters = dict(filters)
+        customer = filters.pop('customer', None)
+        if not customer:
+            return filters
+        with self._lock:
+            ids = self._customers.get(customer)
+        if ids is None:
+            groups = connector.read_group('account.move', OPEN_INVOICE_DOMAIN + [connector.customer_leaf(customer)],
+                                          ['amount_residual:sum'], ['partner_id'])
+            ids = np.array(sorted(g['partner_id'][0] for g in groups if isinstance(g.get('partner_id'), list)), dtype=np.int32)
+            with self._lock:
+                self._customers[customer] = ids
+        filters['partner_ids'] = ids
+        return filters
+
+    def _mask(self, start_date: str | None = None, end_date: str | None = None, partner_ids: np.ndarray | None = None,
+              team: str | list | None = None, exact_team: bool = False) -> np.ndarray:
+        if not month_aligned(start_date, end_date):
+            raise ValueError("El cubo solo filtra por meses completos de fecha de factura")
+        n = self._size
+        mask = self.count[:n] > 0
+        if start_date:
+            mask &= self.invoice_month[:n] >= np.datetime64(start_date[:7], 'M')
+        if end_date:
+            mask &= self.invoice_month[:n] <= np.datetime64(end_date[:7], 'M')
+        # Cliente ya resuelto a ids (`resolve_customer`); canal igual que el conector
+        if partner_ids is not None:
+            mask &= np.isin(self.partner_id[:n], partner_ids)
+        codes = self._codes_matching('team', team, exact_team)
+        if codes is not None:
+            mask &= np.isin(self.team[:n], codes)
+        return mask
+
+    def _top(self, mask: np.ndarray, n: int) -> Tuple[List[str], List[float]]:
+        size = self._size
+        labels = self._encoders['partner'].labels
+        groups, sums = _ranked_groups(self.partner[:size].astype(np.int64), self.residual[:size], mask, len(labels))
+        groups = groups[:n]
+        return [labels[g] for g in groups], [round(float(sums[g]), 2) for g in groups]
+
+    def dashboard(self, start_date: str | None = None, end_date: str | None = None, partner_ids: np.ndarray | None = None,
+                  team: str | list | None = DEFAULT_TEAM, channel: str | None = None, exact_team: bool = False) -> Dict:
+        """Respuesta de /api/kpis cortando el cubo (mismas claves que `dashboard_kpis`, al día `as_of`)."""
+        with self._lock:
+            n = self._size
+            mask = self._mask(start_date, end_date, partner_ids, team, exact_team)
+            residual, positive = self.residual[:n], self.positive[:n]
+            with_balance = mask & (positive > 0)
+            overdue = with_balance & self.overdue[:n]
+            vencido = float(residual[overdue].sum())
+            vigente = float(residual[with_balance & ~overdue].sum())
+            overdue_count = int(positive[overdue].sum())
+            # Σ (corte - vencimiento) de cada factura = corte x facturas - Σ días de vencimiento
+            as_of_days = int(np.datetime64(self.as_of, 'D').astype(np.int64))
+            overdue_days = as_of_days * overdue_count - int(self.due_days[:n][overdue].sum())
+
+            top_mask = overdue
+            if channel is not None:
+                labels = self._encoders['channel'].labels
+                nacional = labels.index('NACIONAL') if channel == 'NACIONAL' and 'NACIONAL' in labels else -1
+                top_mask = overdue & (self.channel[:n] == nacional)
+            top_labels, top_values = self._top(top_mask, 10)
+
+            doc_labels = self._encoders['doc_type'].labels
+            doc_sums = np.bincount(self.doc_type[:n][with_balance], weights=residual[with_balance], minlength=len(doc_labels))
+            # Orden de primera aparición, como los demás motores: primera factura de cada tipo en la carga
+            doc_first = np.full(len(doc_labels), np.iinfo(np.int64).max, dtype=np.int64)
+            np.minimum.at(doc_first, self.doc_type[:n][with_balance], self.first[:n][with_balance])
+            present = np.flatnonzero(doc_first != np.iinfo(np.int64).max)
+            doc_codes = present[np.argsort(doc_first[present], kind='stable')].tolist()
+            serie_labels, serie_values = self._delinquency(with_balance)
+            total = int(self.count[:n][mask].sum())
+
+        return {
+            'total_facturas': total,
+            'monto_vencido': round(vencido, 2),
+            'monto_vigente': round(vigente, 2),
+            'promedio_dias_morosidad': round(overdue_days / overdue_count, 2) if overdue_count else 0.0,
+            'top10': {'labels': top_labels, 'values': top_values},
+            'condicion': {'labels': ['Vigente', 'Vencido'], 'values': [round(vigente, 2), round(vencido, 2)]},
+            'tipo_documento': {'labels': [doc_labels[c] for c in doc_codes], 'values': [round(float(doc_sums[c]), 2) for c in doc_codes]},
+            'morosidad_series': {'labels': serie_labels, 'values': serie_values},
+        }
+
+    def _delinquency(self, mask: np.ndarray) -> Tuple[List[str], List[float]]:
+        n = self._size
+        valid = mask & ~np.isnat(self.invoice_month[:n])
+        months = self.invoice_month[:n][valid]
+        if months.size == 0:
+            return [], []
+        residual = self.residual[:n][valid]
+        # Vencida dentro del mes de factura: vence ese mes o antes
+        vencido = self.due_month[:n][valid] <= months
+        keys, inverse = np.unique(months, return_inverse=True)
+        totals = np.bincount(inverse, weights=residual, minlength=keys.size)
+        venc = np.bincount(inverse[vencido], weights=residual[vencido], minlength=keys.size)
+        return [str(k) for k in keys], [round((float(v) / float(t) * 100) if t else 0.0, 2) for v, t in zip(venc, totals)]
+
+    def top_partners(self, n: int = 15, overdue_only: bool = False, **filters) -> Tuple[List[str], List[float]]:
+        with self._lock:
+            mask = self._mask(**filters) & (self.positive[:self._size] > 0)
+            if overdue_only:
+                mask &= self.overdue[:self._size]
+            return self._top(mask, n)
+
+    def delinquency_series(self, **filters) -> Tuple[List[str], List[float]]:
+        with self._lock:
+            return self._delinquency(self._mask(**filters) & (self.positive[:self._size] > 0))
+
+    def _dimension_values(self, dimension: str, idx: np.ndarray) -> List:
+        if dimension in ('invoice_month', 'due_month'):
+            return [str(v) for v in getattr(self, dimension)[idx]]
+        labels = self._encoders[dimension].labels
+        return [labels[c] for c in getattr(self, dimension)[idx]]
+
+    def rollup(self, by: List[str], **filters) -> List[Dict]:
+        """Saldo y facturas agrupados por las dimensiones `by` (ver ``ROLLUP_DIMENSIONS``)."""
+        unknown = [d for d in by if d not in ROLLUP_DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Dimensiones no soportadas: {', '.join(unknown)}")
+        with self._lock:
+            idx = np.flatnonzero(self._mask(**filters))
+            columns = [self._dimension_values(d, idx) for d in by]
+            residual = self.residual[idx]
+            positive = self.positive[idx]
+            count = self.count[idx]
+        groups: Dict[tuple, List] = {}
+        for i, key in enumerate(zip(*columns) if columns else [()] * len(idx)):
+            acc = groups.setdefault(key, [0.0, 0, 0])
+            acc[0] += float(residual[i])
+            acc[1] += int(positive[i])
+            acc[2] += int(count[i])
+        rows = [{**dict(zip(by, key)), 'saldo': round(s, 2), 'facturas_con_saldo': p, 'facturas': c}
+                for key, (s, p, c) in groups.items()]
+        rows.sort(key=lambda r: r['saldo'], reverse=True)
+        return rows
+
+    def stats(self) -> Dict:
+        with self._lock:
+            n = self._size
+            nbytes = sum(getattr(self, name).nbytes for name in CELL_COLUMNS)
+            return {
+                'cells': n,
+                'active_cells': int(np.count_nonzero(self.count[:n])),
+                'invoices': len(self._members),
+                'bytes': int(nbytes),
+                'dimensions': {name: len(enc.labels) for name, enc in self._encoders.items()},
+                'as_of': self.as_of.isoformat(),
+                'watermark': self.watermark or None,
+                'loaded_at': self.loaded_at,
+                'refreshed_at': self.refreshed_at,
+                'last_refresh': dict(self.last_refresh),
+            }
+
+
+_cubes: Dict[Tuple[str, str], ReceivablesCube] = {}
+_cubes_lock = threading.Lock()
+
+
+def get_cube(connector, refresh_seconds: float = 60, full_refresh_seconds: float = 3600) -> ReceivablesCube:
+    """Cubo de proceso para la instancia del conector, refrescado si está vencido."""
+    key = (connector.url, connector.db)
+    with _cubes_lock:
+        cube = _cubes.setdefault(key, ReceivablesCube())
+    cube.ensure_fresh(connector, refresh_seconds, full_refresh_seconds)
+    return cube
+
+
+def cube_stats() -> List[Dict]:
+    with _cubes_lock:
+        items = list(_cubes.items())
+    return [{'instance': f"{url}/{dbname}", **cube.stats()} for (url, dbname), cube in items]
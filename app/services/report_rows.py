@@ -0,0 +1,137 @@
+"""Filas compactas del reporte CxC 12/13.
+
+Cada línea del reporte se guarda en un ``ReportRow`` con ``__slots__`` (sin
+diccionario por instancia) y ``build_report_rows`` comparte entre filas los
+textos repetidos (cliente, cuenta, vendedor, país, fechas...). Las claves
+largas del reporte (``'patner_id/contact_adress'``...) solo aparecen al
+serializar: ``row.get(clave)`` para CSV/XLSX y ``row.to_dict()`` para JSON.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List
+
+
+# (clave pública de la fila, atributo interno) en el orden de las columnas del JSON
+REPORT_ROW_FIELDS = (
+    ('date', 'date'),
+    ('I10nn_latam_document_type_id', 'document_type'),
+    ('move_name', 'move_name'),
+    ('invoice_origin', 'invoice_origin'),
+    ('account_id/code', 'account_code'),
+    ('account_id/name', 'account_name'),
+    ('patner_id/cod_client_sap', 'partner_sap_code'),
+    ('patner_id/vat', 'partner_vat'),
+    ('patner_id', 'partner'),
+    ('amount_currency', 'amount_currency'),
+    ('amount_residual_currency', 'amount_residual_currency'),
+    ('date_maturity', 'date_maturity'),
+    ('ref', 'ref'),
+    ('name', 'name'),
+    ('move_id/invoice_user_id', 'salesperson'),
+    ('patner_id/state_id', 'partner_state'),
+    ('patner_id/l10n_pe_district', 'partner_district'),
+    ('patner_id/contact_adress', 'partner_address'),
+    ('patner_id/country_code', 'partner_country_code'),
+    ('patner_id/country_id', 'partner_country'),
+    ('move_id/sales_channel_id', 'sales_channel'),
+    ('move_id/sales_type_id', 'sales_type'),
+    ('move_id/payment_state', 'payment_state'),
+)
+_ATTRIBUTES: Dict[str, str] = dict(REPORT_ROW_FIELDS)
+
+
+class ReportRow:
+    """Una línea del reporte; se lee como dict de solo lectura (`get`, `[]`).
+
+    `line_id` (id de account.move.line) no es columna del reporte: solo sirve
+    para armar el cursor de paginación.
+    """
+
+    __slots__ = tuple(attr for _, attr in REPORT_ROW_FIELDS) + ('line_id',)
+
+    def __init__(self, date, document_type, move_name, invoice_origin, account_code, account_name,
+                 partner_sap_code, partner_vat, partner, amount_currency, amount_residual_currency,
+                 date_maturity, ref, name, salesperson, partner_state, partner_district, partner_address,
+                 partner_country_code, partner_country, sales_channel, sales_type, payment_state, line_id=None):
+        self.date = date
+        self.document_type = document_type
+        self.move_name = move_name
+        self.invoice_origin = invoice_origin
+        self.account_code = account_code
+        self.account_name = account_name
+        self.partner_sap_code = partner_sap_code
+        self.partner_vat = partner_vat
+        self.partner = partner
+        self.amount_currency = amount_currency
+        self.amount_residual_currency = amount_residual_currency
+        self.date_maturity = date_maturity
+        self.ref = ref
+        self.name = name
+        self.salesperson = salesperson
+        self.partner_state = partner_state
+        self.partner_district = partner_district
+        self.partner_address = partner_address
+        self.partner_country_code = partner_country_code
+        self.partner_country = partner_country
+        self.sales_channel = sales_channel
+        self.sales_type = sales_type
+        self.payment_state = payment_state
+        self.line_id = line_id
+
+    def get(self, key: str, default=None):
+        attr = _ATTRIBUTES.get(key)
+        return getattr(self, attr) if attr is not None else default
+
+    def __getitem__(self, key: str):
+        attr = _ATTRIBUTES.get(key)
+        if attr is None:
+            raise KeyError(key)
+        return getattr(self, attr)
+
+    def __contains__(self, key) -> bool:
+        return key in _ATTRIBUTES
+
+    def keys(self):
+        return _ATTRIBUTES.keys()
+
+    def to_dict(self) -> Dict:
+        return {key: getattr(self, attr) for key, attr in REPORT_ROW_FIELDS}
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ReportRow):
+            return NotImplemented
+        return all(getattr(self, attr) == getattr(other, attr) for attr in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"ReportRow(move_name={self.move_name!r}, partner={self.partner!r}, amount_residual_currency={self.amount_residual_currency!r})"
+
+
+def rows_to_dicts(rows: Iterable) -> List[Dict]:
+    """Borde de serialización: filas compactas (o dicts) -> dicts para JSON."""
+    return [row.to_dict() if isinstance(row, ReportRow) else row for row in rows]
+
+
+def to_columnar(rows: List, max_cardinality: float = 0.5) -> Dict:
+    """Filas -> encabezado + un arreglo de valores por columna.
+
+    Las columnas de texto con pocos valores distintos (cliente, cuenta,
+    vendedor, país...) se codifican con diccionario: el arreglo lleva índices
+    enteros y ``dictionaries[columna]`` los valores. Una columna se codifica
+    si sus valores distintos no superan ``max_cardinality`` del total de filas.
+    """
+    columns = [key for key, _ in REPORT_ROW_FIELDS]
+    values, dictionaries = [], {}
+    limit = max(1, int(len(rows) * max_cardinality))
+    for key in columns:
+        column = [row.get(key) for row in rows]
+        # Solo textos (o vacíos de Odoo): evita que 0 y False compartan código
+        if len(rows) > 1 and all(v.__class__ is str or v is None or v is False for v in column):
+            index: Dict = {}
+            codes = [index.setdefault(v, len(index)) for v in column]
+            if len(index) <= limit:
+                dictionaries[key] = list(index)
+                column = codes
+        values.append(column)
+    return {"format": "columnar", "columns": columns, "values": values, "dictionaries": dictionaries}
@@ -0,0 +1,111 @@
+"""Coalescencia de consultas idénticas concurrentes (*single-flight*).
+
+Cuando varios requests piden lo mismo a la vez (p. ej. todo el equipo abriendo
+el dashboard a las 8am), solo el primero consulta a Odoo; el resto espera esa
+llamada en curso y comparte su resultado. No se guarda nada al terminar: la
+siguiente llamada vuelve a consultar, así que no se sirven datos viejos.
+"""
+from __future__ import annotations
+
+import functools
+import inspect
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from .conditional import fresh_reads_requested
+from .query_cache import freeze
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+def _shallow_copy(value: Any) -> Any:
+    # Cada llamador recibe su propio contenedor; los registros internos se comparten
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._stats = {'issued': 0, 'coalesced': 0, 'errors': 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Ejecuta `fn` una sola vez por `key` entre todos los llamadores concurrentes."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats['issued'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return _shallow_copy(call.result)
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            data = dict(self._stats)
+            data['in_flight'] = len(self._calls)
+        total = data['issued'] + data['coalesced']
+        data['coalesced_ratio'] = round(data['coalesced'] / total, 4) if total else 0.0
+        return data
+
+
+_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    return _flight
+
+
+def coalesced(method: Callable) -> Callable:
+    """Decora un método de `OdooConnector` para coalescer llamadas idénticas.
+
+    La clave combina instancia Odoo (url, db), nombre del método y argumentos
+    normalizados (posicionales y por nombre resueltos contra la firma), más si el
+    request pide lecturas frescas: una de ellas no se suma a una llamada que puede
+    estar sirviéndose de la caché TTL. Se omite si el conector tiene
+    ``singleflight = False``.
+    """
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not getattr(self, 'singleflight', False):
+            return method(self, *args, **kwargs)
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = tuple((name, freeze(value)) for name, value in bound.arguments.items() if name != 'self')
+        key = (self.url, self.db, method.__name__, arguments, fresh_reads_requested())
+        return _flight.do(key, lambda: method(self, *args, **kwargs))
+
+    return wrapper
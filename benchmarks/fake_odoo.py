@@ -0,0 +1,392 @@
+"""Servidor XML-RPC/JSON-RPC que imita la API externa de Odoo para benchmarks offline.
+
+Implementa ``common.authenticate`` y en ``object.execute_kw`` los métodos
+``search_read``, ``search``, ``search_count``, ``read``, ``read_group`` y
+``fields_get`` sobre datos sintéticos de ``account.move``,
+``account.move.line``, ``res.partner``, ``account.account`` y ``crm.team``.
+Responde en ``/xmlrpc/2/*`` y en ``/jsonrpc`` (``params.service``/``method``/
+``args``, como Odoo). Cada llamada puede demorarse ``latency`` segundos para
+simular la red.
+
+Uso directo:
+    python benchmarks/fake_odoo.py --lines 100000 --latency 0.02 --port 8069
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import xmlrpc.client
+from datetime import date, timedelta
+from socketserver import ThreadingMixIn
+from xmlrpc.server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
+
+
+PASSWORD = 'bench'
+UID = 2
+TEAMS = ['INTERNACIONAL', 'NACIONAL', 'ECOMMERCE']
+ACCOUNT_CODES = ['121201', '122100', '131201', '132100', '101000']
+RELATIONS = {
+    'account.move.line': {'partner_id': 'res.partner', 'account_id': 'account.account', 'move_id': 'account.move'},
+    'account.move': {'partner_id': 'res.partner', 'team_id': 'crm.team', 'sales_channel_id': 'crm.team'},
+}
+M2O_FIELDS = {'partner_id', 'account_id', 'move_id', 'team_id', 'sales_channel_id', 'currency_id',
+              'l10n_latam_document_type_id', 'invoice_user_id', 'sales_type_id', 'state_id', 'country_id'}
+
+
+class Dataset:
+    """Datos sintéticos deterministas: ~2 líneas por factura y ~1 partner cada 20 líneas."""
+
+    def __init__(self, n_lines: int = 10000, seed: int = 1, today: date | None = None):
+        rnd = random.Random(seed)
+        today = today or date.today()
+        write_date = '2025-01-01 00:00:00'
+        self.data = {m: {} for m in ('res.partner', 'account.account', 'account.move', 'account.move.line', 'crm.team')}
+        for i, name in enumerate(TEAMS, 1):
+            self.data['crm.team'][i] = {'id': i, 'name': name, 'write_date': write_date}
+        for i, code in enumerate(ACCOUNT_CODES, 1):
+            self.data['account.account'][i] = {
+                'id': i, 'code': code, 'name': f'Cuenta {code}', 'write_date': write_date,
+                'account_type': 'asset_cash' if code.startswith('10') else 'asset_receivable',
+            }
+        n_partners = max(5, n_lines // 20)
+        for i in range(1, n_partners + 1):
+            self.data['res.partner'][i] = {
+                'id': i, 'name': f'Cliente {i:06d} SAC', 'vat': f'20{i:09d}', 'cod_client_sap': f'C{i:07d}',
+                'email': f'cobranzas@cliente{i:06d}.pe', 'ref': f'REF-{i:05d}',
+                'state_id': [1, 'Lima'], 'l10n_pe_district': 'Miraflores', 'country_id': [173, 'Perú'],
+                'country_code': 'PE', 'contact_address': f'Av. Principal {i}, Lima', 'active': True, 'write_date': write_date,
+            }
+        n_moves = max(1, n_lines // 2)
+        for i in range(1, n_moves + 1):
+            partner = rnd.randint(1, n_partners)
+            team = rnd.randint(1, len(TEAMS))
+            invoice_date = today - timedelta(days=rnd.randint(0, 400))
+            due = invoice_date + timedelta(days=rnd.choice([0, 30, 60, 90]))
+            total = round(rnd.uniform(100, 10000), 2)
+            self.data['account.move'][i] = {
+                'id': i, 'name': f'F001-{i:08d}', 'ref': '', 'move_type': 'out_invoice', 'state': 'posted',
+                'payment_state': rnd.choice(['not_paid', 'partial']),
+                'partner_id': [partner, self.data['res.partner'][partner]['name']],
+                'invoice_date': invoice_date.isoformat(), 'invoice_date_due': due.isoformat(),
+                'amount_total': total, 'amount_residual': round(total * rnd.choice([1, 0.5]), 2),
+                'currency_id': [2, 'USD'], 'invoice_origin': f'S{i:06d}',
+                'l10n_latam_document_type_id': [1, 'Factura'], 'team_id': [team, TEAMS[team - 1]],
+                'sales_channel_id': [team, TEAMS[team - 1]], 'invoice_user_id': [2, 'Vendedor'],
+                'sales_type_id': [1, 'Venta'], 'write_date': write_date, 'line_ids': [],
+            }
+        for i in range(1, n_lines + 1):
+            move = self.data['account.move'][(i - 1) % n_moves + 1]
+            account = rnd.randint(1, 4)
+            self.data['account.move.line'][i] = {
+                'id': i, 'date': move['invoice_date'], 'move_name': move['name'], 'ref': '', 'name': f'Línea {i}',
+                'date_maturity': move['invoice_date_due'], 'amount_currency': move['amount_total'],
+                'amount_residual_currency': move['amount_residual'], 'partner_id': move['partner_id'],
+                'account_id': [account, f"{ACCOUNT_CODES[account - 1]} Cuenta {ACCOUNT_CODES[account - 1]}"],
+                'move_id': [move['id'], move['name']], 'reconciled': False, 'parent_state': 'posted',
+                'write_date': write_date,
+            }
+            move['line_ids'].append(i)
+        self._matches: dict = {}
+        self._lock = threading.Lock()
+
+    # -- evaluación de dominios ----------------------------------------------
+    def value(self, model: str, rec: dict, path: str):
+        head, _, rest = path.partition('.')
+        value = rec.get(head)
+        if not rest:
+            return value
+        related = RELATIONS.get(model, {}).get(head)
+        if not related or not isinstance(value, list):
+            return None
+        return self.value(related, self.data[related][value[0]], rest)
+
+    def leaf(self, model: str, rec: dict, leaf) -> bool:
+        path, op, expected = leaf
+        if path.startswith('line_ids.'):
+            lines = self.data['account.move.line']
+            return any(self.leaf('account.move.line', lines[i], [path[9:], op, expected]) for i in rec.get('line_ids', []))
+        value = rec['id'] if path == 'id' else self.value(model, rec, path)
+        if op == 'ilike' and isinstance(value, list) and RELATIONS.get(model, {}).get(path) == 'res.partner':
+            return self.partner_name_search(value[0], expected)
+        if isinstance(value, list):
+            # many2one: texto para like/ilike, id para el resto
+            value = value[1] if op in ('like', 'ilike', '=ilike', 'not ilike') else value[0]
+        if op == '=':
+            return value == expected if expected is not False else not value
+        if op == '!=':
+            return value != expected
+        if op == 'in':
+            return value in expected
+        if op == 'not in':
+            return value not in expected
+        if value is None or value is False:
+            return False
+        if op == '<':
+            return value < expected
+        if op == '<=':
+            return value <= expected
+        if op == '>':
+            return value > expected
+        if op == '>=':
+            return value >= expected
+        if op == 'like':
+            return str(value).startswith(expected[:-1]) if expected.endswith('%') else expected in str(value)
+        if op == 'ilike':
+            return str(expected).lower() in str(value).lower()
+        if op == '=ilike':
+            # Sin comodines '%': igualdad sin distinguir mayúsculas
+            return str(value).lower() == str(expected).lower()
+        raise xmlrpc.client.Fault(1, f'Operador no soportado: {op}')
+
+    def partner_name_search(self, partner_id: int, text: str) -> bool:
+        """`ilike` sobre un many2one a res.partner, como `_name_search` de Odoo 16.
+
+        Nombre, email y referencia contienen el texto; el VAT, el texto sin
+        caracteres fuera de ``[a-zA-Z0-9-.]``.
+        """
+        partner = self.data['res.partner'].get(partner_id) or {}
+        needle = str(text).lower()
+        if any(needle in str(partner.get(f) or '').lower() for f in ('name', 'email', 'ref')):
+            return True
+        vat_needle = re.sub(r'[^a-zA-Z0-9\-\.]+', '', str(text)).lower()
+        return bool(vat_needle) and vat_needle in str(partner.get('vat') or '').lower()
+
+    def match(self, model: str, rec: dict, domain: list) -> bool:
+        stack = []
+        for token in reversed(domain or []):
+            if token == '!':
+                stack.append(not stack.pop())
+            elif token in ('|', '&'):
+                a, b = stack.pop(), stack.pop()
+                stack.append((a or b) if token == '|' else (a and b))
+            else:
+                stack.append(self.leaf(model, rec, token))
+        return all(stack)
+
+    def search(self, model: str, domain: list) -> list:
+        # Los datos no cambian: el resultado de cada dominio se memoriza
+        key = (model, repr(domain))
+        with self._lock:
+            cached = self._matches.get(key)
+        if cached is None:
+            cached = [r for r in self.data[model].values() if self.match(model, r, domain)]
+            with self._lock:
+                self._matches[key] = cached
+        return cached
+
+
+class _Handler(SimpleXMLRPCRequestHandler):
+    rpc_paths = ('/xmlrpc/2/common', '/xmlrpc/2/object', '/bench')
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        if self.path != '/jsonrpc':
+            return super().do_POST()
+        request = json.loads(self.rfile.read(int(self.headers.get('content-length', 0))))
+        params = request.get('params') or {}
+        reply = {'jsonrpc': '2.0', 'id': request.get('id')}
+        try:
+            reply['result'] = self.server._dispatch(params.get('method'), params.get('args') or [])
+        except xmlrpc.client.Fault as exc:
+            # Forma de los errores de /jsonrpc en Odoo (el nombre de la excepción va en data.name)
+            name = 'odoo.exceptions.AccessDenied' if exc.faultCode == 3 else 'odoo.exceptions.UserError'
+            reply['error'] = {'code': 200, 'message': 'Odoo Server Error',
+                              'data': {'name': name, 'message': exc.faultString, 'debug': exc.faultString}}
+        body = json.dumps(reply).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        # Misma regla que SimpleXMLRPCRequestHandler para comprimir con gzip
+        if self.encode_threshold is not None and len(body) > self.encode_threshold and 'gzip' in self.accept_encodings():
+            body = xmlrpc.client.gzip_encode(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server(ThreadingMixIn, SimpleXMLRPCServer):
+    daemon_threads = True
+
+
+class FakeOdoo:
+    def __init__(self, dataset: Dataset, latency: float = 0.0):
+        self.dataset = dataset
+        self.latency = latency
+        self.calls: dict = {}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    # -- API Odoo ------------------------------------------------------------
+    def authenticate(self, db, login, password, context=None):
+        self._count('common.authenticate')
+        return UID if password == PASSWORD else False
+
+    def version(self):
+        return {'server_version': '16.0', 'server_serie': '16.0'}
+
+    def execute_kw(self, db, uid, password, model, method, args, kwargs=None):
+        kwargs = kwargs or {}
+        if password != PASSWORD:
+            raise xmlrpc.client.Fault(3, 'Access Denied')
+        self._count(f'{model}.{method}')
+        if self.latency:
+            time.sleep(self.latency)
+        if model not in self.dataset.data:
+            raise xmlrpc.client.Fault(2, f"Modelo no encontrado: {model}")
+        records = self.dataset.data[model]
+        if method in ('search_read', 'search', 'search_count', 'read_group'):
+            domain = args[0] if args else kwargs.get('domain', [])
+            found = self.dataset.search(model, domain)
+            if method == 'search_count':
+                return len(found)
+            if method == 'read_group':
+                return self._read_group(found, args, kwargs)
+            found = self._order(found, kwargs.get('order'))
+            offset = kwargs.get('offset') or 0
+            limit = kwargs.get('limit') or None
+            found = found[offset:offset + limit if limit else None]
+            if method == 'search':
+                return [r['id'] for r in found]
+            return [self._project(r, kwargs.get('fields')) for r in found]
+        if method == 'read':
+            ids = args[0]
+            fields = args[1] if len(args) > 1 else kwargs.get('fields')
+            return [self._project(records[i], fields) for i in ids if i in records]
+        if method == 'fields_get':
+            sample = next(iter(records.values()), {})
+            return {name: {'type': 'many2one' if name in M2O_FIELDS else 'char', 'string': name}
+                    for name in sample if name != 'line_ids'}
+        raise xmlrpc.client.Fault(1, f'Método no soportado: {method}')
+
+    # -- control del benchmark -----------------------------------------------
+    def bench_stats(self):
+        with self._lock:
+            return dict(self.calls)
+
+    def bench_reset(self):
+        with self._lock:
+            self.calls.clear()
+        return True
+
+    # -- utilidades ----------------------------------------------------------
+    @staticmethod
+    def _order(found: list, order: str | None) -> list:
+        if not order:
+            return found
+        found = list(found)
+        for part in reversed([p.strip() for p in order.split(',') if p.strip()]):
+            name, *direction = part.split()
+            found.sort(key=lambda r: (r.get(name) is None, r.get(name) if not isinstance(r.get(name), list) else r[name][1]),
+                       reverse=bool(direction and direction[0].lower() == 'desc'))
+        return found
+
+    @staticmethod
+    def _project(rec: dict, fields: list | None) -> dict:
+        if not fields:
+            out = dict(rec)
+        else:
+            out = {'id': rec['id']}
+            for name in fields:
+                out[name] = rec.get(name, False)
+        out.pop('line_ids', None)
+        return out
+
+    @staticmethod
+    def _group_value(rec: dict, spec: str):
+        name, _, granularity = spec.partition(':')
+        value = rec.get(name)
+        if isinstance(value, str) and len(value) == 10 and value[4] == '-':
+            day = date.fromisoformat(value)
+            if (granularity or 'month') == 'month':
+                start = day.replace(day=1)
+                end = (start + timedelta(days=32)).replace(day=1)
+                return ('date', start.strftime('%B %Y'), start.isoformat(), end.isoformat())
+            return ('date', day.strftime('%d %b %Y'), day.isoformat(), (day + timedelta(days=1)).isoformat())
+        if isinstance(value, list):
+            return ('m2o', value[0], value[1])
+        return ('value', value if value is not None else False)
+
+    def _read_group(self, found: list, args: list, kwargs: dict) -> list:
+        fields = args[1] if len(args) > 1 else kwargs.get('fields', [])
+        groupby = args[2] if len(args) > 2 else kwargs.get('groupby', [])
+        if isinstance(groupby, str):
+            groupby = [groupby]
+        if kwargs.get('lazy', True):
+            groupby = groupby[:1]
+        grouped_names = {g.split(':')[0] for g in groupby}
+        groups: dict = {}
+        for rec in found:
+            key = tuple(self._group_value(rec, g) for g in groupby)
+            acc = groups.setdefault(key, {'__count': 0})
+            acc['__count'] += 1
+            for spec in fields:
+                name, _, func = spec.partition(':')
+                value = rec.get(name)
+                if name in grouped_names or value is False or value is None:
+                    continue
+                if func in ('max', 'min'):
+                    current = acc.get(name)
+                    acc[name] = value if current is None else (max if func == 'max' else min)(current, value)
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    acc[name] = acc.get(name, 0) + value
+        if not groupby and not groups:
+            # Odoo devuelve un grupo vacío cuando no se agrupa y no hay registros
+            groups[()] = {'__count': 0, **{spec.split(':')[0]: False for spec in fields}}
+        result = []
+        for key, acc in groups.items():
+            row = dict(acc)
+            domain = []
+            for spec, value in zip(groupby, key):
+                name = spec.split(':')[0]
+                if value[0] == 'date':
+                    row[spec] = value[1]
+                    domain += ['&', [name, '>=', value[2]], [name, '<', value[3]]]
+                elif value[0] == 'm2o':
+                    row[spec] = [value[1], value[2]]
+                    domain.append([name, '=', value[1]])
+                else:
+                    row[spec] = value[1]
+                    domain.append([name, '=', value[1]])
+            row['__domain'] = domain
+            result.append(row)
+        return result
+
+
+def serve(n_lines: int = 10000, latency: float = 0.0, host: str = '127.0.0.1', port: int = 0, seed: int = 1):
+    """Arranca el servidor en un hilo y devuelve (servidor, FakeOdoo)."""
+    fake = FakeOdoo(Dataset(n_lines, seed=seed), latency)
+    server = _Server((host, port), requestHandler=_Handler, allow_none=True, logRequests=False)
+    server.register_function(fake.authenticate, 'authenticate')
+    server.register_function(fake.version, 'version')
+    server.register_function(fake.execute_kw, 'execute_kw')
+    server.register_function(fake.bench_stats, 'bench_stats')
+    server.register_function(fake.bench_reset, 'bench_reset')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=10000)
+    parser.add_argument('--latency', type=float, default=0.0, help='segundos por llamada execute_kw')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8069)
+    args = parser.parse_args()
+    server, _ = serve(args.lines, args.latency, args.host, args.port)
+    print(f"Odoo falso en http://{args.host}:{server.server_address[1]} ({args.lines} líneas, db=bench, password={PASSWORD})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Paridad de KPIs: funciones de referencia vs motor columnar (NumPy).
+
+Pasa las mismas facturas (``fake_odoo.Dataset`` más algunos casos borde: sin
+vencimiento, saldo cero o negativo, fecha no ISO, sin partner ni tipo de
+documento) por ``compute_kpis``/``top15_clients``/``dashboard_kpis`` y por
+``compute_kpis_columnar``/``top15_clients_columnar``/``dashboard_columnar``.
+Exige totales, promedio de días y Top N iguales (montos con tolerancia de un
+céntimo por el orden de suma) y reporta el tiempo de cada camino. Termina con
+código 1 si algún resultado difiere.
+
+Ejemplo:
+    python benchmarks/kpi_parity.py --lines 20000,200000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_odoo import Dataset  # noqa: E402
+from app.services.kpi_calculator import (  # noqa: E402
+    InvoiceColumns, compute_kpis, compute_kpis_columnar, dashboard_columnar, dashboard_kpis,
+    top15_clients, top15_clients_columnar,
+)
+
+AMOUNT_KEYS = ('monto_vencido', 'monto_vigente')
+CENT = 0.01 + 1e-9
+
+
+def edge_cases(today: date) -> list:
+    """Facturas que ejercitan las ramas de borde de ambos motores."""
+    base = {'move_type': 'out_invoice', 'invoice_date': (today - timedelta(days=40)).isoformat(),
+            'partner_id': [900001, 'Cliente Borde SAC'], 'sales_channel_id': [2, 'NACIONAL'],
+            'l10n_latam_document_type_id': [2, 'Nota de Débito']}
+    return [
+        {**base, 'amount_residual': 150.0, 'invoice_date_due': False},
+        {**base, 'amount_residual': 0.0, 'invoice_date_due': (today - timedelta(days=5)).isoformat()},
+        {**base, 'amount_residual': -80.0, 'invoice_date_due': (today - timedelta(days=5)).isoformat()},
+        {**base, 'amount_residual': 75.5, 'invoice_date_due': today.isoformat()},
+        {**base, 'amount_residual': 60.0, 'invoice_date_due': (today - timedelta(days=3)).strftime('%d/%m/%Y')},
+        {**base, 'amount_residual': 42.0, 'invoice_date_due': (today - timedelta(days=9)).isoformat(), 'partner_id': False},
+        {**base, 'amount_residual': 33.0, 'invoice_date_due': (today - timedelta(days=1)).isoformat(),
+         'l10n_latam_document_type_id': False, 'move_type': 'out_refund', 'invoice_date': None},
+    ]
+
+
+def _close(a: float, b: float) -> bool:
+    return abs(a - b) <= CENT
+
+
+def _diff_series(name: str, ref: tuple, col: tuple) -> list:
+    (ref_labels, ref_values), (col_labels, col_values) = ref, col
+    if ref_labels != col_labels:
+        return [f'{name}: etiquetas {ref_labels} != {col_labels}']
+    return [f'{name}[{label}]: {a} != {b}' for label, a, b in zip(ref_labels, ref_values, col_values) if not _close(a, b)]
+
+
+def _diff_kpis(name: str, ref: dict, col: dict) -> list:
+    errors = []
+    for key in ('total_facturas', 'promedio_dias_morosidad'):
+        if ref[key] != col[key]:
+            errors.append(f'{name}.{key}: {ref[key]} != {col[key]}')
+    errors += [f'{name}.{key}: {ref[key]} != {col[key]}' for key in AMOUNT_KEYS if not _close(ref[key], col[key])]
+    return errors
+
+
+def _diff_dashboard(name: str, ref: dict, col: dict) -> list:
+    errors = _diff_kpis(name, ref, col)
+    for key in ('top10', 'condicion', 'tipo_documento', 'morosidad_series'):
+        errors += _diff_series(f'{name}.{key}', (ref[key]['labels'], ref[key]['values']),
+                               (col[key]['labels'], col[key]['values']))
+    return errors
+
+
+def _timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, round(time.perf_counter() - started, 4)
+
+
+def run(lines_list: list, seed: int) -> list:
+    today = date.today()
+    results = []
+    for n_lines in lines_list:
+        invoices = list(Dataset(n_lines, seed, today).data['account.move'].values()) + edge_cases(today)
+        ref_kpis, ref_s = _timed(compute_kpis, invoices)
+        col_kpis, col_s = _timed(lambda: compute_kpis_columnar(InvoiceColumns(invoices), today))
+        errors = _diff_kpis('kpis', ref_kpis, col_kpis)
+        timings = {'kpis': {'referencia_s': ref_s, 'columnar_s': col_s}}
+
+        ref_top, ref_s = _timed(top15_clients, invoices)
+        col_top, col_s = _timed(top15_clients_columnar, invoices)
+        errors += _diff_series('top15', ref_top, col_top)
+        timings['top15'] = {'referencia_s': ref_s, 'columnar_s': col_s}
+
+        for channel in (None, 'NACIONAL'):
+            ref_dash, ref_s = _timed(dashboard_kpis, invoices, channel, today)
+            col_dash, col_s = _timed(dashboard_columnar, invoices, channel, today)
+            key = f"dashboard_{channel or 'todos'}"
+            errors += _diff_dashboard(key, ref_dash, col_dash)
+            timings[key] = {'referencia_s': ref_s, 'columnar_s': col_s}
+
+        results.append({'lines': n_lines, 'facturas': len(invoices), 'ok': not errors, 'errores': errors, 'tiempos': timings})
+        print(f"[{n_lines} líneas] {len(invoices)} facturas: {'OK' if not errors else f'{len(errors)} diferencias'}",
+              file=sys.stderr)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Paridad de KPIs: referencia vs motor columnar.')
+    parser.add_argument('--lines', default='20000', help='tamaños separados por coma (p. ej. 20000,200000)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    results = run([int(x) for x in args.lines.split(',') if x.strip()], args.seed)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if not all(r['ok'] for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Transporte hacia Odoo: XML-RPC vs JSON-RPC sobre el mismo dataset.
+
+Arranca ``fake_odoo`` en un proceso aparte y repite con cada transporte del
+pool (``ODOO_TRANSPORT``) las lecturas grandes de la app: líneas del reporte
+CxC (``search_read``), facturas pendientes, lectura por ids de clientes y un
+``read_group`` por cliente. Por consulta informa bytes de respuesta, tiempo
+de lectura + parseo en el cliente (mediana) y duración total de la llamada, y
+comprueba que ambos transportes devuelvan los mismos registros.
+
+Ambos transportes piden gzip, como contra un Odoo detrás de un proxy que
+comprime; con ``--identity`` se comparan sin compresión.
+
+Ejemplo:
+    python benchmarks/odoo_transport.py --lines 50000 --repeat 5
+    python benchmarks/odoo_transport.py --lines 50000 --identity
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_odoo import PASSWORD, serve  # noqa: E402
+from app.services.odoo_pool import TRANSPORTS, OdooSessionPool  # noqa: E402
+
+
+LINE_FIELDS = ['date', 'move_name', 'ref', 'name', 'date_maturity', 'amount_currency',
+               'amount_residual_currency', 'partner_id', 'account_id', 'move_id']
+MOVE_FIELDS = ['name', 'invoice_date', 'invoice_date_due', 'amount_total', 'amount_residual',
+               'partner_id', 'team_id', 'invoice_user_id', 'payment_state', 'currency_id']
+PARTNER_FIELDS = ['name', 'vat', 'state_id', 'country_id', 'contact_address', 'l10n_pe_district', 'cod_client_sap', 'country_code']
+
+
+def _queries(pool: OdooSessionPool) -> dict:
+    partner_ids = pool.execute_kw('res.partner', 'search', [[]])
+    return {
+        'report_lines': ('account.move.line', 'search_read', [[['account_id.code', 'in', ['121201', '122100', '131201', '132100']]]],
+                         {'fields': LINE_FIELDS, 'order': 'date desc, id desc'}),
+        'unpaid_invoices': ('account.move', 'search_read', [[['move_type', '=', 'out_invoice'], ['payment_state', 'in', ['not_paid', 'partial']]]],
+                            {'fields': MOVE_FIELDS}),
+        'partners_read': ('res.partner', 'read', [partner_ids], {'fields': PARTNER_FIELDS}),
+        'lines_by_partner': ('account.move.line', 'read_group', [[], ['amount_residual_currency:sum'], ['partner_id']], {'lazy': False}),
+    }
+
+
+def _measure(pool: OdooSessionPool, query: tuple, repeat: int) -> tuple:
+    model, method, args, kwargs = query
+    parse, total, nbytes, result = [], [], 0, None
+    for _ in range(repeat):
+        info: dict = {}
+        started = time.perf_counter()
+        result = pool.execute_kw(model, method, args, kwargs, info=info)
+        total.append(time.perf_counter() - started)
+        parse.append(info['parse_seconds'])
+        nbytes = info['bytes']
+    return result, {
+        'records': len(result),
+        'bytes': nbytes,
+        'parse_ms': round(statistics.median(parse) * 1000, 1),
+        'call_ms': round(statistics.median(total) * 1000, 1),
+    }
+
+
+def _server_main(lines: int, conn) -> None:
+    server, _ = serve(lines)
+    conn.send(server.server_address[1])
+    conn.recv()  # espera la orden de parar
+    server.shutdown()
+
+
+def run(lines: int, repeat: int, gzip: bool = True) -> list:
+    ctx = mp.get_context('spawn')
+    parent, child = ctx.Pipe()
+    server = ctx.Process(target=_server_main, args=(lines, child))
+    server.start()
+    port = parent.recv()
+    try:
+        pools = {name: OdooSessionPool(f'http://127.0.0.1:{port}', 'bench', 'bench', PASSWORD, max_size=1, transport=name)
+                 for name in TRANSPORTS}
+        for pool in pools.values():
+            # max_size=1: el único cliente del pool atiende todas las mediciones
+            pool.execute_kw('res.partner', 'search_count', [[]])
+            with pool.client() as client:
+                client.transport.accept_gzip_encoding = gzip
+        queries = _queries(pools['xmlrpc'])
+        results = []
+        for label, query in queries.items():
+            row, reference = {'lines': lines, 'query': label, 'gzip': gzip}, None
+            for name, pool in pools.items():
+                _measure(pool, query, 1)  # calentamiento: conexión y uid
+                records, row[name] = _measure(pool, query, repeat)
+                if reference is None:
+                    reference = records
+                row[name]['same_result'] = records == reference
+            xml, js = row['xmlrpc'], row['jsonrpc']
+            row['bytes_ratio'] = round(js['bytes'] / xml['bytes'], 3) if xml['bytes'] else None
+            row['parse_ratio'] = round(js['parse_ms'] / xml['parse_ms'], 3) if xml['parse_ms'] else None
+            results.append(row)
+            print(f"[{lines} líneas] {label} ({xml['records']} registros): "
+                  f"xmlrpc {xml['bytes']} B / {xml['parse_ms']} ms parseo / {xml['call_ms']} ms; "
+                  f"jsonrpc {js['bytes']} B / {js['parse_ms']} ms parseo / {js['call_ms']} ms; "
+                  f"iguales={js['same_result']}", file=sys.stderr)
+        for pool in pools.values():
+            pool.close()
+    finally:
+        parent.send('stop')
+        server.join(timeout=10)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Bytes y tiempo de parseo de XML-RPC vs JSON-RPC contra el Odoo falso.')
+    parser.add_argument('--lines', default='50000', help='tamaños separados por coma (p. ej. 10000,100000)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--identity', action='store_true', help='respuestas sin comprimir (sin Accept-Encoding: gzip)')
+    args = parser.parse_args()
+    results = []
+    for lines in [int(x) for x in args.lines.split(',') if x.strip()]:
+        results.extend(run(lines, args.repeat, gzip=not args.identity))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""Memoria de las filas del reporte CxC: dicts (formato anterior) vs ``ReportRow``.
+
+Genera líneas sintéticas con ``fake_odoo.Dataset``, las pasa por
+``xmlrpc.client`` (como llegan de Odoo: un objeto str por valor) y arma las
+filas con cada formato. Con ``tracemalloc`` mide el pico desde el
+unmarshalling (líneas crudas + mapas + filas) y lo retenido por las filas al
+final; el tiempo de armado se mide en una pasada aparte sin ``tracemalloc``.
+Cada formato corre en un proceso aparte.
+
+Ejemplo:
+    python benchmarks/report_rows_memory.py --lines 50000,200000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+import tracemalloc
+import xmlrpc.client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_odoo import Dataset  # noqa: E402
+
+
+LINE_FIELDS = ['date', 'move_name', 'ref', 'name', 'date_maturity', 'amount_currency',
+               'amount_residual_currency', 'partner_id', 'account_id', 'move_id']
+MOVE_FIELDS = ['invoice_origin', 'invoice_user_id', 'team_id', 'l10n_latam_document_type_id', 'sales_type_id', 'payment_state']
+PARTNER_FIELDS = ['name', 'vat', 'state_id', 'country_id', 'contact_address', 'l10n_pe_district', 'cod_client_sap', 'country_code']
+
+
+def legacy_build_report_rows(lines: list, partner_map: dict, account_map: dict, move_map: dict) -> list:
+    """Formato anterior: un dict con 23 claves por línea."""
+    rows = []
+    for l in lines:
+        partner = (partner_map.get(l['partner_id'][0]) if isinstance(l.get('partner_id'), list) else None) or {}
+        account = (account_map.get(l['account_id'][0]) if isinstance(l.get('account_id'), list) else None) or {}
+        move = (move_map.get(l['move_id'][0]) if isinstance(l.get('move_id'), list) else None) or {}
+
+        def m2o_name(val):
+            if isinstance(val, list) and len(val) >= 2:
+                return val[1]
+            return ''
+
+        rows.append({
+            'date': l.get('date'),
+            'I10nn_latam_document_type_id': m2o_name(move.get('l10n_latam_document_type_id')),
+            'move_name': l.get('move_name'),
+            'invoice_origin': move.get('invoice_origin') or '',
+            'account_id/code': account.get('code') or '',
+            'account_id/name': account.get('name') or m2o_name(l.get('account_id')),
+            'patner_id/cod_client_sap': partner.get('cod_client_sap') or '',
+            'patner_id/vat': partner.get('vat') or '',
+            'patner_id': m2o_name(l.get('partner_id')),
+            'amount_currency': l.get('amount_currency') or 0.0,
+            'amount_residual_currency': l.get('amount_residual_currency') or 0.0,
+            'date_maturity': l.get('date_maturity'),
+            'ref': l.get('ref') or '',
+            'name': l.get('name') or '',
+            'move_id/invoice_user_id': m2o_name(move.get('invoice_user_id')),
+            'patner_id/state_id': m2o_name(partner.get('state_id')),
+            'patner_id/l10n_pe_district': partner.get('l10n_pe_district') or '',
+            'patner_id/contact_adress': partner.get('contact_address') or '',
+            'patner_id/country_code': partner.get('country_code') or '',
+            'patner_id/country_id': m2o_name(partner.get('country_id')),
+            'move_id/sales_channel_id': m2o_name(move.get('team_id')),
+            'move_id/sales_type_id': m2o_name(move.get('sales_type_id')),
+            'move_id/payment_state': move.get('payment_state') or '',
+        })
+    return rows
+
+
+def _wire(records: list) -> bytes:
+    return xmlrpc.client.dumps((records,), methodresponse=True, allow_none=True).encode('utf-8')
+
+
+def _unmarshal(payload: bytes) -> list:
+    return xmlrpc.client.loads(payload)[0][0]
+
+
+def _payloads(n_lines: int) -> tuple:
+    data = Dataset(n_lines).data
+    project = lambda rec, fields: {'id': rec['id'], **{f: rec.get(f, False) for f in fields}}  # noqa: E731
+    return (
+        _wire([project(r, LINE_FIELDS) for r in data['account.move.line'].values()]),
+        _wire([project(r, PARTNER_FIELDS) for r in data['res.partner'].values()]),
+        _wire([project(r, ['code', 'name']) for r in data['account.account'].values()]),
+        _wire([project(r, MOVE_FIELDS) for r in data['account.move'].values()]),
+    )
+
+
+def _load(payloads: tuple) -> tuple:
+    lines, partners, accounts, moves = (_unmarshal(p) for p in payloads)
+    return (lines, {r['id']: r for r in partners}, {r['id']: r for r in accounts}, {r['id']: r for r in moves})
+
+
+def _measure(layout: str, payloads: tuple, conn) -> None:
+    sys.path.insert(0, ROOT)
+    from app.services.odoo_connector import build_report_rows
+
+    build = build_report_rows if layout == 'compact' else legacy_build_report_rows
+    # Tiempo de armado sin tracemalloc (que encarece cada asignación)
+    lines, partner_map, account_map, move_map = _load(payloads)
+    started = time.perf_counter()
+    rows = build(lines, partner_map, account_map, move_map)
+    elapsed = time.perf_counter() - started
+    del rows, lines, partner_map, account_map, move_map
+    gc.collect()
+
+    tracemalloc.start()
+    lines, partner_map, account_map, move_map = _load(payloads)
+    rows = build(lines, partner_map, account_map, move_map)
+    del lines, partner_map, account_map, move_map
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    conn.send({
+        'layout': layout,
+        'rows': len(rows),
+        'build_s': round(elapsed, 3),
+        'peak_mb': round(peak / 1024 ** 2, 1),
+        'retained_mb': round(retained / 1024 ** 2, 1),
+        'bytes_per_row': round(retained / len(rows)) if rows else 0,
+    })
+
+
+def run(lines_list: list) -> list:
+    ctx = mp.get_context('spawn')
+    results = []
+    for n_lines in lines_list:
+        payloads = _payloads(n_lines)
+        for layout in ('dict', 'compact'):
+            parent, child = ctx.Pipe()
+            process = ctx.Process(target=_measure, args=(layout, payloads, child))
+            process.start()
+            result = parent.recv()
+            process.join()
+            results.append({'lines': n_lines, **result})
+            print(f"[{n_lines} líneas] {layout}: pico={result['peak_mb']}MB retenido={result['retained_mb']}MB "
+                  f"({result['bytes_per_row']} B/fila) en {result['build_s']}s", file=sys.stderr)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Memoria de filas del reporte: dicts vs ReportRow.')
+    parser.add_argument('--lines', default='50000', help='tamaños separados por coma (p. ej. 50000,200000)')
+    args = parser.parse_args()
+    print(json.dumps(run([int(x) for x in args.lines.split(',') if x.strip()]), indent=2))
+
+
+if __name__ == '__main__':
+    main()
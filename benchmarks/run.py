@@ -0,0 +1,264 @@
+"""Benchmark offline de los endpoints de la API contra un Odoo falso.
+
+Para cada tamaño de dataset se arranca ``fake_odoo`` en un proceso aparte y
+cada escenario (endpoint) se ejecuta en un proceso nuevo con la app Flask y el
+cliente de pruebas, de modo que el pico de RSS medido sea solo el del
+escenario. El resultado es JSON: percentiles de latencia, pico de RSS, bytes
+de respuesta y llamadas a Odoo por modelo/método.
+
+Ejemplos:
+    python benchmarks/run.py --lines 10000,100000 --latency 0.02 --output bench.json
+    python benchmarks/run.py --scenarios kpis,report_data --set KPI_ENGINE=\\"columnar\\"
+    python benchmarks/run.py --compare base.json bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import xmlrpc.client
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_odoo import PASSWORD, serve  # noqa: E402
+
+
+SCENARIOS = {
+    'kpis': '/api/kpis',
+    'kpis_columnar': '/api/kpis?engine=columnar',
+    'kpis_odoo': '/api/kpis?engine=odoo',
+    'top15': '/api/reports/top15',
+    'report_data': '/api/reports/data?page=1&per_page=100',
+    'report_data_last': '/api/reports/data?page=50&per_page=100',
+    'export_csv': '/api/reports/export.csv',
+    'export_xlsx': '/api/reports/export.xlsx',
+    'kpis_etag_hit': '/api/kpis',
+}
+# Config propia de un escenario (se aplica sobre --set). Los demás corren sin la
+# caché de cuerpos por ETag para medir el motor y no la réplica del cuerpo guardado
+SCENARIO_CONFIG = {
+    'kpis_etag_hit': {'ETAG_ENABLED': True},
+}
+DEFAULT_SCENARIOS = ('kpis', 'report_data', 'export_xlsx')
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB; macOS, bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    low, high = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def _latency_summary(seconds: list) -> dict:
+    ms = [s * 1000 for s in seconds]
+    return {
+        'p50': round(percentile(ms, 50), 2),
+        'p90': round(percentile(ms, 90), 2),
+        'p95': round(percentile(ms, 95), 2),
+        'p99': round(percentile(ms, 99), 2),
+        'max': round(max(ms), 2) if ms else 0.0,
+        'mean': round(sum(ms) / len(ms), 2) if ms else 0.0,
+    }
+
+
+# -- procesos hijos -----------------------------------------------------------
+
+def _server_main(lines: int, latency: float, seed: int, conn) -> None:
+    server, _ = serve(lines, latency, seed=seed)
+    conn.send(server.server_address[1])
+    conn.recv()  # espera la orden de parar
+    server.shutdown()
+
+
+def _scenario_main(url: str, port: int, repeat: int, warmup: int, overrides: dict, conn) -> None:
+    try:
+        sys.path.insert(0, ROOT)
+        from app import create_app
+
+        app = create_app({
+            'TESTING': True,
+            'LOGIN_DISABLED': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'ODOO_URL': f'http://127.0.0.1:{port}',
+            'ODOO_DB': 'bench',
+            'ODOO_USERNAME': 'bench',
+            'ODOO_PASSWORD': PASSWORD,
+            'ODOO_CACHE_ENABLED': False,
+            'ETAG_ENABLED': False,
+            **overrides,
+        })
+        client = app.test_client()
+        control = xmlrpc.client.ServerProxy(f'http://127.0.0.1:{port}/bench', allow_none=True)
+        rss_app = _peak_rss_mb()
+
+        for _ in range(warmup):
+            client.get(url).get_data()
+        control.bench_reset()
+
+        timings, statuses, sizes = [], {}, []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = client.get(url)
+            body = response.get_data()  # consume también las respuestas en streaming
+            timings.append(time.perf_counter() - started)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            sizes.append(len(body))
+        calls = control.bench_stats()
+        conn.send({
+            'requests': repeat,
+            'status_codes': statuses,
+            'latency_ms': _latency_summary(timings),
+            'response_bytes': max(sizes) if sizes else 0,
+            'rss_app_mb': rss_app,
+            'peak_rss_mb': _peak_rss_mb(),
+            'odoo_calls': {name: round(count / repeat, 2) for name, count in sorted(calls.items())},
+            'odoo_calls_per_request': round(sum(calls.values()) / repeat, 2) if repeat else 0,
+        })
+    except Exception as exc:  # el error se informa en el resultado del escenario
+        conn.send({'error': f'{type(exc).__name__}: {exc}'})
+
+
+def _run_in_process(ctx, target, *args):
+    parent, child = ctx.Pipe()
+    process = ctx.Process(target=target, args=(*args, child))
+    process.start()
+    return process, parent
+
+
+# -- orquestación ---------------------------------------------------------------
+
+def run(lines_list: list, scenarios: list, latency: float, repeat: int, warmup: int, overrides: dict, seed: int = 1) -> dict:
+    ctx = mp.get_context('spawn')
+    results = []
+    for lines in lines_list:
+        started = time.perf_counter()
+        server, server_conn = _run_in_process(ctx, _server_main, lines, latency, seed)
+        port = server_conn.recv()
+        print(f"[{lines} líneas] Odoo falso listo en {time.perf_counter() - started:.1f}s (puerto {port})", file=sys.stderr)
+        try:
+            for name in scenarios:
+                url = SCENARIOS.get(name, name)
+                config = {**overrides, **SCENARIO_CONFIG.get(name, {})}
+                process, conn = _run_in_process(ctx, _scenario_main, url, port, repeat, warmup, config)
+                result = conn.recv()
+                process.join()
+                results.append({'lines': lines, 'scenario': name, 'url': url, **result})
+                summary = result.get('error') or f"p50={result['latency_ms']['p50']}ms p95={result['latency_ms']['p95']}ms rss={result['peak_rss_mb']}MB calls={result['odoo_calls_per_request']}"
+                print(f"  {name}: {summary}", file=sys.stderr)
+        finally:
+            server_conn.send('stop')
+            server.join(timeout=10)
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_rev': _git_rev(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'latency_s': latency,
+            'repeat': repeat,
+            'warmup': warmup,
+            'overrides': overrides,
+        },
+        'results': results,
+    }
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def compare(base: dict, current: dict) -> list:
+    """Filas (dataset, escenario) con los valores base/actual y la variación relativa."""
+    index = {(r['lines'], r['scenario']): r for r in base.get('results', [])}
+    rows = []
+    for r in current.get('results', []):
+        b = index.get((r['lines'], r['scenario']))
+        if not b or 'error' in b or 'error' in r:
+            continue
+        row = {'lines': r['lines'], 'scenario': r['scenario']}
+        for label, getter in (('p50_ms', lambda x: x['latency_ms']['p50']), ('p95_ms', lambda x: x['latency_ms']['p95']),
+                              ('peak_rss_mb', lambda x: x['peak_rss_mb']), ('odoo_calls', lambda x: x['odoo_calls_per_request'])):
+            old, new = getter(b), getter(r)
+            row[label] = {'base': old, 'current': new, 'change_pct': round((new - old) / old * 100, 1) if old else None}
+        rows.append(row)
+    return rows
+
+
+def _print_comparison(rows: list) -> None:
+    metrics = ('p50_ms', 'p95_ms', 'peak_rss_mb', 'odoo_calls')
+    print(f"{'líneas':>8}  {'escenario':<18}" + ''.join(f"{m:>26}" for m in metrics))
+    for row in rows:
+        cells = []
+        for m in metrics:
+            v = row[m]
+            change = '' if v['change_pct'] is None else f" ({v['change_pct']:+.1f}%)"
+            cells.append(f"{v['base']:>8} -> {v['current']:<8}{change}".rjust(26))
+        print(f"{row['lines']:>8}  {row['scenario']:<18}" + ''.join(cells))
+
+
+def _parse_overrides(values: list) -> dict:
+    overrides = {}
+    for item in values or []:
+        key, _, raw = item.partition('=')
+        try:
+            overrides[key] = json.loads(raw)
+        except json.JSONDecodeError:
+            overrides[key] = raw
+    return overrides
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark offline de la API contra un Odoo falso.')
+    parser.add_argument('--lines', default='10000', help='tamaños de dataset separados por coma (p. ej. 10000,100000,1000000)')
+    parser.add_argument('--scenarios', default=','.join(DEFAULT_SCENARIOS),
+                        help=f"escenarios separados por coma ({', '.join(SCENARIOS)}) o rutas explícitas")
+    parser.add_argument('--latency', type=float, default=0.0, help='latencia simulada por llamada a Odoo (s)')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--set', action='append', metavar='CLAVE=VALOR', help='sobrescribe config de Flask (VALOR en JSON)')
+    parser.add_argument('--output', help='archivo JSON de resultados (por defecto stdout)')
+    parser.add_argument('--baseline', help='JSON de una corrida previa para comparar al terminar')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'ACTUAL'), help='solo compara dos archivos de resultados')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as fh_base, open(args.compare[1]) as fh_current:
+            _print_comparison(compare(json.load(fh_base), json.load(fh_current)))
+        return
+
+    lines_list = [int(x) for x in args.lines.split(',') if x.strip()]
+    scenarios = [x.strip() for x in args.scenarios.split(',') if x.strip()]
+    report = run(lines_list, scenarios, args.latency, args.repeat, args.warmup, _parse_overrides(args.set))
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(payload)
+    else:
+        print(payload)
+    if args.baseline:
+        with open(args.baseline) as fh:
+            _print_comparison(compare(json.load(fh), report))
+
+
+if __name__ == '__main__':
+    main()